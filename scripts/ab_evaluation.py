@@ -0,0 +1,277 @@
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from run_sql import SQL_DIR, connect, split_sql
+from simulator_calibration import CALIBRATION_PATH, hash_inputs, input_files, inputs_key, read_artifact
+
+USER_METRICS_SQL = SQL_DIR / "05_ab_user_metrics.sql"
+OUT_DIR = Path("outputs")
+CONTROL = "control"
+
+RNG_SEED = 42
+N_RESAMPLES = 2000
+CI_LEVEL = 0.95
+# resamples x users held in one Poisson weight block
+BOOTSTRAP_CELLS = 1 << 22
+
+# Per-user columns summed per (experiment, variant) group
+SUM_COLUMNS = [
+    "users",
+    "sessions",
+    "duration_sum",
+    "duration_users",
+    "level_starts",
+    "level_completes",
+    "iap_revenue",
+    "ads_revenue",
+    "revenue",
+    "ad_impressions",
+    "retained_d1",
+]
+
+# KPI = sum(numerator) / sum(denominator), same definitions as 04_ab_test_evaluation.sql
+METRICS = [
+    ("sessions_per_user", "sessions", "users"),
+    ("avg_session_duration_min", "duration_sum", "duration_users"),
+    ("level_completion_rate", "level_completes", "level_starts"),
+    ("iap_arpu", "iap_revenue", "users"),
+    ("ads_arpu", "ads_revenue", "users"),
+    ("arpu", "revenue", "users"),
+    ("ads_impressions_per_user", "ad_impressions", "users"),
+    ("d1_retention", "retained_d1", "users"),
+]
+
+# simulator constant <- relative lift of this metric (economy_simulation.py)
+SIMULATOR_LIFTS = {
+    "AB_LIFT_COMPLETION": "level_completion_rate",
+    "AB_LIFT_SESSIONS": "sessions_per_user",
+    "AB_LIFT_IAP_REV": "iap_arpu",
+}
+
+
+def load_user_metrics(con) -> pd.DataFrame:
+    (stmt,) = split_sql(USER_METRICS_SQL.read_text(encoding="utf-8"))
+    return con.execute(stmt).fetchdf()
+
+
+def group_matrix(um: pd.DataFrame):
+    """
+    Per-user sum columns (N x k), sorted by (experiment, variant), plus the
+    group table: one row per (experiment, variant) with its row offset, size
+    and role (0 = control, 1.. = the other variants of the experiment).
+    """
+    um = um.sort_values(["experiment_name", "variant"], kind="stable").reset_index(drop=True)
+    duration = um["avg_session_duration_min"]
+    X = np.column_stack([
+        np.ones(len(um)),
+        um["sessions"],
+        duration.fillna(0.0),
+        duration.notna(),
+        um["level_starts"],
+        um["level_completes"],
+        um["iap_revenue"],
+        um["ads_revenue"],
+        um["iap_revenue"] + um["ads_revenue"],
+        um["ad_impressions"],
+        um["retained_d1"],
+    ]).astype(np.float64)
+
+    groups = um.groupby(["experiment_name", "variant"], sort=False).size().rename("size").reset_index()
+    groups["start"] = np.concatenate([[0], np.cumsum(groups["size"].to_numpy())[:-1]])
+    non_control = groups["variant"] != CONTROL
+    groups["role"] = non_control.groupby(groups["experiment_name"]).cumsum().where(non_control, 0)
+    return X, groups
+
+
+def poisson_weights(rng, shape) -> np.ndarray:
+    return rng.poisson(1.0, size=shape).astype(np.float64)
+
+
+def bootstrap_sums(X: np.ndarray, groups: pd.DataFrame, resamples: int, rng) -> np.ndarray:
+    """
+    Poisson bootstrap of every group's column sums at once.
+
+    Users are laid out by their position inside their group, so one weight
+    matrix W (resamples x positions) serves all groups of the same role:
+    sums[b, g, :] = W[b, :n_g] @ X_g is a single matmul per block of
+    positions. Controls and variants draw separate weight matrices, so the
+    two sides of every lift are resampled independently.
+    Returns (resamples, groups, columns).
+    """
+    start = groups["start"].to_numpy()
+    size = groups["size"].to_numpy()
+    role = groups["role"].to_numpy()
+    n_groups, k = len(groups), X.shape[1]
+    sums = np.zeros((resamples, n_groups, k))
+    block = max(1, BOOTSTRAP_CELLS // resamples)
+
+    for lo in range(0, int(size.max()), block):
+        pos = np.arange(lo, min(lo + block, int(size.max())))
+        for r in np.unique(role):
+            g = np.flatnonzero((role == r) & (size > lo))
+            if len(g) == 0:
+                continue
+            valid = pos[None, :] < size[g, None]
+            rows = np.where(valid, start[g, None] + pos[None, :], 0)
+            Xb = np.where(valid[..., None], X[rows], 0.0)  # (groups, positions, k)
+            W = poisson_weights(rng, (resamples, len(pos)))
+            sums[:, g, :] += (W @ Xb.transpose(1, 0, 2).reshape(len(pos), -1)).reshape(resamples, len(g), k)
+    return sums
+
+
+def ratio_metrics(sums: np.ndarray) -> np.ndarray:
+    # (..., k) column sums -> (..., metrics)
+    num = [SUM_COLUMNS.index(n) for _, n, _ in METRICS]
+    den = [SUM_COLUMNS.index(d) for _, _, d in METRICS]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return sums[..., num] / sums[..., den]
+
+
+def evaluate(um: pd.DataFrame, resamples: int = N_RESAMPLES, ci: float = CI_LEVEL, seed: int = RNG_SEED) -> pd.DataFrame:
+    """
+    Lift of every non-control variant vs its experiment's control for every
+    KPI in METRICS, with percentile bootstrap CIs and a two-sided bootstrap
+    p-value. One row per (experiment, variant, metric).
+    """
+    X, groups = group_matrix(um)
+    point = ratio_metrics(np.add.reduceat(X, groups["start"].to_numpy(), axis=0))
+    boot = ratio_metrics(bootstrap_sums(X, groups, resamples, np.random.default_rng(seed)))
+
+    control_idx = groups[groups["variant"] == CONTROL].reset_index().set_index("experiment_name")["index"]
+    pairs = groups[(groups["variant"] != CONTROL) & groups["experiment_name"].isin(control_idx.index)]
+    skipped = sorted(set(groups["experiment_name"]) - set(control_idx.index))
+    if skipped:
+        print(f"⚠️ No '{CONTROL}' variant, skipped: {', '.join(skipped)}")
+    var_g = pairs.index.to_numpy()
+    ctrl_g = control_idx.loc[pairs["experiment_name"]].to_numpy()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lift = 100.0 * (point[var_g] / point[ctrl_g] - 1.0)
+        boot_lift = 100.0 * (boot[:, var_g] / boot[:, ctrl_g] - 1.0)  # (resamples, pairs, metrics)
+    tail = 100.0 * (1.0 - ci) / 2.0
+    ci_low, ci_high = np.nanpercentile(boot_lift, [tail, 100.0 - tail], axis=0)
+    p_value = np.minimum(
+        1.0,
+        2.0 * np.minimum(np.mean(boot_lift <= 0, axis=0), np.mean(boot_lift >= 0, axis=0)),
+    )
+
+    n_pairs, n_metrics = lift.shape
+    return pd.DataFrame({
+        "experiment_name": np.repeat(pairs["experiment_name"].to_numpy(), n_metrics),
+        "variant": np.repeat(pairs["variant"].to_numpy(), n_metrics),
+        "metric": np.tile([m for m, _, _ in METRICS], n_pairs),
+        "users_control": np.repeat(groups["size"].to_numpy()[ctrl_g], n_metrics),
+        "users_variant": np.repeat(pairs["size"].to_numpy(), n_metrics),
+        "control_value": point[ctrl_g].ravel(),
+        "variant_value": point[var_g].ravel(),
+        "lift_pct": lift.ravel(),
+        "ci_low_pct": ci_low.ravel(),
+        "ci_high_pct": ci_high.ravel(),
+        "p_value": p_value.ravel(),
+    })
+
+
+def data_key(data_dir: Path):
+    """
+    inputs_key() of the files the lifts were measured on (None if a table has
+    no data), reusing the hashes of outputs/simulator_calibration.json.
+    """
+    files = input_files(data_dir)
+    if files is None:
+        return None
+    prior = read_artifact(CALIBRATION_PATH)
+    return inputs_key(hash_inputs(files, prior["inputs"] if prior else {}))
+
+
+def calibration(results: pd.DataFrame, resamples: int, ci: float, seed: int, key: str = None) -> dict:
+    """
+    Simulator deltas (relative lifts, e.g. -0.14 = -14%) per experiment and
+    variant, in the form economy_simulation.py loads. economy_simulation.py
+    only uses them while `key` matches the data it is calibrated on.
+    """
+    experiments = {}
+    for (exp, variant), rows in results.groupby(["experiment_name", "variant"], sort=True):
+        rows = rows.set_index("metric")
+        deltas = {}
+        for const, metric in SIMULATOR_LIFTS.items():
+            deltas[const] = round(float(rows.at[metric, "lift_pct"]) / 100.0, 6)
+            deltas[f"{const}_CI"] = [
+                round(float(rows.at[metric, "ci_low_pct"]) / 100.0, 6),
+                round(float(rows.at[metric, "ci_high_pct"]) / 100.0, 6),
+            ]
+        experiments.setdefault(exp, {})[variant] = {
+            "users_control": int(rows["users_control"].iloc[0]),
+            "users_variant": int(rows["users_variant"].iloc[0]),
+            **deltas,
+        }
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "resamples": resamples,
+        "ci_level": ci,
+        "seed": seed,
+        "inputs_key": key,
+        "experiments": experiments,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bootstrap lifts for every experiment in ab_assignments.")
+    parser.add_argument("--data-dir", type=Path, default=Path("data"), help="raw data directory (default: %(default)s)")
+    parser.add_argument(
+        "--db",
+        action="store_true",
+        help="read from the persistent DuckDB warehouse (see run_sql.py --db)",
+    )
+    parser.add_argument(
+        "--db-path",
+        type=Path,
+        help="warehouse file, implies --db (default: <data-dir>/warehouse.duckdb)",
+    )
+    parser.add_argument("--resamples", type=int, default=N_RESAMPLES, help="default: %(default)s")
+    parser.add_argument("--ci", type=float, default=CI_LEVEL, help="confidence level (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=RNG_SEED, help="default: %(default)s")
+    parser.add_argument("--out", type=Path, default=OUT_DIR / "ab_evaluation.csv", help="default: %(default)s")
+    parser.add_argument(
+        "--calibration",
+        type=Path,
+        default=OUT_DIR / "ab_calibration.json",
+        help="simulator deltas loaded by economy_simulation.py (default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    con = connect(args.data_dir, args.db_path or (True if args.db else None))
+    t0 = time.perf_counter()
+    um = load_user_metrics(con)
+    t1 = time.perf_counter()
+    results = evaluate(um, args.resamples, args.ci, args.seed)
+    t2 = time.perf_counter()
+    n_exp = um["experiment_name"].nunique()
+    print(
+        f"Evaluated {n_exp} experiments, {len(um):,} assigned users, {args.resamples} resamples "
+        f"(user metrics {t1 - t0:.2f}s, bootstrap {t2 - t1:.2f}s)"
+    )
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(args.out, index=False)
+    args.calibration.parent.mkdir(parents=True, exist_ok=True)
+    args.calibration.write_text(
+        json.dumps(calibration(results, args.resamples, args.ci, args.seed, data_key(args.data_dir)), indent=2),
+        encoding="utf-8",
+    )
+
+    print(f"\n=== LIFT VS CONTROL (%, {args.ci:.0%} bootstrap CI) ===")
+    print(results.head(40).round(4).to_string(index=False))
+    print(f"\nSaved: {args.out}")
+    print(f"Saved: {args.calibration}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+ROOT = SCRIPTS_DIR.parent
+OUT_DIR = Path("outputs")
+HISTORY_PATH = OUT_DIR / "benchmark_history.json"
+BASELINE_PATH = OUT_DIR / "benchmark_baseline.json"
+
+STAGES = ["generate", "sql", "simulate", "forecast"]
+# Scale points per stage; override with the CLI flags
+GEN_USERS = [2_000, 20_000, 200_000]
+SIM_USERS = [200_000, 1_000_000]
+SIM_STEPS = [5, 20]             # reward x sink steps of the scenario grid
+FORECAST_WEEKS = [12, 52]
+FORECAST_USERS = 1_000_000
+# reports timed by the sql stage (03_kpi_weekly_incremental.sql needs --db)
+REPORTS = ["01_event_validation.sql", "02_funnel_analysis.sql", "03_kpi_weekly.sql",
+           "04_ab_test_evaluation.sql", "05_ab_user_metrics.sql"]
+# slower than the baseline by more than this share (and MIN_DELTA_S seconds) = regression
+TOLERANCE = 0.25
+MIN_DELTA_S = 0.5
+
+GENERATED_RE = re.compile(r"^- (\w+)\s*: ([\d,]+)$", re.MULTILINE)
+
+
+def run_stage(cmd, cwd: Path) -> dict:
+    """Run one stage as a child process: wall time, its own peak RSS and stdout."""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    out = proc.stdout.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise SystemExit(f"{' '.join(map(str, cmd))} failed ({proc.returncode}):\n{out[-2000:]}")
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return {"wall_s": round(wall, 3), "peak_rss_mb": round(rss_mb, 1), "stdout": out}
+
+
+def bench_generate(work: Path, users: int) -> dict:
+    data_dir = work / f"data_{users}"
+    r = run_stage(
+        [sys.executable, SCRIPTS_DIR / "generate_synthetic_data.py", "--users", str(users), "--out-dir", data_dir],
+        work,
+    )
+    counts = {t: int(n.replace(",", "")) for t, n in GENERATED_RE.findall(r["stdout"])}
+    return {**r, "rows": sum(counts.values()), "rows_unit": "rows written", "counts": counts}
+
+
+def bench_sql(work: Path, users: int, counts: dict) -> dict:
+    reports = [ROOT / "sql" / name for name in REPORTS]
+    r = run_stage(
+        [sys.executable, SCRIPTS_DIR / "run_sql.py", *reports, "--data-dir", work / f"data_{users}"], work
+    )
+    return {**r, "rows": counts.get("events", 0) + counts.get("ads_events", 0), "rows_unit": "event rows scanned"}
+
+
+def bench_simulate(work: Path, users: int, steps: int) -> dict:
+    r = run_stage(
+        [sys.executable, SCRIPTS_DIR / "economy_simulation.py", "--users", str(users),
+         "--reward-steps", str(steps), "--sink-steps", str(steps), "--no-cache", "--out", work / "simulation.csv"],
+        work,
+    )
+    scenarios = int(re.search(r"Simulated ([\d,]+) scenarios", r["stdout"]).group(1).replace(",", ""))
+    return {**r, "rows": users * scenarios, "rows_unit": "user-scenarios"}
+
+
+def bench_forecast(work: Path, users: int, weeks: int) -> dict:
+    r = run_stage(
+        [sys.executable, SCRIPTS_DIR / "economy_forecast.py", "--users", str(users), "--weeks", str(weeks),
+         "--scenarios", "global_1.00_sink_1.00", "--out", work / "forecast.csv"],
+        work,
+    )
+    return {**r, "rows": users * weeks, "rows_unit": "user-weeks"}
+
+
+def run_benchmarks(args, work: Path) -> list:
+    results = []
+
+    def record(stage, scale, r):
+        r = {k: v for k, v in r.items() if k not in ("stdout", "counts")}
+        r["rows_per_s"] = round(r["rows"] / r["wall_s"], 1) if r["wall_s"] else None
+        row = {"stage": stage, "scale": scale, "key": f"{stage}:" + ",".join(f"{k}={v}" for k, v in scale.items()), **r}
+        results.append(row)
+        print(f"  {row['key']:<36} {r['wall_s']:>9.2f}s {r['peak_rss_mb']:>9,.0f} MB {r['rows_per_s'] or 0:>14,.0f} {r['rows_unit']}/s")
+
+    if "generate" in args.stages or "sql" in args.stages:
+        for users in args.users:
+            gen = bench_generate(work, users)
+            if "generate" in args.stages:
+                record("generate", {"users": users}, gen)
+            if "sql" in args.stages:
+                record("sql", {"users": users}, bench_sql(work, users, gen["counts"]))
+    if "simulate" in args.stages:
+        for users in args.sim_users:
+            for steps in args.sim_steps:
+                record("simulate", {"users": users, "steps": steps}, bench_simulate(work, users, steps))
+    if "forecast" in args.stages:
+        for weeks in args.weeks:
+            record("forecast", {"users": args.forecast_users, "weeks": weeks},
+                   bench_forecast(work, args.forecast_users, weeks))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_curves(results: list) -> None:
+    """Throughput vs scale per stage, as a text bar chart scaled to the stage's best point."""
+    print("\n=== THROUGHPUT VS SCALE ===")
+    for stage in STAGES:
+        rows = [r for r in results if r["stage"] == stage]
+        if not rows:
+            continue
+        best = max(r["rows_per_s"] or 0 for r in rows) or 1
+        print(f"{stage} ({rows[0]['rows_unit']}/s)")
+        for r in rows:
+            scale = ", ".join(f"{k}={v:,}" for k, v in r["scale"].items())
+            bar = "#" * max(1, round(30 * (r["rows_per_s"] or 0) / best))
+            print(f"  {scale:<28} {bar:<30} {r['rows_per_s'] or 0:>14,.0f}")
+
+
+def check_regressions(results: list, baseline: dict, tolerance: float, min_delta: float = MIN_DELTA_S) -> list:
+    """
+    Stages whose wall time exceeds the baseline's by more than `tolerance`
+    and by more than min_delta seconds (sub-second stages are mostly noise).
+    """
+    base = {r["key"]: r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = base.get(r["key"])
+        if b is None:
+            continue
+        ratio = r["wall_s"] / b["wall_s"] if b["wall_s"] else float("inf")
+        slower = ratio > 1 + tolerance and r["wall_s"] - b["wall_s"] > min_delta
+        status = "REGRESSION" if slower else "ok"
+        print(f"  {r['key']:<36} {b['wall_s']:>9.2f}s -> {r['wall_s']:>9.2f}s ({ratio - 1:+.1%}) {status}")
+        if status != "ok":
+            regressions.append(r["key"])
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Time the generator, SQL reports and simulator at several scale points."
+    )
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="default: all")
+    parser.add_argument("--users", type=int, nargs="+", default=GEN_USERS,
+                        help="generator / SQL scale points (default: %(default)s)")
+    parser.add_argument("--sim-users", type=int, nargs="+", default=SIM_USERS, help="default: %(default)s")
+    parser.add_argument("--sim-steps", type=int, nargs="+", default=SIM_STEPS,
+                        help="reward x sink grid steps (default: %(default)s)")
+    parser.add_argument("--weeks", type=int, nargs="+", default=FORECAST_WEEKS,
+                        help="forecast horizons (default: %(default)s)")
+    parser.add_argument("--forecast-users", type=int, default=FORECAST_USERS, help="default: %(default)s")
+    parser.add_argument("--work-dir", type=Path, help="scratch directory for generated data (default: a temp dir)")
+    parser.add_argument("--history", type=Path, default=HISTORY_PATH, help="default: %(default)s")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="default: %(default)s")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--check", action="store_true",
+                        help="compare with the baseline and exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="default: %(default)s")
+    parser.add_argument("--min-delta", type=float, default=MIN_DELTA_S,
+                        help="ignore slowdowns below this many seconds (default: %(default)s)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    run = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+    }
+    print(f"Benchmark {run['created_at']} (commit {run['commit']}, {run['cpus']} CPUs)")
+    print(f"  {'stage:scale':<36} {'wall':>10} {'peak RSS':>12} {'throughput':>14}")
+    if args.work_dir:
+        args.work_dir.mkdir(parents=True, exist_ok=True)
+        run["results"] = run_benchmarks(args, args.work_dir)
+    else:
+        with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+            run["results"] = run_benchmarks(args, Path(tmp))
+    print_curves(run["results"])
+
+    history = json.loads(args.history.read_text(encoding="utf-8")) if args.history.exists() else []
+    history.append(run)
+    args.history.parent.mkdir(parents=True, exist_ok=True)
+    args.history.write_text(json.dumps(history, indent=2), encoding="utf-8")
+    print(f"\nSaved: {args.history} ({len(history)} runs)")
+
+    regressions = []
+    if args.check:
+        if not args.baseline.exists():
+            raise SystemExit(f"No baseline at {args.baseline} (run with --save-baseline first)")
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        print(f"\n=== VS BASELINE {baseline['created_at']} (commit {baseline['commit']}, tolerance {args.tolerance:.0%}) ===")
+        regressions = check_regressions(run["results"], baseline, args.tolerance, args.min_delta)
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(run, indent=2), encoding="utf-8")
+        print(f"Saved baseline: {args.baseline}")
+    if regressions:
+        raise SystemExit(f"\n❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
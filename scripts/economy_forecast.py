@@ -0,0 +1,247 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# baselines are read as sim.NAME: init_calibration() rebinds them after import
+import economy_simulation as sim
+from economy_simulation import (
+    BASE_LEVELS_PER_SESSION,
+    BASELINE_SCENARIO,
+    BETA_NEED,
+    N_SIM_USERS,
+    OUT_DIR,
+    RNG_SEED,
+    SINK_NEED_ELASTICITY,
+    calibrate_beta0,
+    completion_prob,
+    logistic,
+    scenario_grid,
+    session_rate,
+    spend_erosion,
+)
+
+N_USERS = 1_000_000
+N_WEEKS = 12
+# users per vectorized update; state arrays are full length, temporaries are not
+CHUNK_USERS = 1 << 20
+DEFAULT_SCENARIOS = [BASELINE_SCENARIO, "global_1.20_sink_1.00", "global_1.20_sink_1.08"]
+
+# Soft currency, same units as the generator's currency_delta / currency_balance
+START_BALANCE = (50, 200)       # generator: rng.integers(50, 200)
+BASE_REWARD = 100               # per level complete, x (1 + 0.02 * min(level, 50))
+SINK_COST_PER_SESSION = 60      # x sink_multiplier
+CURRENCY_PER_USD = 100          # IAP spend converted to soft currency
+LEVEL_DIFFICULTY = 0.15 / 20    # generator: win logit - 0.15 * level / 20
+
+# Weekly churn hazard: CHURN_FLOOR + (CHURN_WEEK1 - CHURN_FLOOR) * exp(-week / CHURN_DECAY_WEEKS)
+CHURN_WEEK1 = 0.45
+CHURN_FLOOR = 0.06
+CHURN_DECAY_WEEKS = 4.0
+CHURN_SESSION_ELASTICITY = 0.5  # hazard x (base sessions / expected sessions) ** elasticity
+SHORTFALL_CHURN = 0.05          # extra hazard in a week the balance could not cover the sink
+SHORTFALL_NEED = 0.5            # need per unpaid session of sink
+
+WEEK_TOTALS = [
+    "active_users", "sessions", "level_starts", "level_completes", "currency_source", "currency_sink",
+    "shortfall_users", "payers", "iap_revenue", "ads_revenue", "balance", "level", "cum_spend",
+]
+
+
+def init_state(rng, n_users):
+    """Compact per-user state carried from week to week."""
+    return {
+        "active": np.ones(n_users, dtype=bool),
+        "balance": rng.integers(*START_BALANCE, size=n_users).astype(np.float32),
+        "level": np.maximum(1, 1 + rng.poisson(1, size=n_users)).astype(np.int32),
+        "cum_spend": np.zeros(n_users, dtype=np.float32),
+        "levels_per_session": np.clip(rng.poisson(BASE_LEVELS_PER_SESSION, n_users), 1, 10).astype(np.int8),
+        "u_target": rng.random(n_users, dtype=np.float32),
+    }
+
+
+def churn_hazard(week, lam):
+    base = CHURN_FLOOR + (CHURN_WEEK1 - CHURN_FLOOR) * np.exp(-week / CHURN_DECAY_WEEKS)
+    return base * (sim.BASE_WEEKLY_SESSIONS / lam) ** CHURN_SESSION_ELASTICITY
+
+
+def play_week(rng, state, idx, scenario):
+    """Sessions, levels, ads and currency flows of users `idx` for one week (state untouched)."""
+    sink = scenario.sink_multiplier
+    is_target = state["u_target"][idx] < scenario.target_share
+    reward = np.where(is_target, scenario.reward_mult_target, scenario.reward_mult_non)
+    level = state["level"][idx]
+
+    lam = session_rate(reward, sink)
+    sessions = rng.poisson(lam)
+    level_starts = sessions * state["levels_per_session"][idx]
+    p0 = completion_prob(reward)
+    p_complete = logistic(np.log(p0 / (1 - p0)) - LEVEL_DIFFICULTY * level)
+    level_completes = rng.binomial(level_starts, p_complete)
+    ads_impressions = rng.poisson(sessions * sim.BASE_AD_IMPRESSIONS_PER_SESSION)
+
+    # source: level rewards at the level they were earned from (levels advance within the week)
+    source = BASE_REWARD * reward * level_completes * (1 + 0.02 * np.minimum(level, 50))
+    demand = SINK_COST_PER_SESSION * sink * sessions
+    balance = state["balance"][idx] + source
+    paid = np.minimum(balance, demand)
+    shortfall = demand - paid
+
+    need = level_starts - level_completes + SHORTFALL_NEED * shortfall / SINK_COST_PER_SESSION
+    need_effective = np.clip(need * (1 + SINK_NEED_ELASTICITY * (sink - 1.0)), 0.0, None)
+    return {
+        "reward": reward, "lam": lam, "sessions": sessions, "level_starts": level_starts,
+        "level_completes": level_completes, "ads_impressions": ads_impressions, "source": source,
+        "balance": balance, "paid": paid, "shortfall": shortfall, "need_effective": need_effective,
+        "level": level + level_completes,
+    }
+
+
+def forecast_beta0(seed, n_users=N_SIM_USERS):
+    """
+    beta0 such that week 1 of the baseline scenario has BASE_PAYER_RATE_WEEK
+    payers, given this model's need (failed levels plus sink shortfall).
+    """
+    rng = np.random.default_rng(seed)
+    state = init_state(rng, n_users)
+    baseline = scenario_grid([], [], []).iloc[0]
+    week = play_week(rng, state, np.arange(n_users), baseline)
+    return calibrate_beta0(sim.BASE_PAYER_RATE_WEEK, week["need_effective"])
+
+
+def step_chunk(rng, state, users, week, scenario, beta0):
+    """
+    One week for the active users of `users` (a slice of the state arrays),
+    updated in place. Returns the chunk's WEEK_TOTALS.
+    """
+    idx = users.start + np.flatnonzero(state["active"][users])
+    if len(idx) == 0:
+        return np.zeros(len(WEEK_TOTALS))
+    w = play_week(rng, state, idx, scenario)
+    reward, balance = w["reward"], w["balance"]
+
+    is_payer = rng.random(len(idx)) < logistic(beta0 + BETA_NEED * w["need_effective"])
+    spend = np.zeros(len(idx))
+    spend[is_payer] = (
+        rng.gamma(shape=2.0, scale=sim.BASE_SPEND_PER_PAYER / 2.0, size=int(is_payer.sum()))
+        * spend_erosion(reward[is_payer])
+    )
+
+    balance += spend * CURRENCY_PER_USD - w["paid"]
+    state["balance"][idx] = balance
+    state["level"][idx] = w["level"]
+    state["cum_spend"][idx] += spend
+
+    short = w["shortfall"] > 0
+    churned = rng.random(len(idx)) < churn_hazard(week, w["lam"]) + SHORTFALL_CHURN * short
+    state["active"][idx[churned]] = False
+
+    return np.array([
+        len(idx),
+        w["sessions"].sum(),
+        w["level_starts"].sum(),
+        w["level_completes"].sum(),
+        w["source"].sum(),
+        w["paid"].sum(),
+        short.sum(),
+        is_payer.sum(),
+        spend.sum(),
+        w["ads_impressions"].sum() * sim.REV_PER_IMPRESSION,
+        balance.sum(),
+        w["level"].sum(),
+        state["cum_spend"][idx].sum(dtype=np.float64),
+    ], dtype=np.float64)
+
+
+def forecast_scenario(scenario, n_users, n_weeks, seed, beta0):
+    """
+    Yields one aggregate row per week for `scenario` (a scenario_grid() row).
+    Only the per-user state lives in memory; weekly totals are summed chunk
+    by chunk and handed out as soon as the week is done.
+    """
+    rng = np.random.default_rng(seed)
+    state = init_state(rng, n_users)
+    cum_revenue = 0.0
+    for week in range(n_weeks):
+        totals = np.zeros(len(WEEK_TOTALS))
+        for lo in range(0, n_users, CHUNK_USERS):
+            totals += step_chunk(rng, state, slice(lo, min(lo + CHUNK_USERS, n_users)), week, scenario, beta0)
+        t = dict(zip(WEEK_TOTALS, totals))
+        active = max(t["active_users"], 1)
+        revenue = t["iap_revenue"] + t["ads_revenue"]
+        cum_revenue += revenue
+        yield {
+            "scenario": scenario.scenario,
+            "week": week + 1,
+            "active_users": int(t["active_users"]),
+            "retention": t["active_users"] / n_users,
+            "sessions_per_active": t["sessions"] / active,
+            "completion_rate": t["level_completes"] / max(t["level_starts"], 1),
+            "currency_source_per_active": t["currency_source"] / active,
+            "currency_sink_per_active": t["currency_sink"] / active,
+            "mean_balance": t["balance"] / active,
+            "mean_level": t["level"] / active,
+            "shortfall_rate": t["shortfall_users"] / active,
+            "payer_rate": t["payers"] / active,
+            "cum_spend_per_active": t["cum_spend"] / active,
+            "iap_arpu": t["iap_revenue"] / n_users,
+            "ads_arpu": t["ads_revenue"] / n_users,
+            "total_arpu": revenue / n_users,
+            "cum_arpu": cum_revenue / n_users,
+        }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Multi-week economy forecast with per-user balance, level, churn and spend state."
+    )
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=DEFAULT_SCENARIOS,
+        help=f"economy_simulation.py scenario names; {BASELINE_SCENARIO} is always included (default: %(default)s)",
+    )
+    parser.add_argument("--users", type=int, default=N_USERS, help="default: %(default)s")
+    parser.add_argument("--weeks", type=int, default=N_WEEKS, help="default: %(default)s")
+    parser.add_argument("--seed", type=int, default=RNG_SEED, help="default: %(default)s")
+    parser.add_argument("--out", type=Path, default=OUT_DIR / "economy_forecast.csv", help="default: %(default)s")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sim.init_calibration()
+    grid = scenario_grid().set_index("scenario", drop=False)
+    names = [BASELINE_SCENARIO] + [s for s in dict.fromkeys(args.scenarios) if s != BASELINE_SCENARIO]
+    unknown = [s for s in names if s not in grid.index]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)} (see scenario_grid() in economy_simulation.py)")
+
+    beta0 = forecast_beta0(args.seed, min(args.users, N_SIM_USERS))
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.unlink(missing_ok=True)
+
+    final = {}
+    for name in names:
+        t0 = time.perf_counter()
+        for row in forecast_scenario(grid.loc[name], args.users, args.weeks, args.seed, beta0):
+            pd.DataFrame([row]).to_csv(args.out, mode="a", header=not args.out.exists(), index=False)
+            final[name] = row
+        print(f"{name}: {args.users:,} users x {args.weeks} weeks ({time.perf_counter() - t0:.2f}s)")
+
+    summary = pd.DataFrame(final.values())
+    base = final[BASELINE_SCENARIO]
+    summary["lift_cum_arpu_pct"] = 100.0 * (summary["cum_arpu"] / base["cum_arpu"] - 1.0)
+    summary["lift_retention_pct"] = 100.0 * (summary["retention"] / base["retention"] - 1.0)
+
+    print(f"\n=== WEEK {args.weeks} (cumulative ARPU and retention lift vs {BASELINE_SCENARIO}) ===")
+    print(summary[[
+        "scenario", "retention", "mean_balance", "shortfall_rate", "cum_arpu",
+        "lift_cum_arpu_pct", "lift_retention_pct",
+    ]].round(4).to_string(index=False))
+    print(f"\nSaved: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
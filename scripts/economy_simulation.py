@@ -1,8 +1,18 @@
+import argparse
+import hashlib
+import json
 import math
+import os
+import time
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 
+from scenario_cache import CACHE_MAX_BYTES, ScenarioCache
+from simulator_calibration import inputs_key, load_calibration
+
 OUT_DIR = Path("outputs")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -13,21 +23,53 @@ N_SIM_USERS = 200_000
 CONTROL_USERS = 457
 CONTROL_IAP_REVENUE = 284.50
 CONTROL_ADS_REVENUE = 28.658343
-
-BASE_IAP_ARPU = CONTROL_IAP_REVENUE / CONTROL_USERS
-BASE_ADS_ARPU = CONTROL_ADS_REVENUE / CONTROL_USERS
-BASE_ARPU_WEEK = BASE_IAP_ARPU + BASE_ADS_ARPU
+CONTROL_PAYERS = 34
+CONTROL_AD_IMPRESSIONS_PER_USER = 6.42
 
 BASE_COMPLETION = 0.4846
 BASE_WEEKLY_SESSIONS = 3.969365
-BASE_AD_IMPRESSIONS_PER_SESSION = 6.42 / BASE_WEEKLY_SESSIONS
-BASE_PAYER_RATE_WEEK = 34 / CONTROL_USERS
+
+
+def derived_baselines():
+    """(IAP ARPU, ads ARPU, ARPU, impressions/session, payer rate, revenue/impression, spend/payer)."""
+    iap_arpu = CONTROL_IAP_REVENUE / CONTROL_USERS
+    ads_arpu = CONTROL_ADS_REVENUE / CONTROL_USERS
+    impressions_per_session = CONTROL_AD_IMPRESSIONS_PER_USER / BASE_WEEKLY_SESSIONS
+    payer_rate = CONTROL_PAYERS / CONTROL_USERS
+    return (
+        iap_arpu,
+        ads_arpu,
+        iap_arpu + ads_arpu,
+        impressions_per_session,
+        payer_rate,
+        ads_arpu / (BASE_WEEKLY_SESSIONS * impressions_per_session),
+        # spend baseline (NO sink spend boost!)
+        iap_arpu / max(payer_rate, 1e-6),
+    )
+
+
+(BASE_IAP_ARPU, BASE_ADS_ARPU, BASE_ARPU_WEEK, BASE_AD_IMPRESSIONS_PER_SESSION, BASE_PAYER_RATE_WEEK,
+ REV_PER_IMPRESSION, BASE_SPEND_PER_PAYER) = derived_baselines()
 
 # A/B deltas at +20% reward
 AB_LIFT_COMPLETION = +0.0506
 AB_LIFT_SESSIONS = -0.1418
 AB_LIFT_IAP_REV = -0.1966
 
+# init_calibration() replaces the hand-copied values above with the ones measured
+# on the data by scripts/simulator_calibration.py (outputs/simulator_calibration.json,
+# recomputed when the input files change). Nothing is read at import time.
+SIM_CALIBRATION = None
+BASELINE_SOURCE = "hand-set defaults"
+AB_LIFT_SOURCE = "hand-set defaults"
+CALIBRATED = False
+
+# Bootstrap-calibrated deltas written by scripts/ab_evaluation.py; used instead
+# of the point lifts of SIM_CALIBRATION when measured on the same input files.
+AB_CALIBRATION = OUT_DIR / "ab_calibration.json"
+AB_EXPERIMENT = "reward_20pct_uplift"
+AB_VARIANT = "variant"
+
 # Model assumptions
 BASE_LEVELS_PER_SESSION = 1.05
 BETA_NEED = 1.25
@@ -36,6 +78,10 @@ BETA_NEED = 1.25
 GUARD_MIN_COMPLETION_LIFT = 2.0
 GUARD_MIN_ARPU_LIFT = -2.0
 GUARD_MIN_SESSIONS_LIFT = -3.0
+# replicate mode: ship when the guardrails pass in at least this share of replicates
+SHIP_MIN_PROB = 0.80
+CI_LEVEL = 0.95
+LIFT_COLUMNS = ["lift_completion_pct", "lift_sessions_pct", "lift_total_arpu_pct"]
 
 # Sink realism knobs
 SINK_NEED_ELASTICITY = 0.25     # was 0.65 (too strong)
@@ -44,58 +90,227 @@ SINK_FRICTION_SESS = 0.18       # sink increases friction -> sessions down a bit
 # Reward sessions effect softening
 REWARD_SESS_SOFTEN = 0.75       # <1 => less aggressive sessions drop
 
+# Scenario grid
+REWARD_GRID = [1.00, 1.05, 1.10, 1.15, 1.20]
+SINK_GRID = [1.00, 1.02, 1.04, 1.06, 1.08]
+# targeted grid (smaller reward on a segment)
+TARGETED_SETUPS = [
+    {"target_share": 0.35, "reward_mult_target": 1.20, "reward_mult_non": 1.00},
+    {"target_share": 0.35, "reward_mult_target": 1.15, "reward_mult_non": 1.00},
+    {"target_share": 0.25, "reward_mult_target": 1.20, "reward_mult_non": 1.00},
+]
+BASELINE_SCENARIO = "global_1.00_sink_1.00"
+
+# Grid engine: (scenarios x users) cells per block, scenarios per block
+GRID_CELLS = 1 << 21
+GRID_SCENARIO_BATCH = 64
+# inverse-CDF guide table resolution
+GUIDE_SIZE = 1024
+# Lean engine: users per chunk (peak memory scales with this, not with --users)
+LEAN_CHUNK_USERS = 1 << 20
+# Default --out per engine. The tracked v3 table comes from the loop engine,
+# so the other engines write next to it instead of over it.
+ENGINE_OUT = {
+    "loop": OUT_DIR / "economy_simulation_sensitivity_v3_realistic_sink.csv",
+    "grid": OUT_DIR / "economy_simulation_sensitivity_grid.csv",
+    "lean": OUT_DIR / "economy_simulation_sensitivity_lean.csv",
+}
+
+# Grid engine result cache: a scenario's row depends only on its own parameters,
+# MODEL_CONSTANTS, the seed and the user count. Bump CACHE_VERSION when the model
+# code (not just a constant) changes.
+SCENARIO_CACHE = OUT_DIR / "scenario_cache.sqlite"
+CACHE_VERSION = 1
+MODEL_CONSTANTS = [
+    "BASE_COMPLETION", "BASE_WEEKLY_SESSIONS", "BASE_AD_IMPRESSIONS_PER_SESSION", "BASE_PAYER_RATE_WEEK",
+    "REV_PER_IMPRESSION", "BASE_SPEND_PER_PAYER", "AB_LIFT_COMPLETION", "AB_LIFT_SESSIONS", "AB_LIFT_IAP_REV",
+    "BASE_LEVELS_PER_SESSION", "BETA_NEED", "SINK_NEED_ELASTICITY", "SINK_FRICTION_SESS", "REWARD_SESS_SOFTEN",
+]
+SCENARIO_PARAMS = ["target_share", "reward_mult_target", "reward_mult_non", "sink_multiplier"]
+RESULT_COLUMNS = [
+    "reward_multiplier_avg", "sink_multiplier", "sessions_per_user", "completion_rate",
+    "ads_arpu", "iap_arpu", "total_arpu", "payer_rate",
+]
+
+# Optimizer: search box, candidates in the first rung, keep 1 / OPT_ETA per rung,
+# first-rung users (x OPT_ETA per rung up to --users)
+OPT_BOUNDS = {
+    "target_share": (0.0, 1.0),
+    "reward_mult_target": (1.00, 1.30),
+    "reward_mult_non": (1.00, 1.30),
+    "sink_multiplier": (1.00, 1.10),
+}
+OPT_CANDIDATES = 1024
+OPT_ETA = 4
+OPT_MIN_USERS = 5_000
+
+
+def load_ab_lifts(calibration, path=AB_CALIBRATION, experiment=AB_EXPERIMENT, variant=AB_VARIANT):
+    """
+    (completion, sessions, iap revenue) lifts of a load_calibration() artifact
+    (None: hand-set defaults) and where they came from. The bootstrap lifts in
+    `path` win only if they were measured on the same input files.
+    """
+    defaults, source = (AB_LIFT_COMPLETION, AB_LIFT_SESSIONS, AB_LIFT_IAP_REV), "hand-set defaults"
+    if calibration is not None and calibration["lifts"]:
+        lifts = calibration["lifts"]
+        defaults = (lifts["AB_LIFT_COMPLETION"], lifts["AB_LIFT_SESSIONS"], lifts["AB_LIFT_IAP_REV"])
+        source = f"point lifts of {BASELINE_SOURCE}"
+    if not path.exists():
+        return defaults, source
+    ab = json.loads(path.read_text(encoding="utf-8"))
+    if calibration is None or ab.get("inputs_key") != inputs_key(calibration["inputs"]):
+        return defaults, f"{source} ({path} ignored: not measured on the calibrated data)"
+    deltas = ab["experiments"].get(experiment, {}).get(variant)
+    if deltas is None:
+        return defaults, f"{source} ({experiment}/{variant} not in {path})"
+    lifts = (deltas["AB_LIFT_COMPLETION"], deltas["AB_LIFT_SESSIONS"], deltas["AB_LIFT_IAP_REV"])
+    return lifts, f"{path} ({experiment}/{variant})"
+
+
+def init_calibration(calibration=None):
+    """
+    Rebind the baselines, the constants derived from them and the A/B lifts
+    to a load_calibration() artifact (None: load and, if the inputs changed,
+    recompute it). Runs once per process; main() of the simulator and of
+    economy_forecast.py call it, replicate workers get the parent's artifact.
+    """
+    global SIM_CALIBRATION, BASELINE_SOURCE, AB_LIFT_SOURCE, CALIBRATED
+    global CONTROL_USERS, CONTROL_IAP_REVENUE, CONTROL_ADS_REVENUE, CONTROL_PAYERS, CONTROL_AD_IMPRESSIONS_PER_USER
+    global BASE_COMPLETION, BASE_WEEKLY_SESSIONS
+    global BASE_IAP_ARPU, BASE_ADS_ARPU, BASE_ARPU_WEEK, BASE_AD_IMPRESSIONS_PER_SESSION, BASE_PAYER_RATE_WEEK
+    global REV_PER_IMPRESSION, BASE_SPEND_PER_PAYER
+    global AB_LIFT_COMPLETION, AB_LIFT_SESSIONS, AB_LIFT_IAP_REV
+    if CALIBRATED:
+        return
+    SIM_CALIBRATION = calibration or load_calibration()
+    if SIM_CALIBRATION is not None:
+        measured = SIM_CALIBRATION["baselines"]
+        CONTROL_USERS = measured["CONTROL_USERS"]
+        CONTROL_IAP_REVENUE = measured["CONTROL_IAP_REVENUE"]
+        CONTROL_ADS_REVENUE = measured["CONTROL_ADS_REVENUE"]
+        CONTROL_PAYERS = measured["CONTROL_PAYERS"]
+        CONTROL_AD_IMPRESSIONS_PER_USER = measured["CONTROL_AD_IMPRESSIONS_PER_USER"]
+        BASE_COMPLETION = measured["BASE_COMPLETION"]
+        BASE_WEEKLY_SESSIONS = measured["BASE_WEEKLY_SESSIONS"]
+        BASELINE_SOURCE = f"{SIM_CALIBRATION['data_dir']} (key {SIM_CALIBRATION['key'][:12]})"
+        (BASE_IAP_ARPU, BASE_ADS_ARPU, BASE_ARPU_WEEK, BASE_AD_IMPRESSIONS_PER_SESSION, BASE_PAYER_RATE_WEEK,
+         REV_PER_IMPRESSION, BASE_SPEND_PER_PAYER) = derived_baselines()
+    (AB_LIFT_COMPLETION, AB_LIFT_SESSIONS, AB_LIFT_IAP_REV), AB_LIFT_SOURCE = load_ab_lifts(SIM_CALIBRATION)
+    CALIBRATED = True
+
 
 def logistic(x):
     return 1 / (1 + np.exp(-x))
 
 
 def calibrate_beta0(target_rate, need):
-    lo, hi = -20.0, 20.0
-    for _ in range(60):
-        mid = (lo + hi) / 2
-        p = logistic(mid + BETA_NEED * need).mean()
-        if p < target_rate:
-            lo = mid
+    """
+    Intercept b with mean(logistic(b + BETA_NEED * need)) == target_rate.
+    need is a count (failed level starts), so the mean is taken over its
+    distinct values only, and solved with Newton steps (kept inside a
+    shrinking bisection bracket), a handful of iterations instead of 60.
+    The bracket comes from the need range: at logit(target) - BETA_NEED *
+    max(need) every user's rate is at most the target, at the min at least.
+    """
+    values, counts = np.unique(need, return_counts=True)
+    weights = counts / counts.sum()
+
+    logit = math.log(target_rate / (1 - target_rate))
+    lo, hi = logit - BETA_NEED * float(values[-1]), logit - BETA_NEED * float(values[0])
+    b = logit - BETA_NEED * float(weights @ values)
+    for _ in range(100):
+        p = logistic(b + BETA_NEED * values)
+        excess = float(weights @ p) - target_rate
+        if abs(excess) < 1e-14:
+            break
+        if excess < 0:
+            lo = b
         else:
-            hi = mid
-    return (lo + hi) / 2
+            hi = b
+        slope = float(weights @ (p * (1 - p)))
+        step = b - excess / slope if slope > 0 else lo - 1.0
+        b = step if lo < step < hi else (lo + hi) / 2
+    return b
 
 
-def simulate_week(rng, reward_multiplier, sink_multiplier=1.0,
-                  targeted=False, target_share=0.35,
-                  reward_mult_target=1.20, reward_mult_non=1.00):
-    n = N_SIM_USERS
+def calibration_key(seed, n_users=N_SIM_USERS, engine="loop"):
+    # everything the baseline population (reward 1.00, sink 1.00) depends on
+    return (engine, seed, n_users, BASE_COMPLETION, BASE_WEEKLY_SESSIONS, BASE_LEVELS_PER_SESSION,
+            BASE_PAYER_RATE_WEEK, BETA_NEED)
+
+
+_BETA0_CACHE = {}
+
+
+def baseline_beta0(seed=RNG_SEED, n_users=N_SIM_USERS):
+    """
+    beta0 fitted once on the baseline population (the reward 1.00 / sink 1.00
+    users drawn from `seed`) and cached by calibration_key(), so every
+    scenario of a grid shares the same payer model.
+    """
+    key = calibration_key(seed, n_users)
+    if key not in _BETA0_CACHE:
+        rng = np.random.default_rng(seed)
+        reward = np.ones(n_users)
+        _, level_starts, level_completes = simulate_levels(rng, reward, 1.0)
+        _BETA0_CACHE[key] = calibrate_beta0(BASE_PAYER_RATE_WEEK, level_starts - level_completes)
+    return _BETA0_CACHE[key]
 
-    # reward per user
-    if targeted:
-        is_target = rng.random(n) < target_share
-        reward = np.where(is_target, reward_mult_target, reward_mult_non)
-    else:
-        reward = np.full(n, reward_multiplier)
 
+def completion_prob(reward):
     # completion uplift (calibrated at 1.20)
     a = AB_LIFT_COMPLETION / math.log(1.20)
     p_complete = BASE_COMPLETION * (1 + a * np.log(reward))
-    p_complete = np.clip(p_complete, 0.05, 0.95)
+    return np.clip(p_complete, 0.05, 0.95)
 
+
+def session_rate(reward, sink_multiplier):
     # sessions impact from reward (softened)
     b = (AB_LIFT_SESSIONS * REWARD_SESS_SOFTEN) / math.log(1.20)
     lambda_sessions = BASE_WEEKLY_SESSIONS * (1 + b * np.log(reward))
 
     # add sink friction: sink>1 reduces sessions slightly
     lambda_sessions *= (1 - SINK_FRICTION_SESS * (sink_multiplier - 1.0))
-    lambda_sessions = np.clip(lambda_sessions, 0.3, 20.0)
+    return np.clip(lambda_sessions, 0.3, 20.0)
+
+
+def spend_erosion(reward):
+    # reward erosion on spend (calibrated to IAP rev drop at 1.20)
+    c = AB_LIFT_IAP_REV / math.log(1.20)
+    return np.clip(1 + c * np.log(reward), 0.2, 2.0)
+
+
+def simulate_levels(rng, reward, sink_multiplier):
+    n = len(reward)
+    p_complete = completion_prob(reward)
+    lambda_sessions = session_rate(reward, sink_multiplier)
 
     sessions = rng.poisson(lambda_sessions)
     levels_per_session = np.clip(rng.poisson(BASE_LEVELS_PER_SESSION, n), 1, 10)
 
     level_starts = sessions * levels_per_session
     level_completes = rng.binomial(level_starts, p_complete)
+    return sessions, level_starts, level_completes
+
+
+def simulate_week(rng, reward_multiplier, sink_multiplier=1.0,
+                  targeted=False, target_share=0.35,
+                  reward_mult_target=1.20, reward_mult_non=1.00, beta0=None, n_users=N_SIM_USERS):
+    n = n_users
+
+    # reward per user
+    if targeted:
+        is_target = rng.random(n) < target_share
+        reward = np.where(is_target, reward_mult_target, reward_mult_non)
+    else:
+        reward = np.full(n, reward_multiplier)
+
+    sessions, level_starts, level_completes = simulate_levels(rng, reward, sink_multiplier)
 
     # ads
     ads_impressions = rng.poisson(np.maximum(sessions * BASE_AD_IMPRESSIONS_PER_SESSION, 0))
-    rev_per_imp = BASE_ADS_ARPU / (BASE_WEEKLY_SESSIONS * BASE_AD_IMPRESSIONS_PER_SESSION)
-    ads_revenue = ads_impressions * rev_per_imp
+    ads_revenue = ads_impressions * REV_PER_IMPRESSION
 
     # need proxy
     need = (1 - (level_completes / np.maximum(level_starts, 1))) * level_starts
@@ -105,19 +320,15 @@ def simulate_week(rng, reward_multiplier, sink_multiplier=1.0,
     need_effective = need * (1 + SINK_NEED_ELASTICITY * (sink_multiplier - 1.0))
     need_effective = np.clip(need_effective, 0.0, None)
 
-    beta0 = calibrate_beta0(BASE_PAYER_RATE_WEEK, need)  # calibrated at baseline
+    if beta0 is None:
+        beta0 = baseline_beta0(n_users=n)  # calibrated once on the baseline population
     p_payer = logistic(beta0 + BETA_NEED * need_effective)
 
-    # spend baseline (NO sink spend boost!)
-    base_spend_per_payer = BASE_IAP_ARPU / max(BASE_PAYER_RATE_WEEK, 1e-6)
-
-    # reward erosion on spend (calibrated to IAP rev drop at 1.20)
-    c = AB_LIFT_IAP_REV / math.log(1.20)
-    spend_erosion = np.clip(1 + c * np.log(reward), 0.2, 2.0)
+    erosion = spend_erosion(reward)
 
     is_payer = rng.random(n) < p_payer
     spend = np.zeros(n)
-    spend[is_payer] = rng.gamma(shape=2.0, scale=base_spend_per_payer / 2.0, size=is_payer.sum()) * spend_erosion[is_payer]
+    spend[is_payer] = rng.gamma(shape=2.0, scale=BASE_SPEND_PER_PAYER / 2.0, size=is_payer.sum()) * erosion[is_payer]
 
     total_starts = level_starts.sum()
     total_completes = level_completes.sum()
@@ -135,8 +346,345 @@ def simulate_week(rng, reward_multiplier, sink_multiplier=1.0,
     }
 
 
+def simulate_week_lean(rng, reward_multiplier, sink_multiplier=1.0,
+                       targeted=False, target_share=0.35,
+                       reward_mult_target=1.20, reward_mult_non=1.00, beta0=None, n_users=N_SIM_USERS,
+                       chunk_users=LEAN_CHUNK_USERS):
+    """
+    simulate_week() with memory bounded by chunk_users. Users are exchangeable
+    within a reward class, so each chunk splits into the two classes with
+    scalar model inputs; only sessions, levels and completions are drawn per
+    user (int32 buffers, updated in place). Everything after that is drawn
+    from the sums: ads as one Poisson of total impressions, payers as a
+    binomial per distinct need value, spend as one gamma of all payers.
+    Same KPI distribution as simulate_week(), different random stream.
+    """
+    if beta0 is None:
+        beta0 = baseline_beta0(n_users=min(n_users, N_SIM_USERS))
+    need_mult = max(1 + SINK_NEED_ELASTICITY * (sink_multiplier - 1.0), 0.0)
+    if targeted:
+        classes = [(target_share, reward_mult_target), (1.0 - target_share, reward_mult_non)]
+    else:
+        classes = [(1.0, reward_multiplier)]
+
+    buf = np.empty(min(chunk_users, n_users), dtype=np.int32)
+    lps = np.empty_like(buf)
+    totals = dict.fromkeys(["reward", "sessions", "starts", "completes", "payers", "spend"], 0.0)
+    for lo in range(0, n_users, chunk_users):
+        remaining = min(chunk_users, n_users - lo)
+        for i, (share, reward) in enumerate(classes):
+            m = remaining if i == len(classes) - 1 else int(rng.binomial(remaining, share))
+            remaining -= m
+            if m == 0:
+                continue
+            sessions, levels = buf[:m], lps[:m]
+            sessions[:] = rng.poisson(float(session_rate(reward, sink_multiplier)), m)
+            np.clip(rng.poisson(BASE_LEVELS_PER_SESSION, m), 1, 10, out=levels, casting="unsafe")
+            totals["reward"] += reward * m
+            totals["sessions"] += int(sessions.sum(dtype=np.int64))
+
+            starts = np.multiply(sessions, levels, out=levels)
+            completes = rng.binomial(starts, float(completion_prob(reward)))
+            totals["starts"] += int(starts.sum(dtype=np.int64))
+            totals["completes"] += int(completes.sum())
+
+            need_counts = np.bincount(np.subtract(starts, completes, out=sessions, casting="unsafe"))
+            need_effective = np.arange(len(need_counts)) * need_mult
+            payers = int(rng.binomial(need_counts, logistic(beta0 + BETA_NEED * need_effective)).sum())
+            totals["payers"] += payers
+            if payers:
+                erosion = float(spend_erosion(reward))
+                totals["spend"] += rng.gamma(shape=2.0 * payers, scale=BASE_SPEND_PER_PAYER / 2.0) * erosion
+
+    ads_revenue = rng.poisson(totals["sessions"] * BASE_AD_IMPRESSIONS_PER_SESSION) * REV_PER_IMPRESSION
+    n = n_users
+    return {
+        "reward_multiplier_avg": totals["reward"] / n,
+        "sink_multiplier": float(sink_multiplier),
+        "sessions_per_user": totals["sessions"] / n,
+        "completion_rate": totals["completes"] / max(totals["starts"], 1),
+        "ads_arpu": ads_revenue / n,
+        "iap_arpu": totals["spend"] / n,
+        "total_arpu": (ads_revenue + totals["spend"]) / n,
+        "payer_rate": totals["payers"] / n,
+        "scenario": None,
+    }
+
+
+def grid_label(x):
+    # 2 decimals for the hand-made grids, 4 for dense sweeps
+    return f"{x:.2f}" if abs(x - round(x, 2)) < 1e-9 else f"{x:.4f}"
+
+
+def scenario_grid(reward_grid=REWARD_GRID, sink_grid=SINK_GRID, targeted_setups=TARGETED_SETUPS):
+    """
+    One row per scenario: baseline first, then the global reward x sink grid
+    and the targeted setups x sink grid. Global scenarios have
+    reward_mult_target == reward_mult_non.
+    """
+    rows = [{"scenario": BASELINE_SCENARIO, "targeted": False, "target_share": 0.0,
+             "reward_mult_target": 1.00, "reward_mult_non": 1.00, "sink_multiplier": 1.00}]
+    for r in reward_grid:
+        for s in sink_grid:
+            if grid_label(r) == "1.00" and grid_label(s) == "1.00":
+                continue
+            rows.append({"scenario": f"global_{grid_label(r)}_sink_{grid_label(s)}", "targeted": False,
+                         "target_share": 0.0, "reward_mult_target": r, "reward_mult_non": r,
+                         "sink_multiplier": s})
+    for s in sink_grid:
+        for t in targeted_setups:
+            rows.append({
+                "scenario": f"targeted_share{t['target_share']:.2f}_t{t['reward_mult_target']:.2f}_sink_{grid_label(s)}",
+                "targeted": True,
+                **t,
+                "sink_multiplier": s,
+            })
+    return pd.DataFrame(rows)
+
+
+def simulate_loop(rng, scenarios, beta0, n_users=N_SIM_USERS, week=simulate_week):
+    """Reference engine: one simulate_week() call (fresh draws) per scenario."""
+    rows = []
+    for sc in scenarios.itertuples(index=False):
+        k = week(
+            rng, sc.reward_mult_non, sc.sink_multiplier,
+            targeted=sc.targeted,
+            target_share=sc.target_share,
+            reward_mult_target=sc.reward_mult_target,
+            reward_mult_non=sc.reward_mult_non,
+            beta0=beta0,
+            n_users=n_users,
+        )
+        k["scenario"] = sc.scenario
+        rows.append(k)
+    return pd.DataFrame(rows)
+
+
+def log_factorials(k_max):
+    return np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, k_max + 1)))])
+
+
+def poisson_cdf_table(lam, k_max):
+    """cdf[i, k] = P(Poisson(lam[i]) <= k), k = 0..k_max, last column forced to 1."""
+    lam = np.asarray(lam, dtype=np.float64)[:, None]
+    k = np.arange(k_max + 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pmf = np.exp(k * np.log(lam) - lam - log_factorials(k_max))
+    pmf = np.where(lam > 0, pmf, k == 0)
+    cdf = np.cumsum(pmf, axis=1)
+    cdf[:, -1] = 1.0
+    return cdf
+
+
+def binomial_cdf_table(p, m_max):
+    """cdf[i, m, k] = P(Binomial(m, p[i]) <= k) for m, k = 0..m_max."""
+    m = np.arange(m_max + 1)[:, None]
+    k = np.arange(m_max + 1)[None, :]
+    lf = log_factorials(m_max)
+    valid = k <= m
+    log_choose = np.where(valid, lf[m] - lf[k] - lf[np.where(valid, m - k, 0)], -np.inf)
+    p = np.asarray(p, dtype=np.float64)[:, None, None]
+    pmf = np.exp(log_choose + k * np.log(p) + np.where(valid, m - k, 0) * np.log1p(-p))
+    return np.where(valid, np.cumsum(pmf, axis=2), 1.0)
+
+
+def inverse_cdf(cdf, rows, u):
+    """
+    Smallest k with cdf[rows, k] >= u, for any number of rows at once.
+
+    A guide table (the answer at u = j / GUIDE_SIZE for every row, found
+    with one searchsorted over the rows flattened side by side) gives a
+    starting k that is at most a step or two short; the remaining steps are
+    taken in vectorized passes over the cells that still need them.
+    """
+    width = cdf.shape[-1]
+    cdf = cdf.reshape(-1, width)
+    offsets = 2.0 * np.arange(len(cdf))
+    grid = np.arange(GUIDE_SIZE) / GUIDE_SIZE
+    guide = np.searchsorted((cdf + offsets[:, None]).ravel(), (offsets[:, None] + grid).ravel())
+    guide = guide.reshape(len(cdf), GUIDE_SIZE) - np.arange(len(cdf))[:, None] * width
+
+    flat = cdf.ravel()
+    base = rows * width
+    pos = base + guide[rows, (u * GUIDE_SIZE).astype(np.intp)]
+    cells, u_cells = pos.reshape(-1), np.broadcast_to(u, pos.shape).reshape(-1)
+    todo = np.flatnonzero(flat[cells] < u_cells)
+    while len(todo):
+        cells[todo] += 1
+        todo = todo[flat[cells[todo]] < u_cells[todo]]
+    return pos - base
+
+
+def crn_draws(seed, n_users):
+    """
+    Per-user base draws shared by every scenario (common random numbers).
+    Scenarios turn them into outcomes by inverse CDF, so a user keeps the
+    same "luck" across the grid and lifts are differences of paired draws.
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        "u_target": rng.random(n_users),
+        "u_sessions": rng.random(n_users),
+        "levels_per_session": np.clip(rng.poisson(BASE_LEVELS_PER_SESSION, n_users), 1, 10),
+        "u_complete": rng.random(n_users),
+        "u_ads": rng.random(n_users),
+        "u_payer": rng.random(n_users),
+        "spend": rng.gamma(shape=2.0, scale=BASE_SPEND_PER_PAYER / 2.0, size=n_users),
+    }
+
+
+def scenario_arrays(scenarios):
+    """Per (scenario, class) model inputs, class 0 = targeted users, 1 = the rest."""
+    reward = scenarios[["reward_mult_target", "reward_mult_non"]].to_numpy(np.float64)
+    sink = scenarios["sink_multiplier"].to_numpy(np.float64)
+    return {
+        "share": scenarios["target_share"].to_numpy(np.float64),
+        "reward": reward,
+        "lam": session_rate(reward, sink[:, None]),
+        "p_complete": completion_prob(reward),
+        "erosion": spend_erosion(reward),
+        # sink increases effective need a bit (NOT huge)
+        "need_mult": 1 + SINK_NEED_ELASTICITY * (sink - 1.0),
+    }
+
+
+GRID_TOTALS = ["reward", "sessions", "level_starts", "level_completes", "ads_revenue", "spend", "payers"]
+
+
+def simulate_block(draws, users, arrays, tables, beta0):
+    """
+    Outcomes of a (scenarios x users) block, summed over its users, in
+    GRID_TOTALS order. Also returns the need of every cell.
+    """
+    n_sc = len(arrays["share"])
+    cls = (draws["u_target"][users] >= arrays["share"][:, None]).astype(np.intp)
+    row = np.arange(n_sc)[:, None] * 2 + cls
+
+    sessions = inverse_cdf(tables["sessions"], row, draws["u_sessions"][users])
+    level_starts = sessions * draws["levels_per_session"][users]
+    m_max = int(level_starts.max())
+    p_values, p_row = tables["p_complete"]
+    binom = binomial_cdf_table(p_values, m_max)
+    level_completes = inverse_cdf(binom, p_row[row] * (m_max + 1) + level_starts, draws["u_complete"][users])
+    ads_impressions = inverse_cdf(tables["ads"], sessions, draws["u_ads"][users])
+
+    need = level_starts - level_completes
+    need_effective = np.clip(need * arrays["need_mult"][:, None], 0.0, None)
+    is_payer = draws["u_payer"][users] < logistic(beta0 + BETA_NEED * need_effective)
+    spend = np.where(is_payer, draws["spend"][users] * arrays["erosion"].ravel()[row], 0.0)
+
+    totals = np.column_stack([
+        arrays["reward"].ravel()[row].sum(axis=1),
+        sessions.sum(axis=1),
+        level_starts.sum(axis=1),
+        level_completes.sum(axis=1),
+        ads_impressions.sum(axis=1) * REV_PER_IMPRESSION,
+        spend.sum(axis=1),
+        is_payer.sum(axis=1),
+    ])
+    return totals, need
+
+
+def grid_tables(arrays):
+    lam = arrays["lam"].ravel()
+    k_sessions = int(lam.max() + 12 * math.sqrt(lam.max()) + 12)
+    ads_lam = np.arange(k_sessions + 1) * BASE_AD_IMPRESSIONS_PER_SESSION
+    k_ads = int(ads_lam.max() + 12 * math.sqrt(ads_lam.max()) + 12)
+    p_values, p_row = np.unique(arrays["p_complete"].ravel(), return_inverse=True)
+    return {
+        "sessions": poisson_cdf_table(lam, k_sessions),
+        "ads": poisson_cdf_table(ads_lam, k_ads),
+        "p_complete": (p_values, p_row.ravel()),
+    }
+
+
+def grid_beta0(draws, seed):
+    """beta0 calibrated on the grid engine's own baseline population (cached)."""
+    n_users = len(draws["u_sessions"])
+    key = calibration_key(seed, n_users, engine="grid")
+    if key not in _BETA0_CACHE:
+        arrays = scenario_arrays(scenario_grid([], [], []))
+        tables = grid_tables(arrays)
+        need = np.concatenate([
+            simulate_block(draws, slice(lo, lo + GRID_CELLS), arrays, tables, 0.0)[1].ravel()
+            for lo in range(0, n_users, GRID_CELLS)
+        ])
+        _BETA0_CACHE[key] = calibrate_beta0(BASE_PAYER_RATE_WEEK, need)
+    return _BETA0_CACHE[key]
+
+
+def simulate_grid(scenarios, draws, beta0):
+    """
+    Batched engine: every scenario is evaluated on the same per-user draws
+    (crn_draws), GRID_SCENARIO_BATCH scenarios x GRID_CELLS / batch users at
+    a time, so memory is bounded whatever the grid or population size.
+    Returns the same columns as simulate_week(), one row per scenario.
+    """
+    n_users = len(draws["u_sessions"])
+    totals = np.zeros((len(scenarios), len(GRID_TOTALS)))
+    for s0 in range(0, len(scenarios), GRID_SCENARIO_BATCH):
+        batch = scenarios.iloc[s0:s0 + GRID_SCENARIO_BATCH]
+        arrays = scenario_arrays(batch)
+        tables = grid_tables(arrays)
+        chunk = max(1, GRID_CELLS // len(batch))
+        for lo in range(0, n_users, chunk):
+            block, _ = simulate_block(draws, slice(lo, lo + chunk), arrays, tables, beta0)
+            totals[s0:s0 + len(batch)] += block
+
+    t = pd.DataFrame(totals, columns=GRID_TOTALS)
+    return pd.DataFrame({
+        "reward_multiplier_avg": t["reward"] / n_users,
+        "sink_multiplier": scenarios["sink_multiplier"].to_numpy(np.float64),
+        "sessions_per_user": t["sessions"] / n_users,
+        "completion_rate": t["level_completes"] / t["level_starts"].clip(lower=1),
+        "ads_arpu": t["ads_revenue"] / n_users,
+        "iap_arpu": t["spend"] / n_users,
+        "total_arpu": (t["ads_revenue"] + t["spend"]) / n_users,
+        "payer_rate": t["payers"] / n_users,
+        "scenario": scenarios["scenario"].to_numpy(),
+    })
+
+
+def seed_token(seed):
+    # ints as is, SeedSequence children by what they draw from
+    if isinstance(seed, np.random.SeedSequence):
+        return [seed.entropy, list(seed.spawn_key)]
+    return seed
+
+
+def scenario_keys(scenarios, seed, n_users):
+    """Cache key of every scenario row: a digest of all its grid engine result depends on."""
+    common = [CACHE_VERSION, {name: globals()[name] for name in MODEL_CONSTANTS}, seed_token(seed), n_users]
+    return [
+        hashlib.blake2b(json.dumps([common, params]).encode("utf-8"), digest_size=16).digest()
+        for params in scenarios[SCENARIO_PARAMS].to_numpy(np.float64).tolist()
+    ]
+
+
+def simulate_grid_cached(scenarios, seed, n_users, cache):
+    """
+    simulate_grid() that only simulates the scenarios missing from `cache`
+    (a ScenarioCache) and stores them. Returns (df, beta0), beta0 None when
+    every row came from the cache.
+    """
+    keys = scenario_keys(scenarios, seed, n_users)
+    rows = cache.get_many(keys)
+    todo = [i for i, key in enumerate(keys) if key not in rows]
+    beta0 = None
+    if todo:
+        draws = crn_draws(seed, n_users)
+        beta0 = grid_beta0(draws, seed)
+        fresh = simulate_grid(scenarios.iloc[todo].reset_index(drop=True), draws, beta0)
+        fresh_rows = dict(zip([keys[i] for i in todo], fresh[RESULT_COLUMNS].to_numpy(np.float64)))
+        cache.put_many(fresh_rows)
+        rows.update(fresh_rows)
+    df = pd.DataFrame([rows[key] for key in keys], columns=RESULT_COLUMNS)
+    df["scenario"] = scenarios["scenario"].to_numpy()
+    return df, beta0
+
+
 def add_lifts(df):
-    base = df[df["scenario"] == "global_1.00_sink_1.00"].iloc[0]
+    base = df[df["scenario"] == BASELINE_SCENARIO].iloc[0]
 
     def lift(col):
         return 100.0 * (df[col] - base[col]) / (base[col] if base[col] != 0 else np.nan)
@@ -153,52 +701,243 @@ def add_lifts(df):
     return df
 
 
+def guard_violation(df):
+    """How far (in lift pct points) a scenario misses the GUARD_MIN_* guardrails; 0 = ship candidate."""
+    return (
+        (GUARD_MIN_COMPLETION_LIFT - df["lift_completion_pct"]).clip(lower=0) +
+        (GUARD_MIN_ARPU_LIFT - df["lift_total_arpu_pct"]).clip(lower=0) +
+        (GUARD_MIN_SESSIONS_LIFT - df["lift_sessions_pct"]).clip(lower=0)
+    ).fillna(np.inf)
+
+
+def sample_scenarios(rng, n, bounds=OPT_BOUNDS):
+    """n configurations Latin-hypercube sampled from bounds, in scenario_grid() columns."""
+    cols = {}
+    for name, (lo, hi) in bounds.items():
+        u = (rng.permutation(n) + rng.random(n)) / n
+        cols[name] = lo + (hi - lo) * u
+    df = pd.DataFrame(cols)
+    df.insert(1, "targeted", True)
+    df.insert(0, "scenario", [
+        f"opt_share{r.target_share:.2f}_t{r.reward_mult_target:.4f}_n{r.reward_mult_non:.4f}_sink_{r.sink_multiplier:.4f}"
+        for r in df.itertuples(index=False)
+    ])
+    return df
+
+
+def successive_halving(candidates, n_users, seed=RNG_SEED, eta=OPT_ETA, min_users=OPT_MIN_USERS, cache=None):
+    """
+    Maximize lift_total_arpu_pct subject to the guardrails. Every rung
+    simulates the surviving candidates (grid engine, next to the baseline)
+    and keeps the best 1 / eta: ship candidates by ARPU lift, then the
+    rest by guardrail violation. Users grow eta-fold per rung, so only the
+    last few candidates are run on the full n_users.
+    Rungs go through `cache` (a ScenarioCache) when given.
+    Returns (last rung results, per-rung log).
+    """
+    baseline = scenario_grid([], [], [])
+    users = min(min_users, n_users)
+    log = []
+    while True:
+        last = users >= n_users or len(candidates) <= eta
+        if last:
+            users = n_users
+        df, _ = run_scenarios(pd.concat([baseline, candidates], ignore_index=True), seed, users, "grid", cache)
+        df = df.iloc[1:].reset_index(drop=True)
+        df["guard_violation"] = guard_violation(df)
+        df = df.sort_values(["guard_violation", "lift_total_arpu_pct"], ascending=[True, False])
+        log.append({"users": users, "candidates": len(df), "scenario_users": users * (len(df) + 1)})
+        if last:
+            return df.merge(candidates, on=["scenario", "sink_multiplier"]), log
+        keep = df["scenario"].head(max(1, len(df) // eta))
+        candidates = candidates[candidates["scenario"].isin(keep)].reset_index(drop=True)
+        users *= eta
+
+
+def pareto_front(df, cols=("lift_total_arpu_pct", "lift_completion_pct")):
+    """Rows not dominated on every column of cols (higher is better)."""
+    x = df[list(cols)].to_numpy()
+    dominated = ((x[None, :, :] >= x[:, None, :]).all(axis=2) & (x[None, :, :] > x[:, None, :]).any(axis=2)).any(axis=1)
+    return ~dominated
+
+
+def run_scenarios(scenarios, seed, n_users, engine="grid", cache=None):
+    """
+    One simulation of every scenario from `seed` (an int or a SeedSequence),
+    with lifts. The grid engine reuses rows of `cache` (a ScenarioCache) when
+    given. Returns (df, beta0).
+    """
+    if engine == "grid" and cache is not None:
+        df, beta0 = simulate_grid_cached(scenarios, seed, n_users, cache)
+    elif engine == "grid":
+        draws = crn_draws(seed, n_users)
+        beta0 = grid_beta0(draws, seed)
+        df = simulate_grid(scenarios, draws, beta0)
+    elif engine == "lean":
+        beta0 = baseline_beta0(seed, min(n_users, N_SIM_USERS))
+        df = simulate_loop(np.random.default_rng(seed), scenarios, beta0, n_users, week=simulate_week_lean)
+    else:
+        beta0 = baseline_beta0(seed, n_users)
+        df = simulate_loop(np.random.default_rng(seed), scenarios, beta0, n_users)
+    return add_lifts(df), beta0
+
+
+def run_replicate(scenarios, seed, n_users, engine="grid"):
+    df, _ = run_scenarios(scenarios, seed, n_users, engine)
+    return df[["scenario", *LIFT_COLUMNS, "ship_candidate"]]
+
+
+def run_replicates(scenarios, replicates, seed=RNG_SEED, n_users=N_SIM_USERS, engine="grid", workers=1):
+    """
+    `replicates` independent runs of the whole grid, one SeedSequence.spawn()
+    child each, so replicate i draws the same numbers whatever the number of
+    workers. Returns the stacked lifts with a `replicate` column.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(replicates)
+    jobs = [(scenarios, s, n_users, engine) for s in seeds]
+    if workers == 1:
+        runs = [run_replicate(*job) for job in jobs]
+    else:
+        # spawned workers re-import this module: hand them the parent's calibration, if any
+        init = {"initializer": init_calibration, "initargs": (SIM_CALIBRATION,)} if CALIBRATED else {}
+        with ProcessPoolExecutor(max_workers=workers, **init) as pool:
+            runs = list(pool.map(run_replicate, *zip(*jobs)))
+    return pd.concat(runs, keys=range(replicates), names=["replicate"]).reset_index(level=0)
+
+
+def summarize_replicates(reps, scenarios, ci=CI_LEVEL, ship_min_prob=SHIP_MIN_PROB):
+    """
+    Per scenario: mean lift and percentile CI over the replicates, and the
+    share of replicates where every guardrail passed. A scenario ships when
+    that probability reaches ship_min_prob.
+    """
+    tail = (1.0 - ci) / 2.0
+    g = reps.groupby("scenario", sort=False)
+    out = scenarios.set_index("scenario")
+    for col in LIFT_COLUMNS:
+        out[col] = g[col].mean()
+        out[f"{col}_ci_low"] = g[col].quantile(tail)
+        out[f"{col}_ci_high"] = g[col].quantile(1.0 - tail)
+    out["p_guardrails_pass"] = g["ship_candidate"].mean()
+    out["ship_candidate"] = out["p_guardrails_pass"] >= ship_min_prob
+    out.insert(0, "replicates", g.size())
+    return out.reset_index()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Reward / sink economy simulation over a scenario grid.")
+    parser.add_argument(
+        "--engine",
+        choices=["grid", "loop", "lean"],
+        default="grid",
+        help="grid: all scenarios on common random numbers in batched blocks; "
+        "loop: one simulate_week() per scenario; "
+        "lean: simulate_week_lean() per scenario, memory bounded for any --users (default: %(default)s)",
+    )
+    parser.add_argument("--users", type=int, default=N_SIM_USERS, help="simulated users (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=RNG_SEED, help="default: %(default)s")
+    parser.add_argument(
+        "--reward-steps",
+        type=int,
+        help=f"sweep this many rewards between {REWARD_GRID[0]:.2f} and {REWARD_GRID[-1]:.2f} instead of {REWARD_GRID}",
+    )
+    parser.add_argument(
+        "--sink-steps",
+        type=int,
+        help=f"sweep this many sinks between {SINK_GRID[0]:.2f} and {SINK_GRID[-1]:.2f} instead of {SINK_GRID}",
+    )
+    parser.add_argument(
+        "--optimize",
+        type=int,
+        nargs="?",
+        const=OPT_CANDIDATES,
+        metavar="N",
+        help="successive halving over N sampled configurations instead of the grid "
+        f"(default N: {OPT_CANDIDATES}; see OPT_BOUNDS)",
+    )
+    parser.add_argument(
+        "--replicates",
+        type=int,
+        default=1,
+        help="independent runs per scenario; above 1, report mean lifts, CIs and "
+        "P(guardrails pass) instead of a single run (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="processes running replicates (default: %(default)s)",
+    )
+    parser.add_argument("--ci", type=float, default=CI_LEVEL, help="replicate CI level (default: %(default)s)")
+    parser.add_argument(
+        "--ship-prob",
+        type=float,
+        default=SHIP_MIN_PROB,
+        help="min P(guardrails pass) for a ship candidate in replicate mode (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=SCENARIO_CACHE,
+        help="grid engine scenario result cache (default: %(default)s)",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="simulate every scenario")
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=CACHE_MAX_BYTES / (1 << 20),
+        help="evict least recently used results beyond this size (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--out",
+        type=Path,
+        help="default: outputs/economy_simulation_sensitivity_grid.csv (grid), "
+        "outputs/economy_simulation_sensitivity_v3_realistic_sink.csv (loop), "
+        "outputs/economy_simulation_sensitivity_lean.csv (lean), "
+        "outputs/economy_simulation_replicates.csv with --replicates, "
+        "or outputs/economy_simulation_optimizer.csv with --optimize",
+    )
+    return parser.parse_args()
+
+
 def main():
-    rng = np.random.default_rng(RNG_SEED)
+    args = parse_args()
+    init_calibration()
+    print(f"Baselines from {BASELINE_SOURCE}: completion {BASE_COMPLETION:.4f}, sessions {BASE_WEEKLY_SESSIONS:.4f}, "
+          f"payer rate {BASE_PAYER_RATE_WEEK:.4f}, ARPU {BASE_ARPU_WEEK:.4f}")
+    print(
+        f"A/B lifts from {AB_LIFT_SOURCE}: completion {AB_LIFT_COMPLETION:+.4f}, "
+        f"sessions {AB_LIFT_SESSIONS:+.4f}, IAP revenue {AB_LIFT_IAP_REV:+.4f}"
+    )
 
-    reward_grid = [1.00, 1.05, 1.10, 1.15, 1.20]
-    sink_grid = [1.00, 1.02, 1.04, 1.06, 1.08]
+    if args.optimize:
+        with open_cache(args, "grid") as cache:
+            optimize_main(args, cache)
+        return
 
-    rows = []
+    reward_grid = REWARD_GRID
+    if args.reward_steps:
+        reward_grid = np.linspace(REWARD_GRID[0], REWARD_GRID[-1], args.reward_steps)
+    sink_grid = SINK_GRID
+    if args.sink_steps:
+        sink_grid = np.linspace(SINK_GRID[0], SINK_GRID[-1], args.sink_steps)
+    scenarios = scenario_grid(reward_grid, sink_grid, TARGETED_SETUPS)
 
-    # baseline
-    k = simulate_week(rng, 1.00, 1.00)
-    k["scenario"] = "global_1.00_sink_1.00"
-    rows.append(k)
+    if args.replicates > 1:
+        replicate_main(args, scenarios)
+        return
 
-    # global grid
-    for r in reward_grid:
-        for s in sink_grid:
-            if r == 1.00 and s == 1.00:
-                continue
-            k = simulate_week(rng, r, s, targeted=False)
-            k["scenario"] = f"global_{r:.2f}_sink_{s:.2f}"
-            rows.append(k)
-
-    # targeted grid (smaller reward on a segment)
-    targeted_setups = [
-        {"target_share": 0.35, "reward_mult_target": 1.20, "reward_mult_non": 1.00},
-        {"target_share": 0.35, "reward_mult_target": 1.15, "reward_mult_non": 1.00},
-        {"target_share": 0.25, "reward_mult_target": 1.20, "reward_mult_non": 1.00},
-    ]
-    for s in sink_grid:
-        for t in targeted_setups:
-            k = simulate_week(
-                rng, 1.00, s,
-                targeted=True,
-                target_share=t["target_share"],
-                reward_mult_target=t["reward_mult_target"],
-                reward_mult_non=t["reward_mult_non"]
-            )
-            k["scenario"] = f"targeted_share{t['target_share']:.2f}_t{t['reward_mult_target']:.2f}_sink_{s:.2f}"
-            rows.append(k)
-
-    df = pd.DataFrame(rows)
-    df = add_lifts(df)
-
-    out_csv = OUT_DIR / "economy_simulation_sensitivity_v3_realistic_sink.csv"
-    df.to_csv(out_csv, index=False)
+    t0 = time.perf_counter()
+    with open_cache(args, args.engine) as cache:
+        df, beta0 = run_scenarios(scenarios, args.seed, args.users, args.engine, cache)
+    if beta0 is not None:
+        print(f"Calibrated beta0 = {beta0:.6f} on the baseline population")
+    print(f"Simulated {len(df):,} scenarios x {args.users:,} users ({args.engine} engine, {time.perf_counter() - t0:.2f}s)")
+    print_cache_stats(cache)
 
+    out_csv = args.out or ENGINE_OUT[args.engine]
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(out_csv, index=False)
     best = df.sort_values(
         ["ship_candidate", "lift_total_arpu_pct", "lift_completion_pct"],
         ascending=[False, False, False]
@@ -222,5 +961,83 @@ def main():
     print(f"\nSaved: {out_csv}")
 
 
+def open_cache(args, engine):
+    """ScenarioCache context for the grid engine unless --no-cache; a no-op context otherwise."""
+    if engine != "grid" or args.no_cache:
+        return nullcontext()
+    return ScenarioCache(args.cache, int(args.cache_max_mb * (1 << 20)))
+
+
+def print_cache_stats(cache):
+    if cache is not None:
+        print(f"Scenario cache {cache.path}: {cache.hits:,} cached, {cache.misses:,} simulated")
+
+
+def optimize_main(args, cache=None):
+    t0 = time.perf_counter()
+    candidates = sample_scenarios(np.random.default_rng(args.seed), args.optimize)
+    df, log = successive_halving(candidates, args.users, args.seed, cache=cache)
+    df["pareto"] = pareto_front(df)
+    cost = sum(r["scenario_users"] for r in log)
+    print(
+        f"Successive halving: {args.optimize} candidates -> {len(df)} on {args.users:,} users "
+        f"({time.perf_counter() - t0:.2f}s)"
+    )
+    for r in log:
+        print(f"  {r['candidates']:>6} candidates x {r['users']:>9,} users")
+    print(
+        f"{cost:,} simulated user-scenarios, {cost / ((args.optimize + 1) * args.users):.1%} of running "
+        f"every candidate on {args.users:,} users"
+    )
+    print_cache_stats(cache)
+
+    out_csv = args.out or OUT_DIR / "economy_simulation_optimizer.csv"
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(out_csv, index=False)
+
+    feasible = df[df["guard_violation"] == 0]
+    print(f"\n=== SURVIVORS ({len(feasible)} pass every guardrail; ranked by violation, ARPU lift) ===")
+    print(df[[
+        "scenario", "target_share", "reward_mult_target", "reward_mult_non", "sink_multiplier",
+        "lift_completion_pct", "lift_sessions_pct", "lift_total_arpu_pct", "guard_violation", "pareto"
+    ]].round(4).to_string(index=False))
+    print(f"\nSaved: {out_csv}")
+
+
+def replicate_main(args, scenarios):
+    t0 = time.perf_counter()
+    reps = run_replicates(scenarios, args.replicates, args.seed, args.users, args.engine, args.workers)
+    df = summarize_replicates(reps, scenarios, args.ci, args.ship_prob)
+    print(
+        f"Simulated {len(df):,} scenarios x {args.users:,} users x {args.replicates} replicates "
+        f"({args.engine} engine, {args.workers} workers, {time.perf_counter() - t0:.2f}s)"
+    )
+
+    out_csv = args.out or OUT_DIR / "economy_simulation_replicates.csv"
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(out_csv, index=False)
+    best = df.sort_values(
+        ["p_guardrails_pass", "lift_total_arpu_pct", "lift_completion_pct"],
+        ascending=[False, False, False]
+    ).head(15)
+
+    print(f"\n=== TOP 15 SCENARIOS (P(guardrails pass), mean ARPU lift; {args.ci:.0%} CI) ===")
+    print(best[[
+        "scenario", "p_guardrails_pass",
+        "lift_completion_pct", "lift_completion_pct_ci_low", "lift_completion_pct_ci_high",
+        "lift_sessions_pct", "lift_sessions_pct_ci_low", "lift_sessions_pct_ci_high",
+        "lift_total_arpu_pct", "lift_total_arpu_pct_ci_low", "lift_total_arpu_pct_ci_high",
+    ]].round(4).to_string(index=False))
+
+    ships = df[df["ship_candidate"]].sort_values("lift_total_arpu_pct", ascending=False)
+    print(f"\nShip candidates (P(guardrails pass) >= {args.ship_prob:.0%}): {len(ships)}")
+    if len(ships) > 0:
+        print(ships[[
+            "scenario", "p_guardrails_pass", "lift_completion_pct", "lift_sessions_pct", "lift_total_arpu_pct"
+        ]].round(4).head(20).to_string(index=False))
+
+    print(f"\nSaved: {out_csv}")
+
+
 if __name__ == "__main__":
     main()
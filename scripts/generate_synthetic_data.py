@@ -1,303 +1,812 @@
-from __future__ import annotations
-
-import os
-from pathlib import Path
-import numpy as np
-import pandas as pd
-
-
-# -----------------------------
-# Global config
-# -----------------------------
-SEED = 42
-rng = np.random.default_rng(SEED)
-
-N_USERS = 2000
-
-START_DATE = pd.Timestamp("2025-10-01")
-END_DATE = pd.Timestamp("2025-12-31")
-DAYS = int((END_DATE - START_DATE).days) + 1
-
-TEST_START = pd.Timestamp("2025-11-10")
-TEST_END = pd.Timestamp("2025-12-08")
-TEST_NAME = "reward_20pct_uplift"
-
-BASE_REWARD = 100
-VARIANT_REWARD_MULT = 1.20
-
-REWARDED_ECPM = 12.0
-INTER_ECPM = 6.0
-
-
-def sigmoid(x):
-    return 1 / (1 + np.exp(-x))
-
-
-def project_root() -> Path:
-
-    return Path(__file__).resolve().parents[1]
-
-
-def ensure_dir(p: Path) -> None:
-    p.mkdir(parents=True, exist_ok=True)
-
-
-def minutes_random(n: int) -> pd.TimedeltaIndex:
-    return pd.to_timedelta(rng.integers(0, 24 * 60, size=n), unit="m")
-
-
-def main():
-    root = project_root()
-    out_dir = root / "data"
-    ensure_dir(out_dir)
-
-    print("📌 Project root:", root)
-    print("📌 Output dir  :", out_dir)
-
-    # -----------------------------
-    # USERS
-    # -----------------------------
-    user_ids = np.arange(1, N_USERS + 1, dtype=np.int64)
-
-    weights = np.linspace(1.0, 1.8, DAYS)
-    weights = weights / weights.sum()
-
-    install_day_offsets = rng.choice(np.arange(DAYS), size=N_USERS, p=weights)
-    install_dates = START_DATE + pd.to_timedelta(install_day_offsets, unit="D")
-
-    countries = rng.choice(["TR", "US", "DE", "BR", "GB"], size=N_USERS, p=[0.45, 0.20, 0.12, 0.13, 0.10])
-    platforms = rng.choice(["iOS", "Android"], size=N_USERS, p=[0.45, 0.55])
-
-    skill = rng.normal(0.0, 1.0, size=N_USERS)
-
-    spender_propensity = sigmoid(
-        rng.normal(-1.2, 0.9, size=N_USERS)
-        + 0.25 * (countries == "US")
-        + 0.10 * (platforms == "iOS")
-    )
-
-    ad_affinity = sigmoid(rng.normal(0.0, 1.0, size=N_USERS))
-
-    users = pd.DataFrame(
-        {
-            "user_id": user_ids,
-            "install_ts": install_dates + minutes_random(N_USERS),
-            "country": countries,
-            "platform": platforms,
-            "trait_skill": skill,
-            "trait_spender_propensity": spender_propensity,
-            "trait_ad_affinity": ad_affinity,
-        }
-    )
-
-    # -----------------------------
-    # A/B ASSIGNMENTS (robust)
-    # -----------------------------
-    # eligible users installed up to TEST_END
-    eligible = users["install_ts"].dt.floor("D") <= TEST_END
-    ab = users.loc[eligible, ["user_id", "install_ts"]].copy()
-
-    # exposure probability
-    install_day_floor = ab["install_ts"].dt.floor("D")
-    exposure_p = np.where(install_day_floor < TEST_START, 0.55, 0.85)
-    exposed = rng.random(size=len(ab)) < exposure_p
-    ab = ab.loc[exposed].copy().reset_index(drop=True)
-
-    ab["experiment_name"] = TEST_NAME
-    ab["variant"] = rng.choice(["control", "variant"], size=len(ab), p=[0.5, 0.5])
-
-    # ✅ Assign timestamp: Series-safe & length-safe (NO Index arithmetic traps)
-    # assign_day = max(install_day, TEST_START) at day resolution
-    install_day_series = ab["install_ts"].dt.floor("D")  # Series[datetime64[ns]]
-    assign_day_series = install_day_series.where(install_day_series >= TEST_START, TEST_START)
-
-    ab["assign_ts"] = assign_day_series + minutes_random(len(ab))
-
-    ab = ab[["user_id", "experiment_name", "variant", "assign_ts"]]
-
-    # -----------------------------
-    # EVENTS
-    # -----------------------------
-    install_day_floor_users = users["install_ts"].dt.floor("D")
-    ab_variant_map = ab.set_index("user_id")["variant"].to_dict()
-    user_variant = np.array([ab_variant_map.get(int(uid), None) for uid in user_ids], dtype=object)
-
-    event_rows = []
-
-    for i, uid in enumerate(user_ids):
-        inst_day = install_day_floor_users.iloc[i]
-        platform = users["platform"].iloc[i]
-        country = users["country"].iloc[i]
-        trait_skill = float(users["trait_skill"].iloc[i])
-        trait_ad_affinity = float(users["trait_ad_affinity"].iloc[i])
-
-        base = 0.55 + 0.08 * (platform == "iOS") + 0.06 * sigmoid(trait_skill)
-        base += 0.05 * (country == "US")
-        base = float(np.clip(base, 0.15, 0.85))
-
-        decay = 0.18 + 0.05 * (trait_skill < -0.5)
-        decay = float(np.clip(decay, 0.12, 0.28))
-
-        v = user_variant[i]
-        variant_ret_penalty = 0.02 if v == "variant" else 0.0
-
-        horizon_days = min(30, int((END_DATE - inst_day).days) + 1)
-        if horizon_days <= 0:
-            continue
-
-        t = np.arange(horizon_days)
-        p_active = base * np.exp(-decay * t) - variant_ret_penalty
-        p_active = np.clip(p_active, 0.0, 0.95)
-
-        active_days = rng.random(size=horizon_days) < p_active
-        if not active_days.any():
-            continue
-
-        level = int(max(1, 1 + rng.poisson(1)))
-        soft_currency = int(rng.integers(50, 200))
-
-        for d, is_active in enumerate(active_days):
-            if not is_active:
-                continue
-
-            day = inst_day + pd.Timedelta(days=int(d))
-            if day < START_DATE or day > END_DATE:
-                continue
-
-            n_sessions = int(np.clip(rng.poisson(1.8 + 0.2 * trait_ad_affinity), 1, 6))
-            for s in range(n_sessions):
-                session_start = day + pd.to_timedelta(int(rng.integers(0, 24 * 60)), unit="m")
-                session_id = f"{uid}-{day.strftime('%Y%m%d')}-{s}"
-
-                event_rows.append((session_start, int(uid), session_id, "session_start", None, None, None))
-
-                n_levels = int(np.clip(rng.poisson(1.6 + 0.3 * sigmoid(trait_skill)), 1, 5))
-                for _ in range(n_levels):
-                    level_start_ts = session_start + pd.to_timedelta(int(rng.integers(1, 12)), unit="m")
-                    event_rows.append((level_start_ts, int(uid), session_id, "level_start", level, None, None))
-
-                    win_p = sigmoid(0.6 * trait_skill - 0.15 * (level / 20))
-                    completed = rng.random() < win_p
-
-                    level_end_ts = level_start_ts + pd.to_timedelta(int(rng.integers(1, 6)), unit="m")
-                    if completed:
-                        in_test_window = (TEST_START <= day <= TEST_END)
-                        reward_mult = VARIANT_REWARD_MULT if (v == "variant" and in_test_window) else 1.0
-
-                        reward = int(BASE_REWARD * reward_mult * (1 + 0.02 * min(level, 50)))
-                        soft_currency += reward
-
-                        event_rows.append((level_end_ts, int(uid), session_id, "level_complete", level, reward, soft_currency))
-                        level += 1
-                    else:
-                        event_rows.append((level_end_ts, int(uid), session_id, "level_fail", level, 0, soft_currency))
-
-                session_end = session_start + pd.to_timedelta(int(rng.integers(5, 25)), unit="m")
-                event_rows.append((session_end, int(uid), session_id, "session_end", None, None, None))
-
-    events = pd.DataFrame(
-        event_rows,
-        columns=["event_ts", "user_id", "session_id", "event_name", "level", "currency_delta", "currency_balance"],
-    )
-
-    # -----------------------------
-    # PURCHASES
-    # -----------------------------
-    last_level = (
-        events.loc[events["event_name"] == "level_complete"]
-        .groupby("user_id")["level"]
-        .max()
-        .reindex(user_ids)
-        .fillna(1)
-        .values
-    )
-
-    purchase_rows = []
-    for i, uid in enumerate(user_ids):
-        prop = float(users["trait_spender_propensity"].iloc[i])
-        lvl = float(last_level[i])
-        country = users["country"].iloc[i]
-
-        is_payer = rng.random() < np.clip(
-            0.06 + 0.12 * prop + 0.02 * (lvl > 15) + 0.03 * (country == "US"),
-            0,
-            0.35,
-        )
-        if not is_payer:
-            continue
-
-        n_p = int(np.clip(rng.poisson(1.1 + 1.2 * prop), 1, 6))
-        user_events = events.loc[events["user_id"] == int(uid)]
-        if user_events.empty:
-            continue
-
-        candidate_ts = user_events["event_ts"].values
-        buy_ts = rng.choice(candidate_ts, size=n_p, replace=True)
-
-        for ts in buy_ts:
-            price = float(rng.choice([1.99, 2.99, 4.99, 9.99, 19.99], p=[0.30, 0.25, 0.25, 0.15, 0.05]))
-            purchase_rows.append((pd.to_datetime(ts), int(uid), price, "IAP", f"pack_{int(price * 100)}"))
-
-    purchases = pd.DataFrame(purchase_rows, columns=["purchase_ts", "user_id", "revenue_usd", "purchase_type", "sku"])
-
-    # -----------------------------
-    # ADS EVENTS
-    # -----------------------------
-    ad_rows = []
-    for i, uid in enumerate(user_ids):
-        affinity = float(users["trait_ad_affinity"].iloc[i])
-        user_sessions = events[(events["user_id"] == int(uid)) & (events["event_name"] == "session_start")]
-        if user_sessions.empty:
-            continue
-
-        n_sessions = len(user_sessions)
-        rewarded_per_session = rng.poisson(lam=0.55 + 0.9 * affinity, size=n_sessions)
-        inter_per_session = rng.poisson(lam=0.35 + 0.5 * affinity, size=n_sessions)
-
-        for j, sess_ts in enumerate(user_sessions["event_ts"].values):
-            base_ts = pd.to_datetime(sess_ts)
-
-            for _ in range(int(rewarded_per_session[j])):
-                ts = base_ts + pd.to_timedelta(int(rng.integers(1, 15)), unit="m")
-                rev = float(max(0.0, rng.normal(REWARDED_ECPM / 1000, 0.001)))
-                ad_rows.append((ts, int(uid), "rewarded", rev, "placement_rewarded_default"))
-
-            for _ in range(int(inter_per_session[j])):
-                ts = base_ts + pd.to_timedelta(int(rng.integers(1, 15)), unit="m")
-                rev = float(max(0.0, rng.normal(INTER_ECPM / 1000, 0.0008)))
-                ad_rows.append((ts, int(uid), "interstitial", rev, "placement_interstitial_default"))
-
-    ads = pd.DataFrame(ad_rows, columns=["ad_ts", "user_id", "ad_format", "ad_revenue_usd", "placement"])
-
-    # -----------------------------
-    # Inject a few tracking issues
-    # -----------------------------
-    if len(events) > 0:
-        mask_drop = (events["event_name"] == "level_complete") & (rng.random(len(events)) < 0.008)
-        events = events.loc[~mask_drop].copy()
-
-    if len(purchases) > 0:
-        extra = purchases.sample(min(50, len(purchases)), random_state=SEED).copy()
-        extra["purchase_ts"] = extra["purchase_ts"] - pd.to_timedelta(rng.integers(1, 5, size=len(extra)), unit="D")
-        purchases = pd.concat([purchases, extra], ignore_index=True)
-
-    # -----------------------------
-    # Save
-    # -----------------------------
-    users.to_csv(out_dir / "users.csv", index=False)
-    ab.to_csv(out_dir / "ab_assignments.csv", index=False)
-    events.to_csv(out_dir / "events.csv", index=False)
-    purchases.to_csv(out_dir / "purchases.csv", index=False)
-    ads.to_csv(out_dir / "ads_events.csv", index=False)
-
-    print("\n✅ Data generated:")
-    print(f"- users         : {len(users):,}")
-    print(f"- ab_assignments: {len(ab):,}")
-    print(f"- events        : {len(events):,}")
-    print(f"- purchases     : {len(purchases):,}")
-    print(f"- ads_events    : {len(ads):,}")
-    print(f"\n📁 Saved under  : {out_dir}")
-
-
-if __name__ == "__main__":
-    main()
+from __future__ import annotations
+
+import argparse
+import resource
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+
+# -----------------------------
+# Global config
+# -----------------------------
+SEED = 42
+
+N_USERS = 2000
+BATCH_USERS = 50_000
+
+START_DATE = pd.Timestamp("2025-10-01")
+END_DATE = pd.Timestamp("2025-12-31")
+DAYS = int((END_DATE - START_DATE).days) + 1
+
+TEST_START = pd.Timestamp("2025-11-10")
+TEST_END = pd.Timestamp("2025-12-08")
+TEST_NAME = "reward_20pct_uplift"
+
+BASE_REWARD = 100
+VARIANT_REWARD_MULT = 1.20
+
+REWARDED_ECPM = 12.0
+INTER_ECPM = 6.0
+
+# purchases duplicated with a backdated timestamp, over the whole dataset
+DUPLICATE_PURCHASES = 50
+
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def project_root() -> Path:
+
+    return Path(__file__).resolve().parents[1]
+
+
+def ensure_dir(p: Path) -> None:
+    p.mkdir(parents=True, exist_ok=True)
+
+
+def minutes_random(rng: np.random.Generator, n: int) -> pd.TimedeltaIndex:
+    return pd.to_timedelta(rng.integers(0, 24 * 60, size=n), unit="m")
+
+
+EVENT_COLUMNS = ["event_ts", "user_id", "session_id", "event_name", "level", "currency_delta", "currency_balance"]
+EVENT_NAMES = np.array(["session_start", "level_start", "level_complete", "level_fail", "session_end"])
+
+
+def build_events_loop(rng: np.random.Generator, users: pd.DataFrame, user_variant: np.ndarray) -> pd.DataFrame:
+    # Reference per-row implementation, kept only for `--benchmark`.
+    user_ids = users["user_id"].to_numpy()
+    install_day_floor_users = users["install_ts"].dt.floor("D")
+
+    event_rows = []
+
+    for i, uid in enumerate(user_ids):
+        inst_day = install_day_floor_users.iloc[i]
+        platform = users["platform"].iloc[i]
+        country = users["country"].iloc[i]
+        trait_skill = float(users["trait_skill"].iloc[i])
+        trait_ad_affinity = float(users["trait_ad_affinity"].iloc[i])
+
+        base = 0.55 + 0.08 * (platform == "iOS") + 0.06 * sigmoid(trait_skill)
+        base += 0.05 * (country == "US")
+        base = float(np.clip(base, 0.15, 0.85))
+
+        decay = 0.18 + 0.05 * (trait_skill < -0.5)
+        decay = float(np.clip(decay, 0.12, 0.28))
+
+        v = user_variant[i]
+        variant_ret_penalty = 0.02 if v == "variant" else 0.0
+
+        horizon_days = min(30, int((END_DATE - inst_day).days) + 1)
+        if horizon_days <= 0:
+            continue
+
+        t = np.arange(horizon_days)
+        p_active = base * np.exp(-decay * t) - variant_ret_penalty
+        p_active = np.clip(p_active, 0.0, 0.95)
+
+        active_days = rng.random(size=horizon_days) < p_active
+        if not active_days.any():
+            continue
+
+        level = int(max(1, 1 + rng.poisson(1)))
+        soft_currency = int(rng.integers(50, 200))
+
+        for d, is_active in enumerate(active_days):
+            if not is_active:
+                continue
+
+            day = inst_day + pd.Timedelta(days=int(d))
+            if day < START_DATE or day > END_DATE:
+                continue
+
+            n_sessions = int(np.clip(rng.poisson(1.8 + 0.2 * trait_ad_affinity), 1, 6))
+            for s in range(n_sessions):
+                session_start = day + pd.to_timedelta(int(rng.integers(0, 24 * 60)), unit="m")
+                session_id = f"{uid}-{day.strftime('%Y%m%d')}-{s}"
+
+                event_rows.append((session_start, int(uid), session_id, "session_start", None, None, None))
+
+                n_levels = int(np.clip(rng.poisson(1.6 + 0.3 * sigmoid(trait_skill)), 1, 5))
+                for _ in range(n_levels):
+                    level_start_ts = session_start + pd.to_timedelta(int(rng.integers(1, 12)), unit="m")
+                    event_rows.append((level_start_ts, int(uid), session_id, "level_start", level, None, None))
+
+                    win_p = sigmoid(0.6 * trait_skill - 0.15 * (level / 20))
+                    completed = rng.random() < win_p
+
+                    level_end_ts = level_start_ts + pd.to_timedelta(int(rng.integers(1, 6)), unit="m")
+                    if completed:
+                        in_test_window = (TEST_START <= day <= TEST_END)
+                        reward_mult = VARIANT_REWARD_MULT if (v == "variant" and in_test_window) else 1.0
+
+                        reward = int(BASE_REWARD * reward_mult * (1 + 0.02 * min(level, 50)))
+                        soft_currency += reward
+
+                        event_rows.append((level_end_ts, int(uid), session_id, "level_complete", level, reward, soft_currency))
+                        level += 1
+                    else:
+                        event_rows.append((level_end_ts, int(uid), session_id, "level_fail", level, 0, soft_currency))
+
+                session_end = session_start + pd.to_timedelta(int(rng.integers(5, 25)), unit="m")
+                event_rows.append((session_end, int(uid), session_id, "session_end", None, None, None))
+
+    return pd.DataFrame(event_rows, columns=EVENT_COLUMNS)
+
+
+def expand(counts: np.ndarray):
+    """
+    Repeat/cumsum expansion: for group sizes `counts` return (group index,
+    position within group) for every expanded row.
+    """
+    total = int(counts.sum())
+    group = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.cumsum(counts) - counts
+    return group, np.arange(total) - offsets[group]
+
+
+def build_events(rng: np.random.Generator, users: pd.DataFrame, user_variant: np.ndarray) -> pd.DataFrame:
+    """
+    Vectorized event engine. Same model as `build_events_loop`, drawn as flat
+    arrays: user -> horizon days -> active days -> sessions -> level attempts.
+    Only the level progression is sequential (win chance depends on the
+    current level), so it is stepped per attempt rank across all users.
+    """
+    n = len(users)
+    uid = users["user_id"].to_numpy()
+    skill = users["trait_skill"].to_numpy(dtype=float)
+    affinity = users["trait_ad_affinity"].to_numpy(dtype=float)
+    is_ios = users["platform"].to_numpy() == "iOS"
+    is_us = users["country"].to_numpy() == "US"
+    is_variant = user_variant == "variant"
+    inst_day = users["install_ts"].dt.floor("D").to_numpy().astype("datetime64[ns]")
+
+    # --- per-user retention curve
+    base = np.clip(0.55 + 0.08 * is_ios + 0.06 * sigmoid(skill) + 0.05 * is_us, 0.15, 0.85)
+    decay = np.clip(0.18 + 0.05 * (skill < -0.5), 0.12, 0.28)
+    variant_ret_penalty = np.where(is_variant, 0.02, 0.0)
+
+    end_day = np.datetime64(END_DATE, "ns")
+    horizon = np.minimum(30, (end_day - inst_day) // np.timedelta64(1, "D") + 1)
+    horizon = np.maximum(horizon, 0)
+
+    # --- active days (user x day-since-install)
+    ud_user, ud_t = expand(horizon)
+    p_active = base[ud_user] * np.exp(-decay[ud_user] * ud_t) - variant_ret_penalty[ud_user]
+    p_active = np.clip(p_active, 0.0, 0.95)
+    active = rng.random(size=len(ud_user)) < p_active
+
+    level0 = np.maximum(1, 1 + rng.poisson(1, size=n))
+    soft_currency0 = rng.integers(50, 200, size=n)
+
+    d_user = ud_user[active]
+    d_day = inst_day[d_user] + ud_t[active].astype("timedelta64[D]")
+    in_range = (d_day >= np.datetime64(START_DATE, "ns")) & (d_day <= end_day)
+    d_user, d_day = d_user[in_range], d_day[in_range]
+
+    # --- sessions
+    n_sessions = np.clip(rng.poisson(1.8 + 0.2 * affinity[d_user]), 1, 6)
+    s_day_idx, s_idx = expand(n_sessions)
+    s_user = d_user[s_day_idx]
+    s_day = d_day[s_day_idx]
+    n_s = len(s_user)
+    session_start = s_day + rng.integers(0, 24 * 60, size=n_s).astype("timedelta64[m]")
+    session_end = session_start + rng.integers(5, 25, size=n_s).astype("timedelta64[m]")
+
+    day_no = (s_day - np.datetime64(START_DATE, "ns")) // np.timedelta64(1, "D")
+    day_str = pd.date_range(START_DATE, periods=DAYS, freq="D").strftime("%Y%m%d").to_numpy(dtype=object)
+    session_ids = (
+        uid.astype(str).astype(object)[s_user] + "-" + day_str[day_no] + "-" + s_idx.astype(str).astype(object)
+    )
+
+    # --- level attempts
+    n_levels = np.clip(rng.poisson(1.6 + 0.3 * sigmoid(skill[s_user])), 1, 5)
+    a_sess, a_j = expand(n_levels)
+    a_user = s_user[a_sess]
+    n_a = len(a_user)
+    level_start_ts = session_start[a_sess] + rng.integers(1, 12, size=n_a).astype("timedelta64[m]")
+    level_end_ts = level_start_ts + rng.integers(1, 6, size=n_a).astype("timedelta64[m]")
+    u_win = rng.random(size=n_a)
+
+    # attempts are in (user, day, session, attempt) order -> rank within user
+    per_user = np.bincount(a_user, minlength=n)
+    a_offsets = np.cumsum(per_user) - per_user
+    by_count = np.argsort(-per_user, kind="stable")
+    neg_sorted = -per_user[by_count]
+
+    level_at = np.empty(n_a, dtype=np.int64)
+    completed = np.empty(n_a, dtype=bool)
+    level = level0.copy()
+    for r in range(int(per_user.max()) if n_a else 0):
+        alive = by_count[: np.searchsorted(neg_sorted, -r, side="left")]
+        idx = a_offsets[alive] + r
+        lv = level[alive]
+        win = u_win[idx] < sigmoid(0.6 * skill[alive] - 0.15 * (lv / 20))
+        level_at[idx] = lv
+        completed[idx] = win
+        level[alive] = lv + win
+
+    a_day = s_day[a_sess]
+    in_test_window = (a_day >= np.datetime64(TEST_START, "ns")) & (a_day <= np.datetime64(TEST_END, "ns"))
+    reward_mult = np.where(is_variant[a_user] & in_test_window, VARIANT_REWARD_MULT, 1.0)
+    reward = (BASE_REWARD * reward_mult * (1 + 0.02 * np.minimum(level_at, 50))).astype(np.int64)
+    delta = np.where(completed, reward, 0)
+
+    # cumulative balance within user
+    cs = np.concatenate([[0], np.cumsum(delta)])
+    balance = soft_currency0[a_user] + cs[1:] - cs[a_offsets[a_user]]
+
+    # --- interleave rows: start, (level_start, level_end) * n, end
+    rows_per_session = 2 + 2 * n_levels
+    row_off = np.cumsum(rows_per_session) - rows_per_session
+    n_rows = int(rows_per_session.sum())
+
+    start_rows = row_off
+    end_rows = row_off + rows_per_session - 1
+    lvl_start_rows = row_off[a_sess] + 1 + 2 * a_j
+    lvl_end_rows = lvl_start_rows + 1
+
+    event_ts = np.empty(n_rows, dtype="datetime64[ns]")
+    row_sess = np.repeat(np.arange(n_s), rows_per_session)
+    name_code = np.empty(n_rows, dtype=np.int8)
+    level_col = np.full(n_rows, np.nan)
+    delta_col = np.full(n_rows, np.nan)
+    balance_col = np.full(n_rows, np.nan)
+
+    event_ts[start_rows] = session_start
+    event_ts[end_rows] = session_end
+    event_ts[lvl_start_rows] = level_start_ts
+    event_ts[lvl_end_rows] = level_end_ts
+
+    name_code[start_rows] = 0
+    name_code[end_rows] = 4
+    name_code[lvl_start_rows] = 1
+    name_code[lvl_end_rows] = np.where(completed, 2, 3)
+
+    level_col[lvl_start_rows] = level_at
+    level_col[lvl_end_rows] = level_at
+    delta_col[lvl_end_rows] = delta
+    balance_col[lvl_end_rows] = balance
+
+    return pd.DataFrame(
+        {
+            "event_ts": event_ts,
+            "user_id": uid[s_user][row_sess],
+            "session_id": session_ids[row_sess],
+            "event_name": pd.Categorical.from_codes(name_code, categories=EVENT_NAMES),
+            "level": level_col,
+            "currency_delta": delta_col,
+            "currency_balance": balance_col,
+        }
+    )
+
+
+def user_row_index(events: pd.DataFrame, user_ids: np.ndarray):
+    """
+    One-time user -> row-range index over `events` (which must be sorted by
+    user_id): rows of user_ids[i] are events[lo[i]:hi[i]].
+    """
+    ev_users = events["user_id"].to_numpy()
+    if len(ev_users) and np.any(np.diff(ev_users) < 0):
+        raise ValueError("events must be sorted by user_id")
+    lo = np.searchsorted(ev_users, user_ids, side="left")
+    hi = np.searchsorted(ev_users, user_ids, side="right")
+    return lo, hi
+
+
+def build_purchases(rng: np.random.Generator, users: pd.DataFrame, events: pd.DataFrame, events_by_user) -> pd.DataFrame:
+    user_ids = users["user_id"].to_numpy()
+    n = len(users)
+    prop = users["trait_spender_propensity"].to_numpy(dtype=float)
+    is_us = users["country"].to_numpy() == "US"
+
+    last_level = (
+        events.loc[events["event_name"] == "level_complete"]
+        .groupby("user_id")["level"]
+        .max()
+        .reindex(user_ids)
+        .fillna(1)
+        .values
+    )
+
+    p_payer = np.clip(0.06 + 0.12 * prop + 0.02 * (last_level > 15) + 0.03 * is_us, 0, 0.35)
+    is_payer = rng.random(size=n) < p_payer
+    n_p = np.clip(rng.poisson(1.1 + 1.2 * prop), 1, 6)
+
+    # payers without any event rows cannot be given a purchase timestamp
+    lo, hi = events_by_user
+    buyers = np.flatnonzero(is_payer & (hi > lo))
+
+    p_group, _ = expand(n_p[buyers])
+    p_user = buyers[p_group]
+    rows = rng.integers(lo[p_user], hi[p_user])
+
+    price = rng.choice([1.99, 2.99, 4.99, 9.99, 19.99], size=len(p_user), p=[0.30, 0.25, 0.25, 0.15, 0.05])
+
+    return pd.DataFrame(
+        {
+            "purchase_ts": events["event_ts"].to_numpy()[rows],
+            "user_id": user_ids[p_user],
+            "revenue_usd": price,
+            "purchase_type": "IAP",
+            "sku": "pack_" + pd.Series((price * 100).astype(np.int64)).astype(str),
+        }
+    )
+
+
+def build_ads(rng: np.random.Generator, users: pd.DataFrame, events: pd.DataFrame) -> pd.DataFrame:
+    user_ids = users["user_id"].to_numpy()
+    affinity = users["trait_ad_affinity"].to_numpy(dtype=float)
+
+    sessions = events.loc[events["event_name"] == "session_start", ["event_ts", "user_id"]]
+    sess_ts = sessions["event_ts"].to_numpy()
+    sess_user = sessions["user_id"].to_numpy()
+    sess_aff = affinity[np.searchsorted(user_ids, sess_user)]
+    n_s = len(sessions)
+
+    rewarded_per_session = rng.poisson(lam=0.55 + 0.9 * sess_aff, size=n_s)
+    inter_per_session = rng.poisson(lam=0.35 + 0.5 * sess_aff, size=n_s)
+
+    r_sess, _ = expand(rewarded_per_session)
+    i_sess, _ = expand(inter_per_session)
+    n_r, n_i = len(r_sess), len(i_sess)
+
+    # rewarded impressions of a session come before its interstitials
+    sess_idx = np.concatenate([r_sess, i_sess])
+    order = np.argsort(sess_idx, kind="stable")
+    sess_idx = sess_idx[order]
+
+    offsets = rng.integers(1, 15, size=n_r + n_i).astype("timedelta64[m]")
+    rev = np.concatenate(
+        [
+            np.maximum(0.0, rng.normal(REWARDED_ECPM / 1000, 0.001, size=n_r)),
+            np.maximum(0.0, rng.normal(INTER_ECPM / 1000, 0.0008, size=n_i)),
+        ]
+    )[order]
+    is_rewarded = (np.arange(n_r + n_i) < n_r)[order]
+
+    return pd.DataFrame(
+        {
+            "ad_ts": sess_ts[sess_idx] + offsets,
+            "user_id": sess_user[sess_idx],
+            "ad_format": np.where(is_rewarded, "rewarded", "interstitial"),
+            "ad_revenue_usd": rev,
+            "placement": np.where(is_rewarded, "placement_rewarded_default", "placement_interstitial_default"),
+        }
+    )
+
+
+def event_summary(events: pd.DataFrame) -> dict:
+    names = events["event_name"].astype(str)
+    starts = int((names == "level_start").sum())
+    sessions = int((names == "session_start").sum())
+    return {
+        "rows": len(events),
+        "active_users": int(events["user_id"].nunique()),
+        "sessions": sessions,
+        "levels_per_session": starts / max(sessions, 1),
+        "completion_rate": int((names == "level_complete").sum()) / max(starts, 1),
+        "mean_balance": float(events["currency_balance"].mean()),
+    }
+
+
+def benchmark_events(users: pd.DataFrame, user_variant: np.ndarray) -> None:
+    results = {}
+    for name, fn in [("loop", build_events_loop), ("vectorized", build_events)]:
+        t0 = time.perf_counter()
+        events = fn(np.random.default_rng(SEED), users, user_variant)
+        results[name] = (time.perf_counter() - t0, event_summary(events))
+
+    print(f"\n⏱  Events benchmark (users={len(users):,})")
+    for name, (secs, summary) in results.items():
+        stats = "  ".join(f"{k}={v:,}" if isinstance(v, int) else f"{k}={v:.3f}" for k, v in summary.items())
+        print(f"- {name:<10}: {secs:8.3f}s  {stats}")
+    print(f"- speedup   : {results['loop'][0] / max(results['vectorized'][0], 1e-9):.1f}x")
+
+
+TABLES = ["users", "ab_assignments", "events", "purchases", "ads_events"]
+
+
+def build_users(rng: np.random.Generator, user_ids: np.ndarray) -> pd.DataFrame:
+    n = len(user_ids)
+
+    weights = np.linspace(1.0, 1.8, DAYS)
+    weights = weights / weights.sum()
+
+    install_day_offsets = rng.choice(np.arange(DAYS), size=n, p=weights)
+    install_dates = START_DATE + pd.to_timedelta(install_day_offsets, unit="D")
+
+    countries = rng.choice(["TR", "US", "DE", "BR", "GB"], size=n, p=[0.45, 0.20, 0.12, 0.13, 0.10])
+    platforms = rng.choice(["iOS", "Android"], size=n, p=[0.45, 0.55])
+
+    skill = rng.normal(0.0, 1.0, size=n)
+
+    spender_propensity = sigmoid(
+        rng.normal(-1.2, 0.9, size=n)
+        + 0.25 * (countries == "US")
+        + 0.10 * (platforms == "iOS")
+    )
+
+    ad_affinity = sigmoid(rng.normal(0.0, 1.0, size=n))
+
+    return pd.DataFrame(
+        {
+            "user_id": user_ids,
+            "install_ts": install_dates + minutes_random(rng, n),
+            "country": countries,
+            "platform": platforms,
+            "trait_skill": skill,
+            "trait_spender_propensity": spender_propensity,
+            "trait_ad_affinity": ad_affinity,
+        }
+    )
+
+
+def build_ab(rng: np.random.Generator, users: pd.DataFrame) -> pd.DataFrame:
+    # eligible users installed up to TEST_END
+    eligible = users["install_ts"].dt.floor("D") <= TEST_END
+    ab = users.loc[eligible, ["user_id", "install_ts"]].copy()
+
+    # exposure probability
+    install_day_floor = ab["install_ts"].dt.floor("D")
+    exposure_p = np.where(install_day_floor < TEST_START, 0.55, 0.85)
+    exposed = rng.random(size=len(ab)) < exposure_p
+    ab = ab.loc[exposed].copy().reset_index(drop=True)
+
+    ab["experiment_name"] = TEST_NAME
+    ab["variant"] = rng.choice(["control", "variant"], size=len(ab), p=[0.5, 0.5])
+
+    # ✅ Assign timestamp: Series-safe & length-safe (NO Index arithmetic traps)
+    # assign_day = max(install_day, TEST_START) at day resolution
+    install_day_series = ab["install_ts"].dt.floor("D")  # Series[datetime64[ns]]
+    assign_day_series = install_day_series.where(install_day_series >= TEST_START, TEST_START)
+
+    ab["assign_ts"] = assign_day_series + minutes_random(rng, len(ab))
+
+    return ab[["user_id", "experiment_name", "variant", "assign_ts"]]
+
+
+def variant_per_user(ab: pd.DataFrame, user_ids: np.ndarray) -> np.ndarray:
+    ab_variant_map = ab.set_index("user_id")["variant"].to_dict()
+    return np.array([ab_variant_map.get(int(uid), None) for uid in user_ids], dtype=object)
+
+
+def generate_tables(rng: np.random.Generator, user_ids: np.ndarray, n_extra: int) -> dict:
+    # -----------------------------
+    # USERS + A/B ASSIGNMENTS
+    # -----------------------------
+    users = build_users(rng, user_ids)
+    ab = build_ab(rng, users)
+
+    # -----------------------------
+    # EVENTS
+    # -----------------------------
+    events = build_events(rng, users, variant_per_user(ab, user_ids))
+
+    # -----------------------------
+    # PURCHASES
+    # -----------------------------
+    events_by_user = user_row_index(events, user_ids)
+    purchases = build_purchases(rng, users, events, events_by_user)
+
+    # -----------------------------
+    # ADS EVENTS
+    # -----------------------------
+    ads = build_ads(rng, users, events)
+
+    # -----------------------------
+    # Inject a few tracking issues
+    # -----------------------------
+    if len(events) > 0:
+        mask_drop = (events["event_name"] == "level_complete") & (rng.random(len(events)) < 0.008)
+        events = events.loc[~mask_drop].copy()
+
+    if len(purchases) > 0:
+        # this batch's share of DUPLICATE_PURCHASES (see generate_shard)
+        extra = purchases.sample(min(n_extra, len(purchases)), random_state=rng).copy()
+        extra["purchase_ts"] = extra["purchase_ts"] - pd.to_timedelta(rng.integers(1, 5, size=len(extra)), unit="D")
+        purchases = pd.concat([purchases, extra], ignore_index=True)
+
+    return {
+        "users": users,
+        "ab_assignments": ab,
+        "events": events,
+        "purchases": purchases,
+        "ads_events": ads,
+    }
+
+
+def shard_user_ids(n_users: int, n_shards: int, shard: int) -> np.ndarray:
+    return np.array_split(np.arange(1, n_users + 1, dtype=np.int64), n_shards)[shard]
+
+
+def split_pro_rata(total: int, sizes) -> np.ndarray:
+    """total split in proportion to sizes, rounded down, with the remainder on the first part."""
+    sizes = np.asarray(sizes, dtype=np.int64)
+    parts = total * sizes // max(int(sizes.sum()), 1)
+    parts[0] += total - parts.sum()
+    return parts
+
+
+def table_path(out_dir: Path, table: str, shard: int, n_shards: int) -> Path:
+    # a single shard keeps the flat data/<table>.csv layout
+    if n_shards == 1:
+        return out_dir / f"{table}.csv"
+    return out_dir / table / f"part-{shard:05d}.csv"
+
+
+def clear_outputs(out_dir: Path) -> None:
+    for table in TABLES:
+        (out_dir / f"{table}.csv").unlink(missing_ok=True)
+        if (out_dir / table).is_dir():
+            shutil.rmtree(out_dir / table)
+
+
+class CsvChunkWriter:
+    """
+    Streams table chunks to their CSV files as they are produced, so only the
+    current user batch is ever held in memory.
+    """
+
+    def __init__(self, out_dir: Path, shard: int, n_shards: int):
+        self.paths = {table: table_path(out_dir, table, shard, n_shards) for table in TABLES}
+        self.handles = {}
+        self.rows = dict.fromkeys(TABLES, 0)
+
+    def __enter__(self):
+        for table, path in self.paths.items():
+            ensure_dir(path.parent)
+            self.handles[table] = open(path, "w", newline="", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc):
+        for fh in self.handles.values():
+            fh.close()
+
+    def write(self, table: str, df: pd.DataFrame) -> None:
+        fh = self.handles[table]
+        df.to_csv(fh, header=fh.tell() == 0, index=False)
+        self.rows[table] += len(df)
+
+
+# day-partitioned tables: timestamp column -> hive partition key
+PARTITION_COLUMNS = {
+    "events": ("event_ts", "event_date"),
+    "ads_events": ("ad_ts", "ad_date"),
+}
+
+
+def parquet_schemas(pa) -> dict:
+    ts = pa.timestamp("us")
+    dict_str = pa.dictionary(pa.int8(), pa.string())
+    return {
+        "users": pa.schema(
+            [
+                ("user_id", pa.int64()),
+                ("install_ts", ts),
+                ("country", dict_str),
+                ("platform", dict_str),
+                ("trait_skill", pa.float64()),
+                ("trait_spender_propensity", pa.float64()),
+                ("trait_ad_affinity", pa.float64()),
+            ]
+        ),
+        "ab_assignments": pa.schema(
+            [
+                ("user_id", pa.int64()),
+                ("experiment_name", dict_str),
+                ("variant", dict_str),
+                ("assign_ts", ts),
+            ]
+        ),
+        "events": pa.schema(
+            [
+                ("event_ts", ts),
+                ("user_id", pa.int64()),
+                ("session_id", pa.string()),
+                ("event_name", dict_str),
+                ("level", pa.int32()),
+                ("currency_delta", pa.int64()),
+                ("currency_balance", pa.int64()),
+            ]
+        ),
+        "purchases": pa.schema(
+            [
+                ("purchase_ts", ts),
+                ("user_id", pa.int64()),
+                ("revenue_usd", pa.float64()),
+                ("purchase_type", dict_str),
+                ("sku", dict_str),
+            ]
+        ),
+        "ads_events": pa.schema(
+            [
+                ("ad_ts", ts),
+                ("user_id", pa.int64()),
+                ("ad_format", dict_str),
+                ("ad_revenue_usd", pa.float64()),
+                ("placement", dict_str),
+            ]
+        ),
+    }
+
+
+class ParquetChunkWriter:
+    """
+    Parquet counterpart of CsvChunkWriter with explicit column types. Every
+    table is a directory of per-shard files (data/<table>/part-00000.parquet);
+    events and ads_events are additionally hive-partitioned by day
+    (data/events/event_date=2025-10-01/part-00000.parquet). Each user batch
+    becomes one row group.
+    """
+
+    def __init__(self, out_dir: Path, shard: int, n_shards: int):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise SystemExit("--format parquet requires pyarrow (pip install pyarrow)") from exc
+
+        self.pa, self.pq = pa, pq
+        self.out_dir = out_dir
+        self.part_name = f"part-{shard:05d}.parquet"
+        self.schemas = parquet_schemas(pa)
+        self.writers = {}
+        self.rows = dict.fromkeys(TABLES, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for writer in self.writers.values():
+            writer.close()
+
+    def _write(self, table: str, path: Path, data) -> None:
+        if path not in self.writers:
+            ensure_dir(path.parent)
+            self.writers[path] = self.pq.ParquetWriter(path, self.schemas[table], compression="zstd")
+        self.writers[path].write_table(data)
+
+    def write(self, table: str, df: pd.DataFrame) -> None:
+        data = self.pa.Table.from_pandas(df, schema=self.schemas[table], preserve_index=False)
+        self.rows[table] += len(df)
+
+        if table not in PARTITION_COLUMNS:
+            self._write(table, self.out_dir / table / self.part_name, data)
+            return
+
+        ts_col, part_col = PARTITION_COLUMNS[table]
+        days, day_idx = np.unique(df[ts_col].to_numpy().astype("datetime64[D]"), return_inverse=True)
+        order = np.argsort(day_idx, kind="stable")
+        bounds = np.searchsorted(day_idx[order], np.arange(len(days) + 1))
+        for k, day in enumerate(days):
+            path = self.out_dir / table / f"{part_col}={day}" / self.part_name
+            self._write(table, path, data.take(order[bounds[k] : bounds[k + 1]]))
+
+
+WRITERS = {"csv": CsvChunkWriter, "parquet": ParquetChunkWriter}
+
+
+def generate_shard(
+    shard: int,
+    n_shards: int,
+    seed_seq: np.random.SeedSequence,
+    n_users: int,
+    out_dir: Path,
+    batch_users: int = BATCH_USERS,
+    fmt: str = "csv",
+) -> dict:
+    """
+    Generate and write one shard, batch_users users at a time. The shard only
+    touches its own SeedSequence child, so its part files do not depend on
+    which worker runs it.
+    """
+    rng = np.random.default_rng(seed_seq)
+    shard_ids = shard_user_ids(n_users, n_shards, shard)
+    n_batches = max(1, -(-len(shard_ids) // batch_users))
+    batches = np.array_split(shard_ids, n_batches)
+    # DUPLICATE_PURCHASES split over shards, then over this shard's batches
+    shard_sizes = [len(shard_user_ids(n_users, n_shards, s)) for s in range(n_shards)]
+    n_extra = split_pro_rata(DUPLICATE_PURCHASES, shard_sizes)[shard]
+    batch_extra = split_pro_rata(n_extra, [len(b) for b in batches])
+
+    with WRITERS[fmt](out_dir, shard, n_shards) as writer:
+        for batch_ids, extra in zip(batches, batch_extra):
+            for table, df in generate_tables(rng, batch_ids, int(extra)).items():
+                writer.write(table, df)
+
+    return writer.rows
+
+
+def peak_rss_mb(who: int) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate the synthetic game telemetry tables.")
+    parser.add_argument("--users", type=int, default=N_USERS, help="total number of users (default: %(default)s)")
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="split the user-id space into N shards, each written as its own part file",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="processes used to generate shards")
+    parser.add_argument(
+        "--batch-users",
+        type=int,
+        default=BATCH_USERS,
+        help="users generated and flushed per chunk; bounds peak memory (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(WRITERS),
+        default="csv",
+        help="csv, or typed Parquet with events/ads_events partitioned by day (default: %(default)s)",
+    )
+    parser.add_argument("--out-dir", type=Path, default=None, help="output directory (default: <root>/data)")
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="time the vectorized event engine against the reference loop and exit",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    root = project_root()
+    out_dir = args.out_dir or root / "data"
+    ensure_dir(out_dir)
+
+    if min(args.shards, args.workers, args.batch_users) < 1:
+        raise SystemExit("--shards, --workers and --batch-users must be >= 1")
+
+    print("📌 Project root:", root)
+    print("📌 Output dir  :", out_dir)
+
+    if args.benchmark:
+        rng = np.random.default_rng(SEED)
+        user_ids = np.arange(1, args.users + 1, dtype=np.int64)
+        users = build_users(rng, user_ids)
+        benchmark_events(users, variant_per_user(build_ab(rng, users), user_ids))
+        return
+
+    clear_outputs(out_dir)
+
+    seeds = np.random.SeedSequence(SEED).spawn(args.shards)
+    jobs = [
+        (shard, args.shards, seeds[shard], args.users, out_dir, args.batch_users, args.format)
+        for shard in range(args.shards)
+    ]
+
+    if args.workers == 1:
+        counts = [generate_shard(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            counts = list(pool.map(generate_shard, *zip(*jobs)))
+
+    totals = {table: sum(c[table] for c in counts) for table in TABLES}
+
+    print(f"\n✅ Data generated ({args.shards} shard(s), {args.workers} worker(s)):")
+    print(f"- users         : {totals['users']:,}")
+    print(f"- ab_assignments: {totals['ab_assignments']:,}")
+    print(f"- events        : {totals['events']:,}")
+    print(f"- purchases     : {totals['purchases']:,}")
+    print(f"- ads_events    : {totals['ads_events']:,}")
+    print(f"\n📁 Saved under  : {out_dir}")
+    print(f"🧠 Peak RSS     : {peak_rss_mb(resource.RUSAGE_SELF):,.1f} MB (main)", end="")
+    if args.workers > 1:
+        print(f", {peak_rss_mb(resource.RUSAGE_CHILDREN):,.1f} MB (largest worker)", end="")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+import argparse
+import math
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from run_sql import SQL_DIR, connect, create_source_views, raw_readers, split_sql
+
+# Same experiment and window as 04_ab_test_evaluation.sql
+EXPERIMENT = "reward_20pct_uplift"
+TEST_START = "2025-11-10 00:00:00"
+TEST_END = "2025-12-08 23:59:59"
+VARIANTS = ["control", "variant"]
+
+# Stream record kinds; the sort puts a session's start before an end at the same timestamp
+SESSION_START, SESSION_END, LEVEL_START, LEVEL_COMPLETE, OTHER_EVENT, PURCHASE, AD = range(7)
+STREAM_SQL = """
+SELECT ts, kind, user_id, session_id, amount
+FROM (
+  SELECT
+    CAST(epoch(event_ts) AS BIGINT) AS ts,
+    CASE event_name
+      WHEN 'session_start' THEN 0 WHEN 'session_end' THEN 1
+      WHEN 'level_start' THEN 2 WHEN 'level_complete' THEN 3 ELSE 4
+    END AS kind,
+    user_id, CAST(session_id AS VARCHAR) AS session_id, 0.0 AS amount
+  FROM events
+  UNION ALL
+  SELECT CAST(epoch(purchase_ts) AS BIGINT), 5, user_id, NULL, revenue_usd FROM purchases
+  UNION ALL
+  SELECT CAST(epoch(ad_ts) AS BIGINT), 6, user_id, NULL, ad_revenue_usd FROM ads_events
+)
+ORDER BY ts, kind
+"""
+
+DAY_S = 86400
+# vectors of 2048 rows fetched per stream batch
+BATCH_VECTORS = 8
+# batches buffered between replay and aggregator; a full queue blocks the replay
+QUEUE_BATCHES = 64
+# sessions without an end are dropped this long after their start
+SESSION_TTL_S = 2 * DAY_S
+# closed days kept for the live view
+ROLLING_DAYS = 28
+SUSPICIOUS_MIN = 240
+
+WEEK_FIELDS = [
+    "weekly_active_users", "sessions", "duration_sum", "suspicious_durations", "iap_revenue_usd",
+    "ads_revenue_usd", "iap_txn", "ad_impressions", "level_starts", "level_completes",
+]
+VARIANT_FIELDS = [
+    "users", "sessions", "duration_avg_sum", "duration_users", "level_starts", "level_completes",
+    "iap_revenue", "ads_revenue", "ad_impressions", "retained_d1",
+]
+(WAU, W_SESSIONS, W_DURATION, W_SUSPICIOUS, W_IAP, W_ADS, W_TXN, W_IMPRESSIONS,
+ W_STARTS, W_COMPLETES) = range(len(WEEK_FIELDS))
+(V_USERS, V_SESSIONS, V_DURATION_AVG, V_DURATION_USERS, V_STARTS, V_COMPLETES,
+ V_IAP, V_ADS, V_IMPRESSIONS, V_D1) = range(len(VARIANT_FIELDS))
+# per-user retention flags
+D1, D7, AB_D1 = 1, 2, 4
+
+
+def epoch_s(ts: str) -> int:
+    return int(pd.Timestamp(ts).timestamp())
+
+
+def week_of(day: int) -> int:
+    # DATE_TRUNC('week'): Monday; day 0 (1970-01-01) is a Thursday
+    return day - (day + 3) % 7
+
+
+def day_ts(day: int) -> pd.Timestamp:
+    return pd.Timestamp(day * DAY_S, unit="s")
+
+
+def sql_round(x: float, digits: int) -> float:
+    # DuckDB's ROUND: halves away from zero (Python's round() goes to even, 0.53125 -> 0.5312)
+    scale = 10.0 ** digits
+    return math.copysign(math.floor(abs(x) * scale + 0.5), x) / scale
+
+
+def replay(con, out: queue.Queue, speedup: float, stop: threading.Event) -> None:
+    """
+    Push the events, purchases and ad impressions to `out` in timestamp
+    order, as lists of (ts, kind, user_id, session_id, amount) tuples, then
+    None. With speedup > 0 a batch is held back until its last timestamp is
+    due at `speedup` x real time; 0 replays as fast as the consumer keeps up.
+    """
+    result = con.execute(STREAM_SQL)
+    ts0 = wall0 = None
+    while not stop.is_set():
+        chunk = result.fetch_df_chunk(BATCH_VECTORS)
+        if chunk.empty:
+            break
+        ts = chunk["ts"].tolist()
+        if speedup > 0:
+            if ts0 is None:
+                ts0, wall0 = ts[0], time.perf_counter()
+            ahead = (ts[-1] - ts0) / speedup - (time.perf_counter() - wall0)
+            if ahead > 0:
+                time.sleep(ahead)
+        out.put(list(zip(
+            ts,
+            chunk["kind"].tolist(),
+            chunk["user_id"].tolist(),
+            chunk["session_id"].tolist(),
+            chunk["amount"].tolist(),
+        )))
+    out.put(None)
+
+
+class OnlineKpis:
+    """
+    Rolling KPI counters over a timestamp-ordered stream, O(1) work per
+    record. Memory is bounded by the population and the calendar, not the
+    stream length: per-user arrays and flags, one counter row per week,
+    per install day and per variant, the distinct-user sets of the open day
+    and week only, and the sessions still waiting for their end.
+    """
+
+    def __init__(self, users: pd.DataFrame, assignments: pd.DataFrame, test_start: int, test_end: int):
+        n = int(max(users["user_id"].max(), assignments["user_id"].max() if len(assignments) else 0)) + 1
+        self.install_day = np.full(n, -1, dtype=np.int64)
+        self.install_day[users["user_id"].to_numpy()] = users["install_day"].to_numpy()
+        self.installs = users.drop_duplicates("user_id").groupby("install_day").size().to_dict()
+        self.retained = {D1: {}, D7: {}}
+        self.flags = bytearray(n)
+
+        self.variant = np.full(n, -1, dtype=np.int8)
+        self.variant[assignments["user_id"].to_numpy()] = assignments["variant_idx"].to_numpy()
+        self.assign_day = np.full(n, -1, dtype=np.int64)
+        self.assign_day[assignments["user_id"].to_numpy()] = assignments["assign_day"].to_numpy()
+        self.test_start, self.test_end = test_start, test_end
+        self.test_days = (test_start // DAY_S, test_end // DAY_S)
+        self.dur_sum = np.zeros(n, dtype=np.int64)
+        self.dur_cnt = np.zeros(n, dtype=np.int32)
+        self.variants = [[0.0] * len(VARIANT_FIELDS) for _ in VARIANTS]
+        for idx, count in assignments.groupby("variant_idx").size().items():
+            self.variants[idx][V_USERS] = count
+
+        self.weeks = {}
+        self.open_sessions = {}
+        self.day = self.week = None
+        self.day_users, self.week_users = set(), set()
+        self.today = None
+        self.recent_days = deque(maxlen=ROLLING_DAYS)
+        self.days_closed = 0
+        self.records = 0
+        self.peak_open_sessions = 0
+
+    def _roll(self, day: int) -> None:
+        if self.day is not None:
+            self._close_day()
+            self.day_users = set()
+            # sessions whose end never arrived would otherwise be kept forever
+            cutoff = day * DAY_S - SESSION_TTL_S
+            stale = [sid for sid, (_, start) in self.open_sessions.items() if start < cutoff]
+            for sid in stale:
+                del self.open_sessions[sid]
+        week = week_of(day)
+        if week != self.week:
+            self._close_week()
+            self.week = week
+        self.weeks.setdefault(week, [0] * len(WEEK_FIELDS))
+        self.day = day
+        self.today = {"day": day_ts(day), "dau": 0, "sessions": 0, "level_starts": 0, "level_completes": 0,
+                      "revenue": 0.0}
+
+    def _close_day(self) -> None:
+        self.today["dau"] = len(self.day_users)
+        self.recent_days.append(self.today)
+        self.days_closed += 1
+
+    def _close_week(self) -> None:
+        if self.week is not None:
+            self.weeks[self.week][WAU] = len(self.week_users)
+            self.week_users = set()
+
+    def consume(self, batch: list) -> None:
+        weeks, variants, variant = self.weeks, self.variants, self.variant
+        open_sessions = self.open_sessions
+        for ts, kind, user, session, amount in batch:
+            day = ts // DAY_S
+            if day != self.day:
+                self._roll(day)
+            w = weeks[self.week]
+            today = self.today
+            v = variant[user]
+            in_test = v >= 0 and self.test_days[0] <= day <= self.test_days[1]
+            if kind == SESSION_START:
+                today["sessions"] += 1
+                self.day_users.add(user)
+                self.week_users.add(user)
+                if session not in open_sessions:
+                    open_sessions[session] = (user, ts)
+                self._retention(user, day)
+            elif kind == SESSION_END:
+                started = open_sessions.pop(session, None)
+                if started is not None:
+                    self._session(started[0], started[1], ts)
+            elif kind == LEVEL_START:
+                today["level_starts"] += 1
+                w[W_STARTS] += 1
+                if in_test:
+                    variants[v][V_STARTS] += 1
+            elif kind == LEVEL_COMPLETE:
+                today["level_completes"] += 1
+                w[W_COMPLETES] += 1
+                if in_test:
+                    variants[v][V_COMPLETES] += 1
+            elif kind == PURCHASE:
+                today["revenue"] += amount
+                w[W_IAP] += amount
+                w[W_TXN] += 1
+                if in_test:
+                    variants[v][V_IAP] += amount
+            elif kind == AD:
+                today["revenue"] += amount
+                w[W_ADS] += amount
+                w[W_IMPRESSIONS] += 1
+                if in_test:
+                    variants[v][V_ADS] += amount
+                    variants[v][V_IMPRESSIONS] += 1
+        self.records += len(batch)
+        self.peak_open_sessions = max(self.peak_open_sessions, len(open_sessions))
+
+    def _retention(self, user: int, day: int) -> None:
+        f = self.flags[user]
+        install = self.install_day[user]
+        if install >= 0:
+            for flag, offset in ((D1, 1), (D7, 7)):
+                if day == install + offset and not f & flag:
+                    f |= flag
+                    self.retained[flag][install] = self.retained[flag].get(install, 0) + 1
+        v = self.variant[user]
+        if v >= 0 and day == self.assign_day[user] + 1 and not f & AB_D1:
+            f |= AB_D1
+            self.variants[v][V_D1] += 1
+        self.flags[user] = f
+
+    def _session(self, user: int, start: int, end: int) -> None:
+        # DATE_DIFF('minute'): minute boundaries crossed
+        minutes = end // 60 - start // 60
+        w = self.weeks[week_of(start // DAY_S)]
+        w[W_SESSIONS] += 1
+        w[W_DURATION] += minutes
+        w[W_SUSPICIOUS] += minutes < 0 or minutes > SUSPICIOUS_MIN
+        v = self.variant[user]
+        if v >= 0 and self.test_start <= start <= self.test_end:
+            c = self.variants[v]
+            c[V_SESSIONS] += 1
+            # AVG over users of the per-user average: swap this user's old average for the new one
+            n = self.dur_cnt[user]
+            if n:
+                c[V_DURATION_AVG] -= self.dur_sum[user] / n
+            else:
+                c[V_DURATION_USERS] += 1
+            self.dur_sum[user] += minutes
+            self.dur_cnt[user] = n + 1
+            c[V_DURATION_AVG] += self.dur_sum[user] / (n + 1)
+
+    def finish(self) -> None:
+        if self.day is not None:
+            self._close_day()
+        self._close_week()
+
+    def weekly(self) -> pd.DataFrame:
+        """Current totals in the layout of 03_kpi_weekly.sql."""
+        retention = {}
+        for install, installs in self.installs.items():
+            r = retention.setdefault(week_of(install), [])
+            r.append((sql_round(self.retained[D1].get(install, 0) / installs, 4),
+                      sql_round(self.retained[D7].get(install, 0) / installs, 4)))
+        rows = []
+        for week in sorted(self.weeks):
+            w = dict(zip(WEEK_FIELDS, self.weeks[week]))
+            if week == self.week:
+                w["weekly_active_users"] = len(self.week_users) or w["weekly_active_users"]
+            wau = w["weekly_active_users"]
+            if not wau:
+                continue
+            sessions = w["sessions"] or None
+            has_revenue = w["iap_txn"] or w["ad_impressions"]
+            total = w["iap_revenue_usd"] + w["ads_revenue_usd"]
+            r = retention.get(week)
+            rows.append({
+                "week": day_ts(week),
+                "weekly_active_users": wau,
+                "sessions": sessions,
+                "sessions_per_user": sql_round(sessions / wau, 3) if sessions else None,
+                "avg_session_duration_min": sql_round(w["duration_sum"] / sessions, 2) if sessions else None,
+                "suspicious_durations": w["suspicious_durations"] if sessions else None,
+                "iap_revenue_usd": w["iap_revenue_usd"] if has_revenue else None,
+                "ads_revenue_usd": w["ads_revenue_usd"] if has_revenue else None,
+                "total_revenue_usd": total if has_revenue else None,
+                "approx_arpwau": sql_round(total / wau, 4) if has_revenue else None,
+                "level_starts": w["level_starts"],
+                "level_completes": w["level_completes"],
+                "level_completion_rate": (
+                    sql_round(w["level_completes"] / w["level_starts"], 4) if w["level_starts"] else None
+                ),
+                "avg_d1_retention": np.mean([d1 for d1, _ in r]) if r else None,
+                "avg_d7_retention": np.mean([d7 for _, d7 in r]) if r else None,
+                "ad_impressions": w["ad_impressions"] if has_revenue else None,
+                "iap_txn": w["iap_txn"] if has_revenue else None,
+            })
+        return pd.DataFrame(rows)
+
+    def ab(self) -> pd.DataFrame:
+        """Current VARIANT_METRICS rows of 04_ab_test_evaluation.sql."""
+        rows = []
+        for name, c in zip(VARIANTS, self.variants):
+            c = dict(zip(VARIANT_FIELDS, c))
+            users = c["users"]
+            if not users:
+                continue
+            revenue = c["iap_revenue"] + c["ads_revenue"]
+            rows.append({
+                "variant": name,
+                "users": int(users),
+                "avg_sessions_per_user": c["sessions"] / users,
+                "avg_session_duration_min": (
+                    c["duration_avg_sum"] / c["duration_users"] if c["duration_users"] else None
+                ),
+                "total_level_starts": int(c["level_starts"]),
+                "total_level_completes": int(c["level_completes"]),
+                "level_completion_rate": (
+                    sql_round(c["level_completes"] / c["level_starts"], 4) if c["level_starts"] else None
+                ),
+                "total_iap_revenue": c["iap_revenue"],
+                "total_ads_revenue": c["ads_revenue"],
+                "total_revenue": revenue,
+                "arpu": sql_round(revenue / users, 4),
+                "ads_impressions_per_user": sql_round(c["ad_impressions"] / users, 2),
+                "d1_retention": sql_round(c["retained_d1"] / users, 4),
+            })
+        return pd.DataFrame(rows)
+
+
+def load_dimensions(con, test_start: int, test_end: int):
+    """Users (install day) and the experiment's assignments, looked up per record by user_id."""
+    users = con.execute(
+        "SELECT user_id, CAST(epoch(DATE_TRUNC('day', install_ts)) AS BIGINT) // 86400 AS install_day FROM users"
+    ).fetchdf()
+    assignments = con.execute(
+        """
+SELECT user_id, variant, CAST(epoch(DATE_TRUNC('day', assign_ts)) AS BIGINT) // 86400 AS assign_day
+FROM ab_assignments
+WHERE experiment_name = ?
+  AND assign_ts BETWEEN to_timestamp(?) AND to_timestamp(?)
+""",
+        [EXPERIMENT, test_start, test_end],
+    ).fetchdf()
+    assignments = assignments[assignments["variant"].isin(VARIANTS)].copy()
+    assignments["variant_idx"] = assignments["variant"].map(VARIANTS.index).astype(np.int8)
+    return users, assignments
+
+
+def print_day(day: dict, kpis: OnlineKpis, lag: int) -> None:
+    ab = kpis.ab()
+    arpu = "  ".join(f"{r.variant} ARPU {r.arpu:.4f}" for r in ab.itertuples())
+    print(
+        f"  {day['day']:%Y-%m-%d}  DAU {day['dau']:>8,}  sessions {day['sessions']:>9,}  "
+        f"completion {day['level_completes'] / max(day['level_starts'], 1):.3f}  "
+        f"revenue {day['revenue']:>10,.2f}  {arpu}  queue {lag}"
+    )
+
+
+def batch_reports(con) -> tuple:
+    """03_kpi_weekly.sql and the VARIANT_METRICS rows of 04_ab_test_evaluation.sql, from the facts."""
+    *setup, weekly_sql = split_sql((SQL_DIR / "03_kpi_weekly.sql").read_text(encoding="utf-8"))
+    for stmt in setup:
+        con.execute(stmt)
+    weekly = con.execute(weekly_sql).fetchdf()
+    (ab_sql,) = split_sql((SQL_DIR / "04_ab_test_evaluation.sql").read_text(encoding="utf-8"))
+    ab = con.execute(ab_sql).fetchdf()
+    ab = ab[ab["section"] == "VARIANT_METRICS"].drop(columns="section")
+    return weekly, ab
+
+
+def compare(name: str, online: pd.DataFrame, batch: pd.DataFrame, key: str) -> list:
+    """Columns of `online` that differ from `batch` (rows matched on `key`)."""
+    online = online.set_index(key).sort_index()
+    batch = batch.set_index(key).sort_index()[online.columns]
+    if not online.index.equals(batch.index):
+        return [f"{name}: rows {list(online.index)} vs {list(batch.index)}"]
+    bad = []
+    for col in online.columns:
+        a = online[col].astype(float).to_numpy()
+        b = batch[col].astype(float).to_numpy()
+        if not np.allclose(a, b, rtol=1e-9, atol=1e-9, equal_nan=True):
+            bad.append(f"{name}.{col}")
+    return bad
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Replay events, purchases and ad impressions in time order into online weekly and A/B KPIs."
+    )
+    parser.add_argument("--data-dir", type=Path, default=Path("data"), help="raw data directory (default: %(default)s)")
+    parser.add_argument("--speedup", type=float, default=0,
+                        help="stream seconds per wall second; 0 = as fast as possible (default: %(default)s)")
+    parser.add_argument("--live", action="store_true", help="print each day's KPIs as it closes")
+    parser.add_argument("--verify", action="store_true",
+                        help="check the end-of-stream KPIs against 03/04 run in batch; exit 1 on a mismatch")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    con = duckdb.connect(database=":memory:")
+    create_source_views(con, raw_readers(args.data_dir))
+    test_start, test_end = epoch_s(TEST_START), epoch_s(TEST_END)
+    kpis = OnlineKpis(*load_dimensions(con, test_start, test_end), test_start, test_end)
+
+    stream = queue.Queue(maxsize=QUEUE_BATCHES)
+    stop = threading.Event()
+    producer = threading.Thread(target=replay, args=(con, stream, args.speedup, stop), daemon=True)
+    t0 = time.perf_counter()
+    producer.start()
+    busy = 0.0
+    shown = 0
+    try:
+        while (batch := stream.get()) is not None:
+            t1 = time.perf_counter()
+            kpis.consume(batch)
+            busy += time.perf_counter() - t1
+            if args.live and kpis.days_closed > shown:
+                for day in list(kpis.recent_days)[shown - kpis.days_closed:]:
+                    print_day(day, kpis, stream.qsize())
+                shown = kpis.days_closed
+    finally:
+        stop.set()
+    kpis.finish()
+    elapsed = time.perf_counter() - t0
+    if args.live:
+        for day in list(kpis.recent_days)[shown - kpis.days_closed:]:
+            print_day(day, kpis, 0)
+
+    weekly, ab = kpis.weekly(), kpis.ab()
+    print("\n=== WEEKLY KPIs (end of stream) ===")
+    print(weekly.to_string(index=False))
+    print(f"\n=== {EXPERIMENT} VARIANT METRICS (end of stream) ===")
+    print(ab.to_string(index=False))
+    print(
+        f"\n⏱️ Replayed {kpis.records:,} records in {elapsed:.2f}s: {kpis.records / elapsed:,.0f} events/s sustained, "
+        f"{kpis.records / max(busy, 1e-9):,.0f} events/s aggregator only (peak open sessions {kpis.peak_open_sessions:,})"
+    )
+
+    if args.verify:
+        t1 = time.perf_counter()
+        batch_weekly, batch_ab = batch_reports(connect(args.data_dir))
+        bad = compare("weekly", weekly, batch_weekly, "week") + compare("ab", ab, batch_ab, "variant")
+        print(f"Batch SQL check ({time.perf_counter() - t1:.2f}s): " + ("✅ match" if not bad else "❌ " + ", ".join(bad)))
+        if bad:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,79 @@
+import argparse
+import json
+import os
+import queue
+import re
+import time
 import duckdb
-import sys
+import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
+SQL_DIR = Path(__file__).resolve().parents[1] / "sql"
+SOURCES_SQL = SQL_DIR / "00_sources.sql"
+FACTS_SQL = SQL_DIR / "00_facts.sql"
+TABLES = ["users", "ab_assignments", "events", "purchases", "ads_events"]
+FACT_TABLES = ["fact_sessions", "fact_user_day", "fact_user_firsts"]
+# raw tables the facts are derived from
+FACT_INPUTS = {"users", "events", "purchases", "ads_events"}
+
+# Typed column list and sort order of each warehouse table
+WAREHOUSE_SCHEMA = {
+    "users": (
+        [
+            ("user_id", "BIGINT"),
+            ("install_ts", "TIMESTAMP"),
+            ("country", "VARCHAR"),
+            ("platform", "VARCHAR"),
+            ("trait_skill", "DOUBLE"),
+            ("trait_spender_propensity", "DOUBLE"),
+            ("trait_ad_affinity", "DOUBLE"),
+        ],
+        "user_id",
+    ),
+    "ab_assignments": (
+        [
+            ("user_id", "BIGINT"),
+            ("experiment_name", "VARCHAR"),
+            ("variant", "VARCHAR"),
+            ("assign_ts", "TIMESTAMP"),
+        ],
+        "experiment_name, user_id",
+    ),
+    "events": (
+        [
+            ("event_ts", "TIMESTAMP"),
+            ("user_id", "BIGINT"),
+            ("session_id", "VARCHAR"),
+            ("event_name", "VARCHAR"),
+            ("level", "INTEGER"),
+            ("currency_delta", "BIGINT"),
+            ("currency_balance", "BIGINT"),
+        ],
+        "user_id, event_ts",
+    ),
+    "purchases": (
+        [
+            ("purchase_ts", "TIMESTAMP"),
+            ("user_id", "BIGINT"),
+            ("revenue_usd", "DOUBLE"),
+            ("purchase_type", "VARCHAR"),
+            ("sku", "VARCHAR"),
+        ],
+        "user_id, purchase_ts",
+    ),
+    "ads_events": (
+        [
+            ("ad_ts", "TIMESTAMP"),
+            ("user_id", "BIGINT"),
+            ("ad_format", "VARCHAR"),
+            ("ad_revenue_usd", "DOUBLE"),
+            ("placement", "VARCHAR"),
+        ],
+        "user_id, ad_ts",
+    ),
+}
+
 def split_sql(script: str):
     """
     Split SQL script into statements by semicolon, but do NOT split inside
@@ -63,41 +135,521 @@ def is_select(stmt: str) -> bool:
     return s.startswith("select") or s.startswith("with")
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python scripts/run_sql.py sql/01_event_validation.sql")
-        raise SystemExit(1)
+CREATE_RE = re.compile(
+    r"^create\s+(?:or\s+replace\s+)?(temp\s+|temporary\s+)?(?:view|table)\s+(?:if\s+not\s+exists\s+)?([\w.]+)"
+)
+WRITE_RE = re.compile(
+    r"^(?:insert\s+(?:or\s+replace\s+)?into|delete\s+from|update|drop\s+(?:view|table)(?:\s+if\s+exists)?)\s+([\w.]+)"
+)
+# rows printed per SELECT and rows fetched per batch when streaming results
+PREVIEW_ROWS = 50
+BATCH_ROWS = 100_000
+EXPORT_FORMATS = ["parquet", "csv"]
+PROFILE_PATH = Path("outputs") / "run_sql_profile.json"
 
-    sql_file = Path(sys.argv[1])
-    if not sql_file.exists():
-        raise FileNotFoundError(sql_file)
+IDENT_RE = re.compile(r"[a-z_][\w.]*")
 
-    sql_text = sql_file.read_text(encoding="utf-8")
-    stmts = split_sql(sql_text)
 
-    con = duckdb.connect(database=":memory:")
+def statement_body(stmt: str) -> str:
+    # lowercased statement without string literals and comments
+    s = re.sub(r"'(?:[^']|'')*'", "''", stmt)
+    s = re.sub(r"--[^\n]*", " ", s)
+    return " ".join(s.split()).lower()
 
-    print(f"▶ Running: {sql_file} (statements: {len(stmts)})\n")
 
-    for idx, stmt in enumerate(stmts, start=1):
-        # skip pure comment blocks
-        if not stmt.strip():
-            continue
+def object_name(name: str) -> str:
+    # wh.events / main.events -> events
+    return name.rsplit(".", 1)[-1]
+
+
+def plan_statements(files: list) -> list:
+    """
+    Turn the statements of the given SQL files into steps with dependencies.
+
+    A step waits for the last earlier step that created or modified an object
+    it mentions; a write also waits for every step that read the object since
+    its last write. Statements that are neither SELECTs nor recognised
+    CREATE/INSERT/DELETE/UPDATE/DROP (SET, USE, ...) wait for everything
+    before them and everything after waits for them.
+
+    Non-SELECTs and anything mentioning a TEMP object run in source order on
+    the main connection (DuckDB temp objects are per connection); the other
+    SELECTs may run concurrently on cursors.
+    """
+    steps = []
+    last_write, readers = {}, {}
+    temp = set()
+    barrier = None
+    prev_main = None
+    for sql_file, stmts in files:
+        for idx, stmt in enumerate(stmts, start=1):
+            body = statement_body(stmt)
+            # skip pure comment blocks
+            if not body:
+                continue
+            i = len(steps)
+            names = {object_name(n) for n in IDENT_RE.findall(body)}
+            select = is_select(stmt)
+            match = None if select else (CREATE_RE.match(body) or WRITE_RE.match(body))
+            written = object_name(match.groups()[-1]) if match else None
+
+            deps = {last_write[n] for n in names if n in last_write}
+            if barrier is not None:
+                deps.add(barrier)
+            if match is not None and match.re is CREATE_RE and match.group(1):
+                temp.add(written)
+            on_main = not select or bool(names & temp)
+            if on_main and prev_main is not None:
+                deps.add(prev_main)
+
+            if not select and match is None:
+                deps = set(range(i))
+                barrier = i
+            else:
+                if written is not None:
+                    deps.update(readers.pop(written, []))
+                    last_write[written] = i
+                for n in names - {written}:
+                    if n in last_write:
+                        readers.setdefault(n, []).append(i)
+            deps.discard(i)
+
+            if on_main:
+                prev_main = i
+            steps.append({
+                "file": sql_file,
+                "file_statements": len(stmts),
+                "idx": idx,
+                "sql": stmt,
+                "select": select,
+                "main": on_main,
+                "deps": deps,
+            })
+    return steps
+
+
+def open_export(path: Path, schema):
+    try:
+        import pyarrow.csv as pacsv
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise SystemExit("--export requires pyarrow (pip install pyarrow)") from exc
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".csv":
+        return pacsv.CSVWriter(str(path), schema)
+    return pq.ParquetWriter(str(path), schema)
+
+
+def fetch_result(con, result, batch_rows: int, export_path: Path = None):
+    """
+    Stream a SELECT result instead of materializing it: keep the first
+    PREVIEW_ROWS rows for printing, count the rest and, with `export_path`,
+    write every batch to that Parquet/CSV file. Memory depends on
+    `batch_rows`, not on the size of the result.
+    Returns (preview, total rows): a DataFrame, or with `export_path` an
+    Arrow table for preview_frame() to convert.
+    """
+    head, rows = [], 0
+    if export_path is None:
+        vectors = max(1, -(-batch_rows // duckdb.__standard_vector_size__))
+        while True:
+            chunk = result.fetch_df_chunk(vectors)
+            if rows < PREVIEW_ROWS or not head:
+                head.append(chunk.head(PREVIEW_ROWS - rows))
+            if len(chunk) == 0:
+                break
+            rows += len(chunk)
+        return pd.concat(head, ignore_index=True) if len(head) > 1 else head[0], rows
+
+    # to_arrow_reader() replaced fetch_record_batch() in newer DuckDB releases
+    to_reader = getattr(result, "to_arrow_reader", None) or result.fetch_record_batch
+    reader = to_reader(batch_rows)
+    writer = open_export(export_path, reader.schema)
+    try:
+        for batch in reader:
+            if rows < PREVIEW_ROWS:
+                head.append(batch.slice(0, PREVIEW_ROWS - rows))
+            rows += batch.num_rows
+            writer.write_batch(batch)
+    finally:
+        writer.close()
+    import pyarrow as pa
+
+    return pa.Table.from_batches(head, schema=reader.schema), rows
+
+
+def preview_frame(con, preview):
+    """
+    DataFrame of a fetch_result() preview. Arrow previews are converted by
+    DuckDB so they print exactly like fetchdf() would. That is a query of its
+    own on `con`, so it must run after the statement's profile was read.
+    """
+    if preview is None or isinstance(preview, pd.DataFrame):
+        return preview
+    return con.from_arrow(preview).df()
+
+
+def execute_step(con, step: dict, profile: bool = False, batch_rows: int = BATCH_ROWS):
+    """
+    Run one step and return (preview DataFrame or None, rows, profile record
+    or None). SELECT results are streamed (see fetch_result) and exported if
+    the step has an "export" path. With `profile` the connection must have
+    profiling enabled; the record is taken from DuckDB's profiling JSON of
+    the statement just run.
+    """
+    t0 = time.perf_counter()
+    if step["select"]:
+        preview, rows = fetch_result(con, con.execute(step["sql"]), batch_rows, step.get("export"))
+    else:
+        con.execute(step["sql"])
+        preview, rows = None, None
+    wall = time.perf_counter() - t0
+    if not profile:
+        return preview_frame(con, preview), rows, None
+    plan = json.loads(con.get_profiling_information(format="json"))
+    return preview_frame(con, preview), rows, {
+        "file": str(step["file"]),
+        "statement": step["idx"],
+        "summary": statement_summary(step["sql"]),
+        "wall_s": round(wall, 6),
+        "latency_s": plan.get("latency"),
+        "cpu_s": plan.get("cpu_time"),
+        "rows": rows if rows is not None else plan.get("rows_returned"),
+        "rows_scanned": plan.get("cumulative_rows_scanned"),
+        "bytes_read": plan.get("total_bytes_read"),
+        "plan": plan,
+    }
+
+
+def statement_summary(stmt: str, width: int = 70) -> str:
+    # first non-comment line of a statement, for the profile listing
+    for line in stmt.splitlines():
+        line = line.strip()
+        if line and not line.startswith("--"):
+            return line if len(line) <= width else line[: width - 3] + "..."
+    return ""
+
+
+def print_profile(records: list, elapsed: float) -> None:
+    total = sum(r["wall_s"] for r in records) or 1.0
+    print(f"⏱️ Profile: {len(records)} statements, {elapsed:.2f}s elapsed, {total:.2f}s summed statement time")
+    print(f"{'rank':>4} {'wall_s':>8} {'share':>6} {'rows':>10} {'rows_scanned':>13} {'bytes_read':>12}  statement")
+    ranked = sorted(records, key=lambda r: r["wall_s"], reverse=True)
+    for rank, r in enumerate(ranked, start=1):
+        print(
+            f"{rank:>4} {r['wall_s']:>8.3f} {100 * r['wall_s'] / total:>5.1f}% {r['rows'] or 0:>10,} "
+            f"{r['rows_scanned'] or 0:>13,} {r['bytes_read'] or 0:>12,}  "
+            f"{Path(r['file']).name}:{r['statement']}  {r['summary']}"
+        )
+    print()
+
+
+def print_step(step: dict, df, rows: int, printed_files: set) -> None:
+    if step["file"] not in printed_files:
+        printed_files.add(step["file"])
+        print(f"▶ Running: {step['file']} (statements: {step['file_statements']})\n")
+    if df is None:
+        return
+    print(f"--- RESULT {step['idx']} (rows={rows}) ---")
+    if rows == 0:
+        print("Empty result\n")
+    else:
+        print(df.head(PREVIEW_ROWS).to_string(index=False))
+        print()
+    if step.get("export") is not None:
+        print(f"Saved: {step['export']}\n")
+
+
+def run_steps(
+    con, steps: list, workers: int, cursor_setup: list, profile: bool = False, batch_rows: int = BATCH_ROWS
+) -> list:
+    """
+    Execute the planned steps, starting each one as soon as its dependencies
+    are done. SELECTs off the main connection run on a pool of `workers`
+    cursors (each primed with `cursor_setup`, e.g. USE wh). Results are
+    printed in source order. Returns the per-statement profile records (in
+    source order) when `profile` is set, else an empty list.
+    """
+    cursors = queue.Queue()
+    for _ in range(max(workers - 1, 1)):
+        cur = con.cursor()
+        for stmt in cursor_setup:
+            cur.execute(stmt)
+        cursors.put(cur)
 
+    def run_on_cursor(step):
+        cur = cursors.get()
         try:
-            if is_select(stmt):
-                df = con.execute(stmt).fetchdf()
-                print(f"--- RESULT {idx} (rows={len(df)}) ---")
-                if len(df) == 0:
-                    print("Empty result\n")
+            return execute_step(cur, step, profile, batch_rows)
+        finally:
+            cursors.put(cur)
+
+    results, errors = {}, {}
+    started, done = set(), set()
+    running = {}
+    printed, printed_files = 0, set()
+    records = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while printed < len(steps):
+            # once something failed, only finish what comes before it
+            limit = min(errors) if errors else len(steps)
+            for i in range(limit):
+                step = steps[i]
+                if i in started or not step["deps"] <= done:
+                    continue
+                started.add(i)
+                if step["main"]:
+                    running[pool.submit(execute_step, con, step, profile, batch_rows)] = i
                 else:
-                    print(df.head(50).to_string(index=False))
-                    print()
-            else:
-                con.execute(stmt)
-        except Exception as e:
-            print(f"\n❌ Error in statement {idx}:\n{stmt}\n")
-            raise
+                    running[pool.submit(run_on_cursor, step)] = i
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = running.pop(future)
+                try:
+                    results[i] = future.result()
+                    done.add(i)
+                except Exception as e:
+                    errors[i] = e
+
+            while printed in results:
+                df, rows, record = results.pop(printed)
+                print_step(steps[printed], df, rows, printed_files)
+                if record is not None:
+                    records.append(record)
+                printed += 1
+            if printed in errors:
+                step = steps[printed]
+                print(f"\n❌ Error in statement {step['idx']} of {step['file']}:\n{step['sql']}\n")
+                raise errors[printed]
+    return records
+
+
+def table_source(data_dir: Path, table: str):
+    """
+    DuckDB reader for one raw table plus the files behind it, matching the
+    layout the generator wrote: flat CSV, sharded CSV parts or
+    (hive-partitioned) Parquet. The partition keys are not read back: they
+    only repeat the day of the timestamp, and the views must have the same
+    columns whatever the format. Returns (None, []) if there is no data.
+    """
+    flat = data_dir / f"{table}.csv"
+    part_dir = data_dir / table
+    if flat.exists():
+        return f"read_csv_auto('{flat.as_posix()}')", [flat]
+    parquet = sorted(part_dir.rglob("*.parquet"))
+    if parquet:
+        return f"read_parquet('{part_dir.as_posix()}/**/*.parquet', hive_partitioning = false)", parquet
+    parts = sorted(part_dir.glob("part-*.csv"))
+    if parts:
+        return f"read_csv_auto('{part_dir.as_posix()}/part-*.csv')", parts
+    return None, []
+
+
+def raw_readers(data_dir: Path) -> dict:
+    readers = {}
+    for table in TABLES:
+        reader, _ = table_source(data_dir, table)
+        if reader is None:
+            raise FileNotFoundError(f"No data for table '{table}' under {data_dir}")
+        readers[table] = reader
+    return readers
+
+
+def create_source_views(con, readers: dict) -> None:
+    sources = SOURCES_SQL.read_text(encoding="utf-8").format(**readers)
+    for stmt in split_sql(sources):
+        con.execute(stmt)
+
+
+def source_signature(files) -> str:
+    stats = [f.stat() for f in files]
+    return f"{len(stats)}:{sum(st.st_size for st in stats)}:{max(st.st_mtime_ns for st in stats)}"
+
+
+def build_facts(con) -> None:
+    t0 = time.perf_counter()
+    for stmt in split_sql(FACTS_SQL.read_text(encoding="utf-8")):
+        con.execute(stmt)
+    print(f"🧱 Built {', '.join(FACT_TABLES)} ({time.perf_counter() - t0:.2f}s)\n")
+
+
+def ingest(con, data_dir: Path) -> list:
+    """
+    Load the raw tables into the attached warehouse (`wh`) as typed tables
+    sorted by user. Only tables whose source files changed since their last
+    load are reloaded; if nothing changed this is a metadata lookup.
+    Returns the names of the reloaded tables.
+    """
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS wh._ingest_log ("
+        "table_name VARCHAR PRIMARY KEY, source_signature VARCHAR, rows BIGINT, loaded_at TIMESTAMP)"
+    )
+    loaded = dict(con.execute("SELECT table_name, source_signature FROM wh._ingest_log").fetchall())
+
+    readers, stale = {}, []
+    for table in TABLES:
+        reader, files = table_source(data_dir, table)
+        if reader is None:
+            if table not in loaded:
+                raise FileNotFoundError(f"No data for table '{table}' under {data_dir}")
+            # raw files gone: keep serving what the warehouse already has
+            readers[table] = f"wh.{table}"
+            continue
+        readers[table] = reader
+        signature = source_signature(files)
+        if loaded.get(table) != signature:
+            stale.append((table, signature))
+
+    if not stale:
+        print("✅ Warehouse up to date, skipping ingestion\n")
+        return []
+
+    create_source_views(con, readers)
+    for table, signature in stale:
+        columns, order_by = WAREHOUSE_SCHEMA[table]
+        select = ", ".join(f"CAST({col} AS {typ}) AS {col}" for col, typ in columns)
+        t0 = time.perf_counter()
+        con.execute(f"CREATE OR REPLACE TABLE wh.{table} AS SELECT {select} FROM {table} ORDER BY {order_by}")
+        rows = con.execute(f"SELECT COUNT(*) FROM wh.{table}").fetchone()[0]
+        con.execute("INSERT OR REPLACE INTO wh._ingest_log VALUES (?, ?, ?, now())", [table, signature, rows])
+        print(f"📥 Loaded {table:<15} {rows:>12,} rows ({time.perf_counter() - t0:.2f}s)")
+    print()
+    return [table for table, _ in stale]
+
+
+def refresh_warehouse_facts(con, reloaded: list) -> None:
+    """
+    Rebuild the fact tables inside the warehouse when one of their inputs was
+    reloaded (or they do not exist yet). Expects `wh` to be the default catalog.
+    """
+    existing = {
+        row[0]
+        for row in con.execute(
+            "SELECT table_name FROM duckdb_tables() WHERE database_name = 'wh' AND schema_name = 'main'"
+        ).fetchall()
+    }
+    if FACT_INPUTS.intersection(reloaded) or not existing.issuperset(FACT_TABLES):
+        build_facts(con)
+
+
+def connect(data_dir: Path, db=None):
+    """
+    In-memory DuckDB connection with the source views and fact tables ready.
+    With `db` (a path, or True for <data_dir>/warehouse.duckdb) the data is
+    ingested into that warehouse first and reports run against it.
+    """
+    con = duckdb.connect(database=":memory:")
+
+    if db is not None:
+        db_path = data_dir / "warehouse.duckdb" if db is True else db
+        con.execute(f"ATTACH '{db_path.as_posix()}' AS wh")
+        reloaded = ingest(con, data_dir)
+        # reports resolve users/events/fact_* (and persist their own tables) in the warehouse
+        con.execute("USE wh")
+        refresh_warehouse_facts(con, reloaded)
+    else:
+        create_source_views(con, raw_readers(data_dir))
+        build_facts(con)
+    return con
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a SQL report against the game data with DuckDB.")
+    parser.add_argument(
+        "sql_files", type=Path, nargs="*", help="e.g. sql/01_event_validation.sql (several share one connection)"
+    )
+    parser.add_argument("--data-dir", type=Path, default=Path("data"), help="raw data directory (default: %(default)s)")
+    parser.add_argument(
+        "--db",
+        action="store_true",
+        help="ingest into and report from the persistent DuckDB warehouse; without a SQL file only ingests",
+    )
+    parser.add_argument(
+        "--db-path",
+        type=Path,
+        help="warehouse file, implies --db (default: <data-dir>/warehouse.duckdb)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=min(8, os.cpu_count() or 1),
+        help="statements to run concurrently (default: %(default)s, 1 = one after another)",
+    )
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=BATCH_ROWS,
+        help="rows fetched at a time when streaming SELECT results (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--export",
+        type=Path,
+        help="directory to write every SELECT result to in full (<sql file>_<statement>.<format>)",
+    )
+    parser.add_argument("--export-format", choices=EXPORT_FORMATS, default="parquet", help="default: %(default)s")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every statement with DuckDB profiling, print a ranked summary "
+        "and write the profile (incl. query plans) as JSON to --profile-out",
+    )
+    parser.add_argument("--profile-out", type=Path, default=PROFILE_PATH, help="default: %(default)s")
+    args = parser.parse_args()
+
+    db = args.db_path or (True if args.db else None)
+    if not args.sql_files and db is None:
+        parser.error("give SQL files, --db, or both")
+    for sql_file in args.sql_files:
+        if not sql_file.exists():
+            raise FileNotFoundError(sql_file)
+    if args.profile:
+        out = args.profile_out.resolve()
+        if any(out == sql_file.resolve() for sql_file in args.sql_files):
+            parser.error(f"--profile-out {args.profile_out} is one of the SQL files")
+        if out.suffix != ".json" and out.exists():
+            parser.error(f"--profile-out {args.profile_out} exists and is not a .json file")
+
+    con = connect(args.data_dir, db)
+
+    if not args.sql_files:
+        return
+
+    files = [(sql_file, split_sql(sql_file.read_text(encoding="utf-8"))) for sql_file in args.sql_files]
+    cursor_setup = ["USE wh"] if db is not None else []
+    profile = args.profile
+    if profile:
+        # profiling settings are per connection: main connection and every cursor
+        cursor_setup.append("PRAGMA enable_profiling = 'no_output'")
+        con.execute("PRAGMA enable_profiling = 'no_output'")
+
+    steps = plan_statements(files)
+    if args.export is not None:
+        for step in steps:
+            if step["select"]:
+                step["export"] = args.export / f"{step['file'].stem}_{step['idx']:02d}.{args.export_format}"
+
+    t0 = time.perf_counter()
+    records = run_steps(con, steps, max(args.workers, 1), cursor_setup, profile, max(args.batch_rows, 1))
+    elapsed = time.perf_counter() - t0
+    if not profile:
+        return
+
+    print_profile(records, elapsed)
+    args.profile_out.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": [str(f) for f in args.sql_files],
+        "data_dir": str(args.data_dir),
+        "db": db is not None,
+        "workers": max(args.workers, 1),
+        "duckdb_version": duckdb.__version__,
+        "elapsed_s": round(elapsed, 6),
+        "statements": records,
+    }
+    args.profile_out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Saved: {args.profile_out}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,81 @@
+import sqlite3
+import time
+import numpy as np
+from pathlib import Path
+
+CACHE_MAX_BYTES = 64 << 20
+# evict down to this share of max_bytes, so a full cache does not evict on every run
+EVICT_TO = 0.8
+
+
+class ScenarioCache:
+    """
+    Content-addressed store of per-scenario simulation results in one SQLite
+    file: key = digest of everything the result depends on, value = the
+    result row as packed float64. Least recently used entries are evicted
+    when the file grows past max_bytes.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.con = None
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(self.path)
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, value BLOB NOT NULL, used REAL NOT NULL)"
+            " WITHOUT ROWID"
+        )
+        return self
+
+    def __exit__(self, *exc):
+        self.evict()
+        self.con.close()
+
+    def get_many(self, keys: list) -> dict:
+        """{key: float64 array} of the keys present; marks them as used."""
+        found = {}
+        for lo in range(0, len(keys), 500):
+            chunk = keys[lo:lo + 500]
+            marks = ",".join("?" * len(chunk))
+            for key, value in self.con.execute(f"SELECT key, value FROM results WHERE key IN ({marks})", chunk):
+                found[key] = np.frombuffer(value, dtype=np.float64)
+        if found:
+            now = time.time()
+            self.con.executemany("UPDATE results SET used = ? WHERE key = ?", [(now, k) for k in found])
+            self.con.commit()
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items: dict) -> None:
+        now = time.time()
+        self.con.executemany(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+            [(key, np.asarray(value, dtype=np.float64).tobytes(), now) for key, value in items.items()],
+        )
+        self.con.commit()
+
+    def size_bytes(self) -> int:
+        pages = self.con.execute("PRAGMA page_count").fetchone()[0]
+        freelist = self.con.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - freelist) * self.con.execute("PRAGMA page_size").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the file is under max_bytes; returns how many."""
+        size = self.size_bytes()
+        if size <= self.max_bytes:
+            return 0
+        rows = self.con.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        drop = rows - int(rows * EVICT_TO * self.max_bytes / size)
+        self.con.execute(
+            "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used LIMIT ?)", (drop,)
+        )
+        self.con.commit()
+        # give the freed pages back; the file is at most max_bytes, so this is quick
+        self.con.execute("VACUUM")
+        return drop
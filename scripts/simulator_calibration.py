@@ -0,0 +1,235 @@
+import argparse
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from run_sql import FACTS_SQL, SOURCES_SQL, SQL_DIR, TABLES, connect, split_sql, table_source
+
+DATA_DIR = Path("data")
+OUT_DIR = Path("outputs")
+CALIBRATION_PATH = OUT_DIR / "simulator_calibration.json"
+# bump when the artifact layout or the baseline definitions change
+CALIBRATION_VERSION = 1
+USER_METRICS_SQL = SQL_DIR / "05_ab_user_metrics.sql"
+EXPERIMENT = "reward_20pct_uplift"
+CONTROL = "control"
+VARIANT = "variant"
+HASH_CHUNK = 1 << 20
+
+# simulator constant <- column of baseline_query()
+BASELINES = {
+    "CONTROL_USERS": "users",
+    "CONTROL_IAP_REVENUE": "iap_revenue",
+    "CONTROL_ADS_REVENUE": "ads_revenue",
+    "CONTROL_PAYERS": "payers",
+    "CONTROL_AD_IMPRESSIONS_PER_USER": "ad_impressions_per_user",
+    "BASE_COMPLETION": "completion_rate",
+    "BASE_WEEKLY_SESSIONS": "sessions_per_user",
+}
+# simulator constant <- relative lift of this column, variant vs control
+LIFTS = {
+    "AB_LIFT_COMPLETION": "completion_rate",
+    "AB_LIFT_SESSIONS": "sessions_per_user",
+    "AB_LIFT_IAP_REV": "iap_arpu",
+}
+
+
+def input_files(data_dir: Path):
+    """
+    {name: path} of the raw files of every table (named relative to
+    data_dir) and of the SQL the baselines depend on; None if a table has
+    no data.
+    """
+    files = {}
+    for table in TABLES:
+        _, table_files = table_source(data_dir, table)
+        if not table_files:
+            return None
+        files.update({f.relative_to(data_dir).as_posix(): f for f in table_files})
+    for sql in (SOURCES_SQL, FACTS_SQL, USER_METRICS_SQL):
+        files[f"sql/{sql.name}"] = sql
+    return files
+
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_inputs(files, known: dict) -> dict:
+    """
+    sha256 of every input, keyed by name. Files whose path, size and mtime
+    match the previous artifact reuse its hash, so an unchanged tree is not read.
+    """
+    inputs = {}
+    for name, path in files.items():
+        st = path.stat()
+        prev = known.get(name, {})
+        same = (prev.get("path"), prev.get("size"), prev.get("mtime_ns")) == (
+            path.as_posix(), st.st_size, st.st_mtime_ns
+        )
+        inputs[name] = {
+            "path": path.as_posix(),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": prev["sha256"] if same else file_hash(path),
+        }
+    return inputs
+
+
+def inputs_key(inputs: dict) -> str:
+    """Digest of the input contents alone; outputs/ab_calibration.json carries it too."""
+    content = sorted((name, i["sha256"]) for name, i in inputs.items())
+    return hashlib.sha256(json.dumps(content).encode("utf-8")).hexdigest()
+
+
+def calibration_key(inputs: dict, experiment: str, control: str, variant: str) -> str:
+    # content only: copying or touching the data does not invalidate the artifact
+    content = sorted((name, i["sha256"]) for name, i in inputs.items())
+    payload = json.dumps([CALIBRATION_VERSION, experiment, control, variant, content])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def baseline_query(experiment: str) -> tuple:
+    """Per-variant aggregates of one experiment over the user metrics of 05_ab_user_metrics.sql."""
+    (user_metrics,) = split_sql(USER_METRICS_SQL.read_text(encoding="utf-8"))
+    sql = f"""
+SELECT
+  variant,
+  COUNT(*) AS users,
+  SUM(iap_revenue) AS iap_revenue,
+  SUM(ads_revenue) AS ads_revenue,
+  COUNT(*) FILTER (WHERE iap_revenue > 0) AS payers,
+  SUM(ad_impressions) / COUNT(*) AS ad_impressions_per_user,
+  SUM(level_completes) / NULLIF(SUM(level_starts), 0) AS completion_rate,
+  SUM(sessions) / COUNT(*) AS sessions_per_user,
+  SUM(iap_revenue) / COUNT(*) AS iap_arpu
+FROM ({user_metrics}) um
+WHERE experiment_name = ?
+GROUP BY variant
+"""
+    return sql, [experiment]
+
+
+def compute(con, experiment: str, control: str, variant: str) -> dict:
+    sql, params = baseline_query(experiment)
+    rows = con.execute(sql, params).fetchdf().set_index("variant")
+    if control not in rows.index:
+        raise SystemExit(f"No '{control}' users in experiment '{experiment}'")
+    base = rows.loc[control]
+    baselines = {const: float(base[col]) for const, col in BASELINES.items()}
+    for const in ("CONTROL_USERS", "CONTROL_PAYERS"):
+        baselines[const] = int(baselines[const])
+    lifts = {}
+    if variant in rows.index:
+        lifts = {const: round(float(rows.at[variant, col] / base[col] - 1.0), 6) for const, col in LIFTS.items()}
+    return {"baselines": baselines, "lifts": lifts}
+
+
+def read_artifact(path: Path):
+    if not path.exists():
+        return None
+    artifact = json.loads(path.read_text(encoding="utf-8"))
+    return artifact if artifact.get("version") == CALIBRATION_VERSION else None
+
+
+def load_calibration(
+    data_dir: Path = None,
+    db=None,
+    path: Path = CALIBRATION_PATH,
+    experiment: str = None,
+    control: str = None,
+    variant: str = None,
+    force: bool = False,
+):
+    """
+    Simulator baselines measured on the data, cached in `path` and keyed by
+    the sha256 of the input files. Unchanged inputs return the artifact as
+    is; changed inputs recompute it with one aggregate query. Arguments
+    left as None are taken from the artifact (else data/, no warehouse and
+    EXPERIMENT / CONTROL / VARIANT), so a plain load_calibration() re-checks
+    whatever was calibrated last. If the inputs are incomplete, the last
+    artifact is returned unchecked (None if there is none).
+    """
+    prior = read_artifact(path)
+    last = prior or {"data_dir": DATA_DIR.as_posix(), "db": None,
+                     "experiment": EXPERIMENT, "control": CONTROL, "variant": VARIANT}
+    if data_dir is None:
+        data_dir, db = Path(last["data_dir"]), last["db"]
+    experiment = experiment or last["experiment"]
+    control = control or last["control"]
+    variant = variant or last["variant"]
+    files = input_files(data_dir)
+    if files is None:
+        return prior
+
+    inputs = hash_inputs(files, prior["inputs"] if prior else {})
+    key = calibration_key(inputs, experiment, control, variant)
+    if prior and prior["key"] == key and not force:
+        if prior["inputs"] != inputs:
+            # same content, new paths / timestamps: remember them so the next check skips hashing
+            prior["inputs"] = inputs
+            path.write_text(json.dumps(prior, indent=2), encoding="utf-8")
+        return prior
+
+    t0 = time.perf_counter()
+    con = connect(data_dir, Path(db) if isinstance(db, str) else db)
+    artifact = {
+        "version": CALIBRATION_VERSION,
+        "key": key,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "data_dir": data_dir.as_posix(),
+        "db": db.as_posix() if isinstance(db, Path) else db,
+        "experiment": experiment,
+        "control": control,
+        "variant": variant,
+        **compute(con, experiment, control, variant),
+        "inputs": inputs,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(artifact, indent=2), encoding="utf-8")
+    print(f"🎯 Recalibrated simulator baselines from {data_dir} ({time.perf_counter() - t0:.2f}s) -> {path}")
+    return artifact
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure the economy simulator's baselines on the raw data.")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="raw data directory (default: %(default)s)")
+    parser.add_argument(
+        "--db",
+        action="store_true",
+        help="read from the persistent DuckDB warehouse (see run_sql.py --db)",
+    )
+    parser.add_argument(
+        "--db-path",
+        type=Path,
+        help="warehouse file, implies --db (default: <data-dir>/warehouse.duckdb)",
+    )
+    parser.add_argument("--experiment", default=EXPERIMENT, help="default: %(default)s")
+    parser.add_argument("--control", default=CONTROL, help="default: %(default)s")
+    parser.add_argument("--variant", default=VARIANT, help="default: %(default)s")
+    parser.add_argument("--out", type=Path, default=CALIBRATION_PATH, help="default: %(default)s")
+    parser.add_argument("--force", action="store_true", help="recompute even if the inputs are unchanged")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    t0 = time.perf_counter()
+    artifact = load_calibration(
+        args.data_dir, args.db_path or (True if args.db else None), args.out, args.experiment, args.control, args.variant, args.force
+    )
+    if artifact is None:
+        raise SystemExit(f"No complete data under {args.data_dir} and no previous {args.out}")
+    print(f"Calibration key {artifact['key'][:12]} ({artifact['created_at']}, checked in {time.perf_counter() - t0:.2f}s)")
+    for name, value in {**artifact["baselines"], **artifact["lifts"]}.items():
+        print(f"  {name:<32} {value}")
+    print(f"\nSaved: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+import argparse
+import json
+import time
+from collections import Counter
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from run_sql import create_source_views, raw_readers
+
+OUT_DIR = Path("outputs")
+REPORT_PATH = OUT_DIR / "validation_report.json"
+# vectors of 2048 rows per chunk
+CHUNK_VECTORS = 64
+SAMPLE_ROWS = 50
+
+# Checked in this order, cheapest first, so a failing small table stops the run before the events scan
+TABLES = ["users", "ab_assignments", "purchases", "ads_events", "events"]
+NOT_NULL = {
+    "users": ["user_id", "install_ts"],
+    "events": ["event_ts", "user_id", "session_id", "event_name"],
+}
+TIME_RANGE = {"users": "install_ts", "events": "event_ts", "purchases": "purchase_ts"}
+# extra columns computed in the same scan: duplicate key and session key hashes
+HASH_COLUMNS = {
+    "users": "hash(user_id) AS _row_key",
+    "events": "hash(user_id, session_id, event_name, event_ts) AS _row_key, hash(user_id, session_id) AS _session_key",
+}
+DUPLICATE_KEYS = {"users": ["user_id"], "events": ["user_id", "session_id", "event_name", "event_ts"]}
+DUPLICATE_CHECK = {"users": "duplicate_users", "events": "duplicate_events"}
+
+# Findings that fail the run; everything else is reported as a warning.
+# Sessions cut by the events window (00_sources.sql) legitimately miss a start or end, and
+# timestamps are per minute, so two level events of a session can share a key.
+ERROR_CHECKS = {
+    "empty_table", "null_values", "duplicate_users", "session_end_before_start", "negative_level_reward",
+}
+
+
+class HashSet64:
+    """
+    Set of 64-bit hashes as sorted numpy runs (8 bytes per key). Runs are
+    merged like a binary counter, so n inserts cost O(n log n) overall.
+    """
+
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(keys), dtype=bool)
+        for run in self.runs:
+            pos = np.minimum(np.searchsorted(run, keys), len(run) - 1)
+            found |= run[pos] == keys
+        return found
+
+    def add(self, keys: np.ndarray) -> np.ndarray:
+        """Insert keys; returns a mask of those seen before (earlier in `keys` included)."""
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        seen = np.zeros(len(keys), dtype=bool)
+        seen[1:] = sorted_keys[1:] == sorted_keys[:-1]
+        seen |= self.contains(sorted_keys)
+        run = sorted_keys[~seen]
+        while self.runs and len(self.runs[-1]) <= len(run):
+            run = np.sort(np.concatenate([self.runs.pop(), run]), kind="mergesort")
+        if len(run):
+            self.runs.append(run)
+        mask = np.empty(len(keys), dtype=bool)
+        mask[order] = seen
+        return mask
+
+
+class Finding:
+    def __init__(self, check: str, table: str):
+        self.check = check
+        self.table = table
+        self.count = 0
+        self.samples = []
+
+    def add(self, rows: pd.DataFrame, count: int = None) -> None:
+        self.count += len(rows) if count is None else count
+        room = SAMPLE_ROWS - len(self.samples)
+        if room > 0 and len(rows):
+            self.samples += json.loads(rows.head(room).to_json(orient="records", date_format="iso"))
+
+    def to_dict(self) -> dict:
+        severity = "error" if self.check in ERROR_CHECKS else "warning"
+        return {"check": self.check, "table": self.table, "severity": severity, "count": self.count,
+                "samples": self.samples}
+
+
+class DuplicateKeys(Finding):
+    """
+    Duplicates counted like 01_event_validation.sql: `count` is the number of
+    keys seen more than once, `extra_rows` the rows beyond the first of each,
+    and the samples are the first duplicate keys found, with their `cnt`.
+    Memory grows with the duplicates, not with the table.
+    """
+
+    def __init__(self, check: str, table: str):
+        super().__init__(check, table)
+        self.extra = Counter()
+        self.sampled = {}
+
+    def add_keys(self, hashes: np.ndarray, rows: pd.DataFrame) -> None:
+        self.extra.update(hashes.tolist())
+        self.count = len(self.extra)
+        for h, row in zip(hashes.tolist(), json.loads(rows.to_json(orient="records", date_format="iso"))):
+            if h not in self.sampled and len(self.samples) < SAMPLE_ROWS:
+                self.sampled[h] = len(self.samples)
+                self.samples.append(row)
+
+    def to_dict(self) -> dict:
+        for h, i in self.sampled.items():
+            self.samples[i]["cnt"] = self.extra[h] + 1
+        return {**super().to_dict(), "extra_rows": sum(self.extra.values())}
+
+
+def public(chunk: pd.DataFrame) -> pd.DataFrame:
+    return chunk[[c for c in chunk.columns if not c.startswith("_")]]
+
+
+class SessionState:
+    """
+    Start / end of each (user, session) over the stream. A session is checked
+    and dropped as soon as both its start and its end have been seen, so
+    memory holds only the sessions still open. Start/end events arriving for
+    an already checked session are counted as late and otherwise ignored.
+    """
+
+    def __init__(self, table: str):
+        self.open = {}
+        self.checked = HashSet64()
+        self.all = HashSet64()
+        self.late_events = 0
+        self.end_before_start = Finding("session_end_before_start", table)
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        self.all.add(np.unique(chunk["_session_key"].to_numpy()))
+        edges = chunk[chunk["event_name"].isin(["session_start", "session_end"])]
+        if edges.empty:
+            return
+        is_start = edges["event_name"] == "session_start"
+        per_session = pd.DataFrame({
+            "key": edges["_session_key"],
+            "user_id": edges["user_id"],
+            "session_id": edges["session_id"],
+            "start": edges["event_ts"].where(is_start),
+            "end": edges["event_ts"].where(~is_start),
+        }).groupby("key", sort=False).agg(
+            user_id=("user_id", "first"), session_id=("session_id", "first"), start=("start", "min"), end=("end", "max"),
+        )
+        late = self.checked.contains(per_session.index.to_numpy())
+        self.late_events += int(late.sum())
+        finished = []
+        for key, user_id, session_id, start, end in per_session[~late].itertuples(name=None):
+            state = self.open.get(key)
+            if state is not None:
+                start = state[2] if pd.isna(start) else start if pd.isna(state[2]) else min(start, state[2])
+                end = state[3] if pd.isna(end) else end if pd.isna(state[3]) else max(end, state[3])
+            if pd.isna(start) or pd.isna(end):
+                self.open[key] = (user_id, session_id, start, end)
+                continue
+            self.open.pop(key, None)
+            finished.append(key)
+            if end < start:
+                self.end_before_start.add(pd.DataFrame([{
+                    "user_id": user_id, "session_id": session_id, "session_start_ts": start, "session_end_ts": end,
+                }]))
+        if finished:
+            self.checked.add(np.array(finished, dtype=np.uint64))
+
+    def totals(self) -> dict:
+        missing_end = sum(1 for *_, end in self.open.values() if pd.isna(end))
+        missing_start = sum(1 for _, _, start, _ in self.open.values() if pd.isna(start))
+        return {"sessions_missing_end": missing_end, "sessions_missing_start": missing_start,
+                "total_sessions": len(self.all), "late_session_events": self.late_events}
+
+
+def validate_table(con, table: str) -> tuple:
+    """One chunked scan of `table`: (stats, findings)."""
+    extra = HASH_COLUMNS.get(table)
+    result = con.execute(f"SELECT *{', ' + extra if extra else ''} FROM {table}")
+    rows = 0
+    nulls = Counter()
+    lo = hi = None
+    names = Counter()
+    keys = HashSet64() if table in DUPLICATE_KEYS else None
+    sessions = SessionState(table) if table == "events" else None
+    findings = {
+        check: Finding(check, table) for check in ("null_values", "negative_balance", "negative_level_reward")
+    }
+    if table in DUPLICATE_CHECK:
+        findings[DUPLICATE_CHECK[table]] = DuplicateKeys(DUPLICATE_CHECK[table], table)
+
+    while True:
+        chunk = result.fetch_df_chunk(CHUNK_VECTORS)
+        if chunk.empty:
+            break
+        rows += len(chunk)
+        for col in NOT_NULL.get(table, []):
+            missing = chunk[col].isna()
+            if missing.any():
+                nulls[col] += int(missing.sum())
+                findings["null_values"].add(public(chunk[missing]))
+        if table in TIME_RANGE:
+            ts = chunk[TIME_RANGE[table]].dropna()
+            if len(ts):
+                lo = ts.min() if lo is None else min(lo, ts.min())
+                hi = ts.max() if hi is None else max(hi, ts.max())
+        if keys is not None:
+            row_keys = chunk["_row_key"].to_numpy()
+            dup = keys.add(row_keys)
+            if dup.any():
+                findings[DUPLICATE_CHECK[table]].add_keys(row_keys[dup], chunk.loc[dup, DUPLICATE_KEYS[table]])
+        if table == "events":
+            names.update(chunk["event_name"].fillna("<null>").value_counts().to_dict())
+            sessions.update(chunk)
+            balance = chunk["currency_balance"]
+            findings["negative_balance"].add(public(chunk[balance.notna() & (balance < 0)]))
+            delta = chunk["currency_delta"]
+            findings["negative_level_reward"].add(
+                public(chunk[(chunk["event_name"] == "level_complete") & delta.notna() & (delta < 0)])
+            )
+
+    stats = {"rows": rows}
+    if table in NOT_NULL:
+        stats["nulls"] = {col: nulls[col] for col in NOT_NULL[table]}
+    if table in TIME_RANGE:
+        col = TIME_RANGE[table]
+        stats[f"min_{col}"] = None if lo is None else str(lo)
+        stats[f"max_{col}"] = None if hi is None else str(hi)
+    if table == "events":
+        stats["event_names"] = dict(names.most_common())
+        stats.update(sessions.totals())
+        findings["session_end_before_start"] = sessions.end_before_start
+        for check, count in (("session_missing_end", stats["sessions_missing_end"]),
+                             ("session_missing_start", stats["sessions_missing_start"])):
+            findings[check] = Finding(check, table)
+            findings[check].count = count
+    if rows == 0:
+        findings["empty_table"] = Finding("empty_table", table)
+        findings["empty_table"].count = 1
+    return stats, [f.to_dict() for f in findings.values() if f.count]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Validate the raw tables in one chunked pass each (the checks of 01_event_validation.sql)."
+    )
+    parser.add_argument("--data-dir", type=Path, default=Path("data"), help="raw data directory (default: %(default)s)")
+    parser.add_argument("--out", type=Path, default=REPORT_PATH, help="JSON report (default: %(default)s)")
+    parser.add_argument(
+        "--keep-going", action="store_true", help="check every table (default: stop at the first table with an error)"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    t0 = time.perf_counter()
+    con = duckdb.connect(database=":memory:")
+    try:
+        create_source_views(con, raw_readers(args.data_dir))
+    except FileNotFoundError as e:
+        raise SystemExit(f"❌ Validation failed: {e}")
+
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "data_dir": args.data_dir.as_posix(),
+              "tables": {}, "findings": []}
+    for table in TABLES:
+        t1 = time.perf_counter()
+        stats, findings = validate_table(con, table)
+        stats["elapsed_s"] = round(time.perf_counter() - t1, 3)
+        report["tables"][table] = stats
+        report["findings"] += findings
+        errors = [f for f in findings if f["severity"] == "error"]
+        print(f"{'❌' if errors else '✅'} {table:<15} {stats['rows']:>12,} rows ({stats['elapsed_s']:.2f}s)")
+        for f in findings:
+            extra = f" keys, {f['extra_rows']:,} extra rows" if "extra_rows" in f else ""
+            print(f"   {f['severity']:<8} {f['check']:<26} {f['count']:>10,}{extra}")
+        if errors and not args.keep_going:
+            break
+
+    status = "fail" if any(f["severity"] == "error" for f in report["findings"]) else "pass"
+    report["status"] = status
+    report["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nSaved: {args.out} ({report['elapsed_s']:.2f}s)")
+    if status == "fail":
+        raise SystemExit(f"❌ Validation failed: {sum(f['severity'] == 'error' for f in report['findings'])} error check(s)")
+
+
+if __name__ == "__main__":
+    main()
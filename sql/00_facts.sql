@@ -0,0 +1,133 @@
+-- 00_facts.sql
+-- Shared fact tables, built once per data load by run_sql.py (into the
+-- warehouse with --db, otherwise in memory) and read by every report instead
+-- of re-aggregating events:
+--   fact_sessions : one row per (user_id, session_id)
+--   fact_user_day : one row per (user_id, day) with activity + revenue
+--   fact_user_firsts : one row per user, first occurrences + D1/D7 flags
+-- events is scanned exactly once, into the _session_day staging table.
+
+-- ---------------------------------------------------------
+-- STAGING: one pass over events, per (user, session, day)
+-- ---------------------------------------------------------
+CREATE OR REPLACE TEMP TABLE _session_day AS
+SELECT
+  user_id,
+  session_id,
+  DATE_TRUNC('day', event_ts) AS day,
+  MIN(CASE WHEN event_name='session_start' THEN event_ts END) AS session_start_ts,
+  MAX(CASE WHEN event_name='session_end' THEN event_ts END) AS session_end_ts,
+  MIN(CASE WHEN event_name='level_start' THEN event_ts END) AS first_level_start_ts,
+  MIN(CASE WHEN event_name='level_complete' THEN event_ts END) AS first_level_complete_ts,
+  SUM(CASE WHEN event_name='session_start' THEN 1 ELSE 0 END) AS session_starts,
+  SUM(CASE WHEN event_name='session_end' THEN 1 ELSE 0 END) AS session_ends,
+  SUM(CASE WHEN event_name='level_start' THEN 1 ELSE 0 END) AS level_starts,
+  SUM(CASE WHEN event_name='level_complete' THEN 1 ELSE 0 END) AS level_completes
+FROM events
+GROUP BY 1,2,3;
+
+-- ---------------------------------------------------------
+-- SESSIONS
+-- ---------------------------------------------------------
+CREATE OR REPLACE TABLE fact_sessions AS
+SELECT
+  user_id,
+  session_id,
+  MIN(session_start_ts) AS session_start_ts,
+  MAX(session_end_ts) AS session_end_ts,
+  CASE WHEN SUM(session_starts) > 0 THEN 1 ELSE 0 END AS has_start,
+  CASE WHEN SUM(session_ends) > 0 THEN 1 ELSE 0 END AS has_end,
+  MIN(first_level_start_ts) AS first_level_start_ts,
+  MIN(first_level_complete_ts) AS first_level_complete_ts,
+  SUM(level_starts) AS level_starts,
+  SUM(level_completes) AS level_completes
+FROM _session_day
+GROUP BY 1,2
+ORDER BY 1,3;
+
+-- ---------------------------------------------------------
+-- USER x DAY: sessions, levels, IAP and ads
+-- ---------------------------------------------------------
+CREATE OR REPLACE TABLE fact_user_day AS
+SELECT
+  user_id,
+  day,
+  SUM(sessions) AS sessions,
+  SUM(level_starts) AS level_starts,
+  SUM(level_completes) AS level_completes,
+  SUM(iap_revenue_usd) AS iap_revenue_usd,
+  SUM(iap_txn) AS iap_txn,
+  SUM(ads_revenue_usd) AS ads_revenue_usd,
+  SUM(ad_impressions) AS ad_impressions
+FROM (
+  SELECT
+    user_id, day,
+    session_starts AS sessions, level_starts, level_completes,
+    0.0 AS iap_revenue_usd, 0 AS iap_txn, 0.0 AS ads_revenue_usd, 0 AS ad_impressions
+  FROM _session_day
+
+  UNION ALL
+
+  SELECT
+    user_id, DATE_TRUNC('day', purchase_ts),
+    0, 0, 0,
+    revenue_usd, 1, 0.0, 0
+  FROM purchases
+
+  UNION ALL
+
+  SELECT
+    user_id, DATE_TRUNC('day', ad_ts),
+    0, 0, 0,
+    0.0, 0, ad_revenue_usd, 1
+  FROM ads_events
+)
+GROUP BY 1,2
+ORDER BY 1,2;
+
+-- ---------------------------------------------------------
+-- USER: funnel first occurrences + install-based D1/D7
+-- (one pass over fact_sessions and the D1/D7 days of fact_user_day)
+-- ---------------------------------------------------------
+CREATE OR REPLACE TABLE fact_user_firsts AS
+WITH firsts AS (
+  SELECT
+    user_id,
+    MIN(session_start_ts) AS first_session_ts,
+    MIN(first_level_start_ts) AS first_level_start_ts,
+    MIN(first_level_complete_ts) AS first_level_complete_ts
+  FROM fact_sessions
+  GROUP BY 1
+),
+installs AS (
+  SELECT DISTINCT user_id, install_ts, DATE_TRUNC('day', install_ts) AS install_day
+  FROM users
+),
+returns AS (
+  SELECT
+    i.user_id,
+    i.install_ts,
+    MAX(CASE WHEN ud.day = i.install_day + INTERVAL 1 DAY THEN 1 ELSE 0 END) AS retained_d1,
+    MAX(CASE WHEN ud.day = i.install_day + INTERVAL 7 DAY THEN 1 ELSE 0 END) AS retained_d7
+  FROM installs i
+  JOIN fact_user_day ud
+    ON ud.user_id = i.user_id
+   AND ud.sessions > 0
+   AND (ud.day = i.install_day + INTERVAL 1 DAY OR ud.day = i.install_day + INTERVAL 7 DAY)
+  GROUP BY 1,2
+)
+SELECT
+  i.user_id,
+  i.install_ts,
+  i.install_day,
+  f.first_session_ts,
+  f.first_level_start_ts,
+  f.first_level_complete_ts,
+  COALESCE(r.retained_d1, 0) AS retained_d1,
+  COALESCE(r.retained_d7, 0) AS retained_d7
+FROM installs i
+LEFT JOIN firsts f USING (user_id)
+LEFT JOIN returns r USING (user_id, install_ts)
+ORDER BY 1;
+
+DROP TABLE _session_day;
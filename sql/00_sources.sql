@@ -0,0 +1,30 @@
+-- 00_sources.sql
+-- Shared source views for every report (01-04).
+-- run_sql.py runs this first and fills in the table placeholders with the
+-- reader matching what the generator wrote under data/:
+--   data/<table>.csv                -> read_csv_auto (default, single shard)
+--   data/<table>/part-*.csv         -> read_csv_auto over the shard parts
+--   data/<table>/**/*.parquet       -> read_parquet (typed, events/ads_events
+--                                      hive-partitioned by day, the partition
+--                                      key is not read back as a column)
+
+CREATE OR REPLACE VIEW users AS
+SELECT * FROM {users};
+
+CREATE OR REPLACE VIEW ab_assignments AS
+SELECT * FROM {ab_assignments};
+
+CREATE OR REPLACE VIEW events AS
+SELECT *
+FROM {events}
+WHERE event_ts >= TIMESTAMP '2025-10-01'
+  AND event_ts <  TIMESTAMP '2026-01-01';
+
+CREATE OR REPLACE VIEW purchases AS
+SELECT * FROM {purchases};
+
+CREATE OR REPLACE VIEW ads_events AS
+SELECT *
+FROM {ads_events}
+WHERE ad_ts >= TIMESTAMP '2025-10-01'
+  AND ad_ts <  TIMESTAMP '2026-01-01';
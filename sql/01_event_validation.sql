@@ -1,30 +1,8 @@
 
 -- Goal: validate data consistency, schema sanity, duplicates, timestamp ranges
 
--- DuckDB: create views from CSVs
-
-CREATE OR REPLACE VIEW users AS
-SELECT * FROM read_csv_auto('data/users.csv');
-
-CREATE OR REPLACE VIEW ab_assignments AS
-SELECT * FROM read_csv_auto('data/ab_assignments.csv');
-
-CREATE OR REPLACE VIEW events AS
-SELECT *
-FROM read_csv_auto('data/events.csv')
-WHERE event_ts >= TIMESTAMP '2025-10-01'
-  AND event_ts <  TIMESTAMP '2026-01-01';
-
-
-CREATE OR REPLACE VIEW purchases AS
-SELECT * FROM read_csv_auto('data/purchases.csv');
-
-CREATE OR REPLACE VIEW ads_events AS
-SELECT *
-FROM read_csv_auto('data/ads_events.csv')
-WHERE ad_ts >= TIMESTAMP '2025-10-01'
-  AND ad_ts <  TIMESTAMP '2026-01-01';
-
+-- Source views (users, events, ...) come from 00_sources.sql and the
+-- session facts from 00_facts.sql, both via run_sql.py
 
 -- 1) Row counts
 SELECT 'users' AS table_name, COUNT(*) AS n FROM users
@@ -81,17 +59,8 @@ LIMIT 50;
 
 -- 5) Session ordering sanity
 -- session_end should be after session_start
-WITH sess AS (
-  SELECT
-    user_id,
-    session_id,
-    MIN(CASE WHEN event_name='session_start' THEN event_ts END) AS session_start_ts,
-    MAX(CASE WHEN event_name='session_end' THEN event_ts END) AS session_end_ts
-  FROM events
-  GROUP BY 1,2
-)
-SELECT *
-FROM sess
+SELECT user_id, session_id, session_start_ts, session_end_ts
+FROM fact_sessions
 WHERE session_start_ts IS NOT NULL
   AND session_end_ts IS NOT NULL
   AND session_end_ts < session_start_ts
@@ -105,20 +74,11 @@ ORDER BY n DESC;
 
 -- 7) Missing critical events per session
 -- sessions that have start but no end
-WITH sess AS (
-  SELECT
-    user_id,
-    session_id,
-    MAX(CASE WHEN event_name='session_start' THEN 1 ELSE 0 END) AS has_start,
-    MAX(CASE WHEN event_name='session_end' THEN 1 ELSE 0 END) AS has_end
-  FROM events
-  GROUP BY 1,2
-)
 SELECT
   SUM(CASE WHEN has_start=1 AND has_end=0 THEN 1 ELSE 0 END) AS sessions_missing_end,
   SUM(CASE WHEN has_start=0 AND has_end=1 THEN 1 ELSE 0 END) AS sessions_missing_start,
   COUNT(*) AS total_sessions
-FROM sess;
+FROM fact_sessions;
 
 -- 8) Currency sanity checks
 -- currency_balance should not be negative (soft check)
@@ -145,18 +105,9 @@ UNION ALL SELECT 'ads_events', COUNT(*) FROM ads_events
 ;
 
 -- (FORCE OUTPUT) sessions missing start/end
-WITH sess AS (
-  SELECT
-    user_id,
-    session_id,
-    MAX(CASE WHEN event_name='session_start' THEN 1 ELSE 0 END) AS has_start,
-    MAX(CASE WHEN event_name='session_end' THEN 1 ELSE 0 END) AS has_end
-  FROM events
-  GROUP BY 1,2
-)
 SELECT
   SUM(CASE WHEN has_start=1 AND has_end=0 THEN 1 ELSE 0 END) AS sessions_missing_end,
   SUM(CASE WHEN has_start=0 AND has_end=1 THEN 1 ELSE 0 END) AS sessions_missing_start,
   COUNT(*) AS total_sessions
-FROM sess
+FROM fact_sessions
 ;
@@ -2,54 +2,29 @@
 -- Weekly game health KPIs (engagement + monetization + economy)
 -- DuckDB compatible
 
-CREATE OR REPLACE VIEW users AS
-SELECT * FROM read_csv_auto('data/users.csv');
-
-CREATE OR REPLACE VIEW events AS
-SELECT *
-FROM read_csv_auto('data/events.csv')
-WHERE event_ts >= TIMESTAMP '2025-10-01'
-  AND event_ts <= TIMESTAMP '2025-12-31 23:59:00';
-
-CREATE OR REPLACE VIEW purchases AS
-SELECT * FROM read_csv_auto('data/purchases.csv');
-
-CREATE OR REPLACE VIEW ads_events AS
-SELECT *
-FROM read_csv_auto('data/ads_events.csv')
-WHERE ad_ts >= TIMESTAMP '2025-10-01'
-  AND ad_ts <= TIMESTAMP '2025-12-31 23:59:00';
+-- Source views come from 00_sources.sql, activity and revenue are read from
+-- the fact_sessions / fact_user_day tables built by 00_facts.sql (run_sql.py)
 
 -- ---------------------------------------------------------
 -- DAILY ACTIVE USERS (DAU)
 -- ---------------------------------------------------------
 CREATE OR REPLACE TEMP VIEW dau AS
 SELECT
-  DATE_TRUNC('day', event_ts) AS day,
+  day,
   user_id
-FROM events
-WHERE event_name = 'session_start'
-GROUP BY 1,2;
+FROM fact_user_day
+WHERE sessions > 0;
 
 -- ---------------------------------------------------------
 -- SESSIONS + DURATION
 -- ---------------------------------------------------------
-CREATE OR REPLACE TEMP VIEW sessions AS
-SELECT
-  user_id,
-  session_id,
-  MIN(CASE WHEN event_name='session_start' THEN event_ts END) AS session_start_ts,
-  MAX(CASE WHEN event_name='session_end' THEN event_ts END) AS session_end_ts
-FROM events
-GROUP BY 1,2;
-
 CREATE OR REPLACE TEMP VIEW session_durations AS
 SELECT
   DATE_TRUNC('day', session_start_ts) AS day,
   user_id,
   session_id,
   DATE_DIFF('minute', session_start_ts, session_end_ts) AS duration_min
-FROM sessions
+FROM fact_sessions
 WHERE session_start_ts IS NOT NULL
   AND session_end_ts IS NOT NULL;
 
@@ -58,56 +33,48 @@ WHERE session_start_ts IS NOT NULL
 -- ---------------------------------------------------------
 CREATE OR REPLACE TEMP VIEW iap_daily AS
 SELECT
-  DATE_TRUNC('day', purchase_ts) AS day,
-  SUM(revenue_usd) AS iap_revenue_usd,
-  COUNT(*) AS iap_txn,
-  COUNT(DISTINCT user_id) AS payers
-FROM purchases
-GROUP BY 1;
+  day,
+  SUM(iap_revenue_usd) AS iap_revenue_usd,
+  SUM(iap_txn) AS iap_txn,
+  SUM(CASE WHEN iap_txn > 0 THEN 1 ELSE 0 END) AS payers
+FROM fact_user_day
+GROUP BY 1
+HAVING SUM(iap_txn) > 0;
 
 CREATE OR REPLACE TEMP VIEW ads_daily AS
 SELECT
-  DATE_TRUNC('day', ad_ts) AS day,
-  SUM(ad_revenue_usd) AS ads_revenue_usd,
-  COUNT(*) AS ad_impressions,
-  COUNT(DISTINCT user_id) AS ad_viewers
-FROM ads_events
-GROUP BY 1;
+  day,
+  SUM(ads_revenue_usd) AS ads_revenue_usd,
+  SUM(ad_impressions) AS ad_impressions,
+  SUM(CASE WHEN ad_impressions > 0 THEN 1 ELSE 0 END) AS ad_viewers
+FROM fact_user_day
+GROUP BY 1
+HAVING SUM(ad_impressions) > 0;
 
 -- ---------------------------------------------------------
 -- DAILY LEVEL STATS
 -- ---------------------------------------------------------
 CREATE OR REPLACE TEMP VIEW level_daily AS
 SELECT
-  DATE_TRUNC('day', event_ts) AS day,
-  SUM(CASE WHEN event_name='level_start' THEN 1 ELSE 0 END) AS level_starts,
-  SUM(CASE WHEN event_name='level_complete' THEN 1 ELSE 0 END) AS level_completes
-FROM events
+  day,
+  SUM(level_starts) AS level_starts,
+  SUM(level_completes) AS level_completes
+FROM fact_user_day
 GROUP BY 1;
 
 -- ---------------------------------------------------------
 -- RETENTION (D1 / D7) based on install cohorts
+-- (per-user D1/D7 flags come from fact_user_firsts)
 -- ---------------------------------------------------------
 CREATE OR REPLACE TEMP VIEW retention_daily AS
-WITH installs AS (
-  SELECT user_id, DATE_TRUNC('day', install_ts) AS install_day
-  FROM users
-),
-activity AS (
-  SELECT user_id, day
-  FROM dau
-)
 SELECT
-  i.install_day AS day,
-  COUNT(DISTINCT i.user_id) AS installs,
-  COUNT(DISTINCT CASE WHEN a.day = i.install_day + INTERVAL 1 DAY THEN i.user_id END) AS retained_d1,
-  COUNT(DISTINCT CASE WHEN a.day = i.install_day + INTERVAL 7 DAY THEN i.user_id END) AS retained_d7,
-  ROUND(1.0 * COUNT(DISTINCT CASE WHEN a.day = i.install_day + INTERVAL 1 DAY THEN i.user_id END) / NULLIF(COUNT(DISTINCT i.user_id),0), 4) AS d1_retention,
-  ROUND(1.0 * COUNT(DISTINCT CASE WHEN a.day = i.install_day + INTERVAL 7 DAY THEN i.user_id END) / NULLIF(COUNT(DISTINCT i.user_id),0), 4) AS d7_retention
-FROM installs i
-LEFT JOIN activity a
-  ON i.user_id = a.user_id
- AND (a.day = i.install_day + INTERVAL 1 DAY OR a.day = i.install_day + INTERVAL 7 DAY)
+  install_day AS day,
+  COUNT(DISTINCT user_id) AS installs,
+  COUNT(DISTINCT CASE WHEN retained_d1 = 1 THEN user_id END) AS retained_d1,
+  COUNT(DISTINCT CASE WHEN retained_d7 = 1 THEN user_id END) AS retained_d7,
+  ROUND(1.0 * COUNT(DISTINCT CASE WHEN retained_d1 = 1 THEN user_id END) / NULLIF(COUNT(DISTINCT user_id),0), 4) AS d1_retention,
+  ROUND(1.0 * COUNT(DISTINCT CASE WHEN retained_d7 = 1 THEN user_id END) / NULLIF(COUNT(DISTINCT user_id),0), 4) AS d7_retention
+FROM fact_user_firsts
 GROUP BY 1;
 
 -- ---------------------------------------------------------
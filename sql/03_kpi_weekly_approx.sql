@@ -0,0 +1,217 @@
+-- 03_kpi_weekly_approx.sql
+-- Approximate mode of the weekly KPIs in 03_kpi_weekly.sql, for large data.
+-- 03_kpi_weekly.sql stays the exact report for audits.
+-- python scripts/run_sql.py sql/03_kpi_weekly_approx.sql --db
+--
+-- Distinct users (actives, payers, ad viewers) are kept as one HyperLogLog
+-- sketch per metric per day in hll_daily: 4096 registers (p = 12) holding
+-- the max rank of the user hashes that fall into them. Sketches merge by
+-- register-wise MAX, so weekly and monthly uniques are read from the daily
+-- sketches instead of rescanning the facts. Relative standard error is
+-- 1.04 / sqrt(4096) = 1.6%, the report shows the 95% bound.
+-- With --db hll_daily is refreshed from its high-water mark like
+-- 03_kpi_weekly_incremental.sql (without it every run is a full refresh).
+--
+-- Counts that need no DISTINCT stay exact: sessions (one fact_sessions row
+-- per session, counted on its start day) and retention (one
+-- fact_user_firsts row per user).
+
+-- ---------------------------------------------------------
+-- HYPERLOGLOG HELPERS (p = 12, 64-bit hash)
+-- ---------------------------------------------------------
+CREATE OR REPLACE TEMP MACRO hll_reg(h) AS CAST(h & 4095 AS USMALLINT);
+
+-- rank = 1 + leading zeros of the remaining 52 bits
+CREATE OR REPLACE TEMP MACRO hll_rho(h) AS
+  CAST(CASE WHEN h >> 12 = 0 THEN 53 ELSE 52 - CAST(FLOOR(LOG2(h >> 12)) AS INTEGER) END AS UTINYINT);
+
+-- estimate from SUM(2^-rho) (as POW(0.5, rho), -rho would wrap around in UTINYINT)
+-- and the number of non-empty registers,
+-- with linear counting while many registers are still empty
+CREATE OR REPLACE TEMP MACRO hll_estimate(z, filled) AS
+  CASE
+    WHEN filled < 4096
+     AND (0.7213 / (1 + 1.079 / 4096)) * 4096 * 4096 / (z + 4096 - filled) <= 2.5 * 4096
+      THEN 4096 * LN(4096.0 / (4096 - filled))
+    ELSE (0.7213 / (1 + 1.079 / 4096)) * 4096 * 4096 / (z + 4096 - filled)
+  END;
+
+CREATE OR REPLACE TEMP MACRO hll_error_95_pct() AS ROUND(100 * 1.96 * 1.04 / SQRT(4096), 2);
+
+-- ---------------------------------------------------------
+-- STATE + DAILY SKETCHES
+-- ---------------------------------------------------------
+CREATE TABLE IF NOT EXISTS kpi_state (
+  name VARCHAR PRIMARY KEY,
+  hwm TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS hll_daily (
+  metric VARCHAR,
+  day TIMESTAMP,
+  reg USMALLINT,
+  rho UTINYINT
+);
+
+CREATE OR REPLACE TEMP TABLE _hll_refresh AS
+SELECT COALESCE(MAX(hwm), TIMESTAMP '1970-01-01') AS from_day
+FROM kpi_state
+WHERE name = 'hll_daily';
+
+DELETE FROM hll_daily WHERE day >= (SELECT from_day FROM _hll_refresh);
+
+INSERT INTO hll_daily
+SELECT metric, day, hll_reg(h) AS reg, MAX(hll_rho(h)) AS rho
+FROM (
+  SELECT
+    day,
+    hash(user_id) AS h,
+    sessions > 0 AS active,
+    iap_txn > 0 AS payer,
+    ad_impressions > 0 AS ad_viewer
+  FROM fact_user_day
+  WHERE day >= (SELECT from_day FROM _hll_refresh)
+)
+UNPIVOT (flag FOR metric IN (active, payer, ad_viewer))
+WHERE flag
+GROUP BY metric, day, reg;
+
+INSERT OR REPLACE INTO kpi_state
+SELECT 'hll_daily', MAX(day) FROM hll_daily;
+
+DROP TABLE _hll_refresh;
+
+-- ---------------------------------------------------------
+-- MERGED SKETCHES -> UNIQUES (per day, week and month)
+-- ---------------------------------------------------------
+CREATE OR REPLACE TEMP VIEW hll_uniques AS
+WITH merged AS (
+  SELECT 'day' AS grain, metric, day AS period, reg, MAX(rho) AS rho
+  FROM hll_daily
+  GROUP BY ALL
+  UNION ALL
+  SELECT 'week', metric, DATE_TRUNC('week', day), reg, MAX(rho)
+  FROM hll_daily
+  GROUP BY ALL
+  UNION ALL
+  SELECT 'month', metric, DATE_TRUNC('month', day), reg, MAX(rho)
+  FROM hll_daily
+  GROUP BY ALL
+)
+SELECT
+  grain,
+  period,
+  metric,
+  CAST(ROUND(hll_estimate(SUM(POW(0.5, rho)), COUNT(*))) AS BIGINT) AS uniques
+FROM merged
+GROUP BY 1, 2, 3;
+
+CREATE OR REPLACE TEMP VIEW hll_periods AS
+SELECT
+  grain,
+  period,
+  MAX(uniques) FILTER (WHERE metric = 'active') AS active_users,
+  MAX(uniques) FILTER (WHERE metric = 'payer') AS payers,
+  MAX(uniques) FILTER (WHERE metric = 'ad_viewer') AS ad_viewers
+FROM hll_uniques
+GROUP BY 1, 2;
+
+-- ---------------------------------------------------------
+-- WEEKLY AGGREGATION
+-- ---------------------------------------------------------
+WITH week_sessions AS (
+  SELECT
+    DATE_TRUNC('week', session_start_ts) AS week,
+    COUNT(*) AS sessions,
+    AVG(DATE_DIFF('minute', session_start_ts, session_end_ts)) AS avg_session_duration_min,
+    SUM(CASE WHEN DATE_DIFF('minute', session_start_ts, session_end_ts) NOT BETWEEN 0 AND 240 THEN 1 ELSE 0 END)
+      AS suspicious_durations
+  FROM fact_sessions
+  WHERE session_start_ts IS NOT NULL
+    AND session_end_ts IS NOT NULL
+  GROUP BY 1
+),
+week_facts AS (
+  SELECT
+    DATE_TRUNC('week', day) AS week,
+    SUM(iap_revenue_usd) AS iap_revenue_usd,
+    SUM(ads_revenue_usd) AS ads_revenue_usd,
+    SUM(iap_txn) AS iap_txn,
+    SUM(ad_impressions) AS ad_impressions,
+    SUM(level_starts) AS level_starts,
+    SUM(level_completes) AS level_completes
+  FROM fact_user_day
+  GROUP BY 1
+),
+week_retention AS (
+  SELECT
+    DATE_TRUNC('week', install_day) AS week,
+    AVG(d1_retention) AS avg_d1_retention,
+    AVG(d7_retention) AS avg_d7_retention
+  FROM (
+    SELECT
+      install_day,
+      ROUND(1.0 * SUM(retained_d1) / COUNT(*), 4) AS d1_retention,
+      ROUND(1.0 * SUM(retained_d7) / COUNT(*), 4) AS d7_retention
+    FROM fact_user_firsts
+    GROUP BY 1
+  )
+  GROUP BY 1
+)
+SELECT
+  'WEEKLY_APPROX' AS section,
+  p.period AS week,
+  p.active_users AS weekly_active_users,
+  p.payers AS weekly_payers,
+  p.ad_viewers AS weekly_ad_viewers,
+  s.sessions,
+  ROUND(1.0 * s.sessions / NULLIF(p.active_users,0), 3) AS sessions_per_user,
+  ROUND(s.avg_session_duration_min, 2) AS avg_session_duration_min,
+  s.suspicious_durations,
+
+  f.iap_revenue_usd,
+  f.ads_revenue_usd,
+  (f.iap_revenue_usd + f.ads_revenue_usd) AS total_revenue_usd,
+  ROUND(1.0 * (f.iap_revenue_usd + f.ads_revenue_usd) / NULLIF(p.active_users,0), 4) AS approx_arpwau,
+
+  f.level_starts,
+  f.level_completes,
+  ROUND(1.0 * f.level_completes / NULLIF(f.level_starts,0), 4) AS level_completion_rate,
+
+  w.avg_d1_retention,
+  w.avg_d7_retention,
+
+  f.ad_impressions,
+  f.iap_txn,
+  hll_error_95_pct() AS uniques_error_95_pct
+FROM hll_periods p
+LEFT JOIN week_sessions s ON p.period = s.week
+LEFT JOIN week_facts f ON p.period = f.week
+LEFT JOIN week_retention w ON p.period = w.week
+WHERE p.grain = 'week'
+  AND p.active_users IS NOT NULL
+ORDER BY p.period;
+
+-- ---------------------------------------------------------
+-- MONTHLY UNIQUES + STICKINESS (from the same daily sketches)
+-- ---------------------------------------------------------
+SELECT
+  'MONTHLY_APPROX' AS section,
+  m.period AS month,
+  m.active_users AS monthly_active_users,
+  m.payers AS monthly_payers,
+  m.ad_viewers AS monthly_ad_viewers,
+  ROUND(d.avg_dau, 1) AS avg_dau,
+  ROUND(d.avg_dau / NULLIF(m.active_users,0), 4) AS dau_mau,
+  ROUND(1.0 * m.payers / NULLIF(m.active_users,0), 4) AS payer_share,
+  hll_error_95_pct() AS uniques_error_95_pct
+FROM hll_periods m
+LEFT JOIN (
+  SELECT DATE_TRUNC('month', period) AS month, AVG(active_users) AS avg_dau
+  FROM hll_periods
+  WHERE grain = 'day'
+  GROUP BY 1
+) d ON m.period = d.month
+WHERE m.grain = 'month'
+  AND m.active_users IS NOT NULL
+ORDER BY m.period;
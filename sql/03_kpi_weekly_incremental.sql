@@ -0,0 +1,289 @@
+-- 03_kpi_weekly_incremental.sql
+-- Incremental refresh of the weekly KPIs in 03_kpi_weekly.sql
+-- Meant for the persistent warehouse: python scripts/run_sql.py sql/03_kpi_weekly_incremental.sql --db
+-- (without --db the kpi_* tables live in memory and every run is a full refresh)
+--
+-- Only the daily rollups below are incremental. The fact tables they read
+-- (00_facts.sql) are still rebuilt from the full history whenever
+-- run_sql.py reloads users, events, purchases or ads_events, so that scan
+-- is paid once per data load, not once per report run.
+--
+-- Daily aggregates are kept in kpi_* tables. Each run recomputes the days from
+-- 7 days before the stored high-water mark (the last day seen) on, so rows
+-- that arrive late for recent days are picked up (the generator backdates
+-- duplicate purchases by up to 4 days), plus the install cohorts of the 7
+-- days before that, whose D7 day falls in the recomputed range. Rows older
+-- than the window need a full refresh (drop the kpi_* tables). The weekly
+-- rollup reads only the daily tables.
+
+-- ---------------------------------------------------------
+-- STATE + DAILY TABLES
+-- ---------------------------------------------------------
+CREATE TABLE IF NOT EXISTS kpi_state (
+  name VARCHAR PRIMARY KEY,
+  hwm TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS kpi_dau (
+  day TIMESTAMP,
+  user_id BIGINT
+);
+
+CREATE TABLE IF NOT EXISTS kpi_session_daily (
+  day TIMESTAMP,
+  sessions BIGINT,
+  duration_min_sum BIGINT,
+  duration_min_n BIGINT,
+  suspicious_durations BIGINT
+);
+
+CREATE TABLE IF NOT EXISTS kpi_iap_daily (
+  day TIMESTAMP,
+  iap_revenue_usd DOUBLE,
+  iap_txn BIGINT,
+  payers BIGINT
+);
+
+CREATE TABLE IF NOT EXISTS kpi_ads_daily (
+  day TIMESTAMP,
+  ads_revenue_usd DOUBLE,
+  ad_impressions BIGINT,
+  ad_viewers BIGINT
+);
+
+CREATE TABLE IF NOT EXISTS kpi_level_daily (
+  day TIMESTAMP,
+  level_starts BIGINT,
+  level_completes BIGINT
+);
+
+CREATE TABLE IF NOT EXISTS kpi_retention_daily (
+  day TIMESTAMP,
+  installs BIGINT,
+  retained_d1 BIGINT,
+  retained_d7 BIGINT,
+  d1_retention DOUBLE,
+  d7_retention DOUBLE
+);
+
+-- ---------------------------------------------------------
+-- REFRESH WINDOW
+-- ---------------------------------------------------------
+CREATE OR REPLACE TEMP TABLE _kpi_refresh AS
+SELECT
+  COALESCE(MAX(hwm), TIMESTAMP '1970-01-01') - INTERVAL 7 DAY AS from_day,
+  COALESCE(MAX(hwm), TIMESTAMP '1970-01-01') - INTERVAL 14 DAY AS cohort_from_day
+FROM kpi_state
+WHERE name = 'kpi_daily';
+
+-- ---------------------------------------------------------
+-- DAU SET
+-- ---------------------------------------------------------
+DELETE FROM kpi_dau WHERE day >= (SELECT from_day FROM _kpi_refresh);
+
+INSERT INTO kpi_dau
+SELECT day, user_id
+FROM fact_user_day
+WHERE sessions > 0
+  AND day >= (SELECT from_day FROM _kpi_refresh);
+
+-- ---------------------------------------------------------
+-- SESSIONS + DURATION
+-- ---------------------------------------------------------
+DELETE FROM kpi_session_daily WHERE day >= (SELECT from_day FROM _kpi_refresh);
+
+INSERT INTO kpi_session_daily
+SELECT
+  day,
+  COUNT(DISTINCT session_id) AS sessions,
+  SUM(duration_min) AS duration_min_sum,
+  COUNT(duration_min) AS duration_min_n,
+  SUM(CASE WHEN duration_min < 0 OR duration_min > 240 THEN 1 ELSE 0 END) AS suspicious_durations
+FROM (
+  SELECT
+    DATE_TRUNC('day', session_start_ts) AS day,
+    session_id,
+    DATE_DIFF('minute', session_start_ts, session_end_ts) AS duration_min
+  FROM fact_sessions
+  WHERE session_start_ts IS NOT NULL
+    AND session_end_ts IS NOT NULL
+)
+WHERE day >= (SELECT from_day FROM _kpi_refresh)
+GROUP BY 1;
+
+-- ---------------------------------------------------------
+-- DAILY REVENUE (IAP + ADS) + LEVEL STATS
+-- ---------------------------------------------------------
+DELETE FROM kpi_iap_daily WHERE day >= (SELECT from_day FROM _kpi_refresh);
+
+INSERT INTO kpi_iap_daily
+SELECT
+  day,
+  SUM(iap_revenue_usd) AS iap_revenue_usd,
+  SUM(iap_txn) AS iap_txn,
+  SUM(CASE WHEN iap_txn > 0 THEN 1 ELSE 0 END) AS payers
+FROM fact_user_day
+WHERE day >= (SELECT from_day FROM _kpi_refresh)
+GROUP BY 1
+HAVING SUM(iap_txn) > 0;
+
+DELETE FROM kpi_ads_daily WHERE day >= (SELECT from_day FROM _kpi_refresh);
+
+INSERT INTO kpi_ads_daily
+SELECT
+  day,
+  SUM(ads_revenue_usd) AS ads_revenue_usd,
+  SUM(ad_impressions) AS ad_impressions,
+  SUM(CASE WHEN ad_impressions > 0 THEN 1 ELSE 0 END) AS ad_viewers
+FROM fact_user_day
+WHERE day >= (SELECT from_day FROM _kpi_refresh)
+GROUP BY 1
+HAVING SUM(ad_impressions) > 0;
+
+DELETE FROM kpi_level_daily WHERE day >= (SELECT from_day FROM _kpi_refresh);
+
+INSERT INTO kpi_level_daily
+SELECT
+  day,
+  SUM(level_starts) AS level_starts,
+  SUM(level_completes) AS level_completes
+FROM fact_user_day
+WHERE day >= (SELECT from_day FROM _kpi_refresh)
+GROUP BY 1;
+
+-- ---------------------------------------------------------
+-- RETENTION (D1 / D7): recompute still-maturing cohorts only
+-- ---------------------------------------------------------
+DELETE FROM kpi_retention_daily WHERE day >= (SELECT cohort_from_day FROM _kpi_refresh);
+
+INSERT INTO kpi_retention_daily
+WITH installs AS (
+  SELECT user_id, DATE_TRUNC('day', install_ts) AS install_day
+  FROM users
+  WHERE DATE_TRUNC('day', install_ts) >= (SELECT cohort_from_day FROM _kpi_refresh)
+),
+activity AS (
+  SELECT user_id, day
+  FROM kpi_dau
+  WHERE day >= (SELECT cohort_from_day FROM _kpi_refresh)
+)
+SELECT
+  i.install_day AS day,
+  COUNT(DISTINCT i.user_id) AS installs,
+  COUNT(DISTINCT CASE WHEN a.day = i.install_day + INTERVAL 1 DAY THEN i.user_id END) AS retained_d1,
+  COUNT(DISTINCT CASE WHEN a.day = i.install_day + INTERVAL 7 DAY THEN i.user_id END) AS retained_d7,
+  ROUND(1.0 * COUNT(DISTINCT CASE WHEN a.day = i.install_day + INTERVAL 1 DAY THEN i.user_id END) / NULLIF(COUNT(DISTINCT i.user_id),0), 4) AS d1_retention,
+  ROUND(1.0 * COUNT(DISTINCT CASE WHEN a.day = i.install_day + INTERVAL 7 DAY THEN i.user_id END) / NULLIF(COUNT(DISTINCT i.user_id),0), 4) AS d7_retention
+FROM installs i
+LEFT JOIN activity a
+  ON i.user_id = a.user_id
+ AND (a.day = i.install_day + INTERVAL 1 DAY OR a.day = i.install_day + INTERVAL 7 DAY)
+GROUP BY 1;
+
+-- ---------------------------------------------------------
+-- ADVANCE HIGH-WATER MARK
+-- ---------------------------------------------------------
+INSERT OR REPLACE INTO kpi_state
+SELECT 'kpi_daily', MAX(day) FROM kpi_dau;
+
+SELECT
+  'KPI_REFRESH' AS section,
+  r.from_day AS refreshed_from_day,
+  r.cohort_from_day AS cohorts_from_day,
+  s.hwm AS new_hwm
+FROM _kpi_refresh r, kpi_state s
+WHERE s.name = 'kpi_daily';
+
+DROP TABLE _kpi_refresh;
+
+-- ---------------------------------------------------------
+-- WEEKLY AGGREGATION (from the daily tables only)
+-- ---------------------------------------------------------
+WITH week_dau AS (
+  -- For each week: unique actives in that week (WAU)
+  SELECT
+    DATE_TRUNC('week', day) AS week,
+    COUNT(DISTINCT user_id) AS weekly_active_users
+  FROM kpi_dau
+  GROUP BY 1
+),
+week_sessions AS (
+  -- a session is counted on its start day only, so daily counts add up
+  SELECT
+    DATE_TRUNC('week', day) AS week,
+    CAST(SUM(sessions) AS BIGINT) AS sessions,
+    1.0 * SUM(duration_min_sum) / NULLIF(SUM(duration_min_n),0) AS avg_session_duration_min,
+    SUM(suspicious_durations) AS suspicious_durations
+  FROM kpi_session_daily
+  GROUP BY 1
+),
+week_revenue AS (
+  SELECT
+    DATE_TRUNC('week', day) AS week,
+    SUM(iap_revenue_usd) AS iap_revenue_usd,
+    SUM(ads_revenue_usd) AS ads_revenue_usd,
+    SUM(iap_txn) AS iap_txn,
+    SUM(ad_impressions) AS ad_impressions,
+    SUM(payers) AS payers_daily_sum,
+    SUM(ad_viewers) AS ad_viewers_daily_sum
+  FROM (
+    SELECT
+      COALESCE(i.day, a.day) AS day,
+      COALESCE(i.iap_revenue_usd, 0) AS iap_revenue_usd,
+      COALESCE(a.ads_revenue_usd, 0) AS ads_revenue_usd,
+      COALESCE(i.iap_txn, 0) AS iap_txn,
+      COALESCE(a.ad_impressions, 0) AS ad_impressions,
+      COALESCE(i.payers, 0) AS payers,
+      COALESCE(a.ad_viewers, 0) AS ad_viewers
+    FROM kpi_iap_daily i
+    FULL OUTER JOIN kpi_ads_daily a
+      ON i.day = a.day
+  )
+  GROUP BY 1
+),
+week_levels AS (
+  SELECT
+    DATE_TRUNC('week', day) AS week,
+    SUM(level_starts) AS level_starts,
+    SUM(level_completes) AS level_completes,
+    ROUND(1.0 * SUM(level_completes) / NULLIF(SUM(level_starts),0), 4) AS level_completion_rate
+  FROM kpi_level_daily
+  GROUP BY 1
+),
+week_retention AS (
+  SELECT
+    DATE_TRUNC('week', day) AS week,
+    AVG(d1_retention) AS avg_d1_retention,
+    AVG(d7_retention) AS avg_d7_retention
+  FROM kpi_retention_daily
+  GROUP BY 1
+)
+SELECT
+  d.week,
+  d.weekly_active_users,
+  s.sessions,
+  ROUND(1.0 * s.sessions / NULLIF(d.weekly_active_users,0), 3) AS sessions_per_user,
+  ROUND(s.avg_session_duration_min, 2) AS avg_session_duration_min,
+  s.suspicious_durations,
+
+  r.iap_revenue_usd,
+  r.ads_revenue_usd,
+  (r.iap_revenue_usd + r.ads_revenue_usd) AS total_revenue_usd,
+
+  ROUND(1.0 * (r.iap_revenue_usd + r.ads_revenue_usd) / NULLIF(d.weekly_active_users,0), 4) AS approx_arpwau,
+
+  l.level_starts,
+  l.level_completes,
+  l.level_completion_rate,
+
+  w.avg_d1_retention,
+  w.avg_d7_retention,
+
+  r.ad_impressions,
+  r.iap_txn
+FROM week_dau d
+LEFT JOIN week_sessions s ON d.week = s.week
+LEFT JOIN week_revenue r ON d.week = r.week
+LEFT JOIN week_levels l ON d.week = l.week
+LEFT JOIN week_retention w ON d.week = w.week
+ORDER BY d.week;
@@ -6,26 +6,8 @@
 --  - VARIANT_METRICS: control + variant rows
 --  - LIFT_VS_CONTROL: % lift of variant vs control (for key KPIs)
 
-CREATE OR REPLACE VIEW ab AS
-SELECT * FROM read_csv_auto('data/ab_assignments.csv');
-
-CREATE OR REPLACE VIEW users AS
-SELECT * FROM read_csv_auto('data/users.csv');
-
-CREATE OR REPLACE VIEW events AS
-SELECT *
-FROM read_csv_auto('data/events.csv')
-WHERE event_ts >= TIMESTAMP '2025-10-01'
-  AND event_ts <= TIMESTAMP '2025-12-31 23:59:00';
-
-CREATE OR REPLACE VIEW purchases AS
-SELECT * FROM read_csv_auto('data/purchases.csv');
-
-CREATE OR REPLACE VIEW ads_events AS
-SELECT *
-FROM read_csv_auto('data/ads_events.csv')
-WHERE ad_ts >= TIMESTAMP '2025-10-01'
-  AND ad_ts <= TIMESTAMP '2025-12-31 23:59:00';
+-- Source views come from 00_sources.sql, sessions, levels and revenue are read
+-- from the fact_sessions / fact_user_day tables built by 00_facts.sql
 
 WITH
 params AS (
@@ -44,7 +26,7 @@ ab_pop AS (
     a.experiment_name,
     a.variant,
     a.assign_ts
-  FROM ab a, params p
+  FROM ab_assignments a, params p
   WHERE a.experiment_name = p.exp_name
     AND a.assign_ts BETWEEN p.test_start AND p.test_end
 ),
@@ -52,26 +34,16 @@ ab_pop AS (
 -- ----------------------------
 -- Sessions + duration (test window)
 -- ----------------------------
-sess AS (
-  SELECT
-    e.user_id,
-    e.session_id,
-    MIN(CASE WHEN e.event_name='session_start' THEN e.event_ts END) AS start_ts,
-    MAX(CASE WHEN e.event_name='session_end' THEN e.event_ts END) AS end_ts
-  FROM events e
-  GROUP BY 1,2
-),
-
 sess_test AS (
   SELECT
     s.user_id,
     s.session_id,
-    s.start_ts,
-    s.end_ts,
-    DATE_DIFF('minute', s.start_ts, s.end_ts) AS duration_min
-  FROM sess s, params p
-  WHERE s.start_ts BETWEEN p.test_start AND p.test_end
-    AND s.start_ts IS NOT NULL AND s.end_ts IS NOT NULL
+    s.session_start_ts AS start_ts,
+    s.session_end_ts AS end_ts,
+    DATE_DIFF('minute', s.session_start_ts, s.session_end_ts) AS duration_min
+  FROM fact_sessions s, params p
+  WHERE s.session_start_ts BETWEEN p.test_start AND p.test_end
+    AND s.session_start_ts IS NOT NULL AND s.session_end_ts IS NOT NULL
 ),
 
 sess_agg AS (
@@ -84,66 +56,37 @@ sess_agg AS (
 ),
 
 -- ----------------------------
--- Level starts & completes (test window)
+-- Level starts & completes + revenue per user (test window)
+-- The window is whole days, so user-day facts give the same totals
 -- ----------------------------
-levels AS (
+user_days AS (
   SELECT
-    e.user_id,
-    SUM(CASE WHEN e.event_name='level_start' THEN 1 ELSE 0 END) AS level_starts,
-    SUM(CASE WHEN e.event_name='level_complete' THEN 1 ELSE 0 END) AS level_completes
-  FROM events e, params p
-  WHERE e.event_ts BETWEEN p.test_start AND p.test_end
-  GROUP BY 1
-),
-
--- ----------------------------
--- Revenue per user (test window)
--- ----------------------------
-iap_user AS (
-  SELECT
-    p.user_id,
-    SUM(p.revenue_usd) AS iap_revenue
-  FROM purchases p, params par
-  WHERE p.purchase_ts BETWEEN par.test_start AND par.test_end
-  GROUP BY 1
-),
-
-ads_user AS (
-  SELECT
-    a.user_id,
-    SUM(a.ad_revenue_usd) AS ads_revenue,
-    COUNT(*) AS ad_impressions
-  FROM ads_events a, params par
-  WHERE a.ad_ts BETWEEN par.test_start AND par.test_end
+    ud.user_id,
+    SUM(ud.level_starts) AS level_starts,
+    SUM(ud.level_completes) AS level_completes,
+    SUM(ud.iap_revenue_usd) AS iap_revenue,
+    SUM(ud.ads_revenue_usd) AS ads_revenue,
+    SUM(ud.ad_impressions) AS ad_impressions
+  FROM fact_user_day ud, params p
+  WHERE ud.day BETWEEN p.test_start AND p.test_end
   GROUP BY 1
 ),
 
 -- ----------------------------
 -- D1 retention guardrail (based on assign day)
 -- D1 = has session_start on day(assign_ts)+1
+-- one equi-join on (user_id, day), fact_user_day has one row per user-day
 -- ----------------------------
-dau AS (
-  SELECT
-    DATE_TRUNC('day', event_ts) AS day,
-    user_id
-  FROM events
-  WHERE event_name='session_start'
-  GROUP BY 1,2
-),
-
 d1 AS (
   SELECT
     ap.user_id,
     ap.variant,
-    CASE
-      WHEN EXISTS (
-        SELECT 1
-        FROM dau d
-        WHERE d.user_id = ap.user_id
-          AND d.day = DATE_TRUNC('day', ap.assign_ts) + INTERVAL 1 DAY
-      ) THEN 1 ELSE 0
-    END AS retained_d1
+    CASE WHEN ud.user_id IS NOT NULL THEN 1 ELSE 0 END AS retained_d1
   FROM ab_pop ap
+  LEFT JOIN fact_user_day ud
+    ON ud.user_id = ap.user_id
+   AND ud.day = DATE_TRUNC('day', ap.assign_ts) + INTERVAL 1 DAY
+   AND ud.sessions > 0
 ),
 
 -- ----------------------------
@@ -157,19 +100,17 @@ user_metrics AS (
     COALESCE(sa.sessions, 0) AS sessions,
     sa.avg_session_duration_min AS avg_session_duration_min,
 
-    COALESCE(l.level_starts, 0) AS level_starts,
-    COALESCE(l.level_completes, 0) AS level_completes,
+    COALESCE(ud.level_starts, 0) AS level_starts,
+    COALESCE(ud.level_completes, 0) AS level_completes,
 
-    COALESCE(i.iap_revenue, 0) AS iap_revenue,
-    COALESCE(ad.ads_revenue, 0) AS ads_revenue,
-    COALESCE(ad.ad_impressions, 0) AS ad_impressions,
+    COALESCE(ud.iap_revenue, 0) AS iap_revenue,
+    COALESCE(ud.ads_revenue, 0) AS ads_revenue,
+    COALESCE(ud.ad_impressions, 0) AS ad_impressions,
 
     COALESCE(d1.retained_d1, 0) AS retained_d1
   FROM ab_pop ap
   LEFT JOIN sess_agg sa ON ap.user_id = sa.user_id
-  LEFT JOIN levels l ON ap.user_id = l.user_id
-  LEFT JOIN iap_user i ON ap.user_id = i.user_id
-  LEFT JOIN ads_user ad ON ap.user_id = ad.user_id
+  LEFT JOIN user_days ud ON ap.user_id = ud.user_id
   LEFT JOIN d1 d1 ON ap.user_id = d1.user_id
 ),
 
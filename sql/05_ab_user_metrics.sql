@@ -0,0 +1,100 @@
+-- 05_ab_user_metrics.sql
+-- User-level A/B metrics for EVERY experiment in ab_assignments
+-- (one row per experiment x assigned user), read once by
+-- scripts/ab_evaluation.py for the bootstrap lifts.
+-- Test window per experiment: from the day of its first assignment to the end
+-- of the day of its last one (for reward_20pct_uplift this is the
+-- 2025-11-10 to 2025-12-08 window of 04_ab_test_evaluation.sql).
+-- Metric definitions match user_metrics in 04_ab_test_evaluation.sql.
+-- DuckDB compatible
+
+WITH
+windows AS (
+  SELECT
+    experiment_name,
+    DATE_TRUNC('day', MIN(assign_ts)) AS test_start,
+    DATE_TRUNC('day', MAX(assign_ts)) + INTERVAL 1 DAY - INTERVAL 1 SECOND AS test_end
+  FROM ab_assignments
+  GROUP BY 1
+),
+
+ab_pop AS (
+  SELECT
+    a.experiment_name,
+    a.variant,
+    a.user_id,
+    a.assign_ts,
+    w.test_start,
+    w.test_end
+  FROM ab_assignments a
+  JOIN windows w USING (experiment_name)
+),
+
+-- ----------------------------
+-- Sessions + duration (test window)
+-- ----------------------------
+sess_agg AS (
+  SELECT
+    ap.experiment_name,
+    ap.user_id,
+    COUNT(*) AS sessions,
+    AVG(DATE_DIFF('minute', s.session_start_ts, s.session_end_ts)) AS avg_session_duration_min
+  FROM ab_pop ap
+  JOIN fact_sessions s
+    ON s.user_id = ap.user_id
+   AND s.session_start_ts BETWEEN ap.test_start AND ap.test_end
+  WHERE s.session_end_ts IS NOT NULL
+  GROUP BY 1,2
+),
+
+-- ----------------------------
+-- Levels + revenue (test window, whole days)
+-- ----------------------------
+user_days AS (
+  SELECT
+    ap.experiment_name,
+    ap.user_id,
+    SUM(ud.level_starts) AS level_starts,
+    SUM(ud.level_completes) AS level_completes,
+    SUM(ud.iap_revenue_usd) AS iap_revenue,
+    SUM(ud.ads_revenue_usd) AS ads_revenue,
+    SUM(ud.ad_impressions) AS ad_impressions
+  FROM ab_pop ap
+  JOIN fact_user_day ud
+    ON ud.user_id = ap.user_id
+   AND ud.day BETWEEN ap.test_start AND ap.test_end
+  GROUP BY 1,2
+),
+
+-- ----------------------------
+-- D1 = active on day(assign_ts)+1
+-- ----------------------------
+d1 AS (
+  SELECT
+    ap.experiment_name,
+    ap.user_id,
+    1 AS retained_d1
+  FROM ab_pop ap
+  JOIN fact_user_day ud
+    ON ud.user_id = ap.user_id
+   AND ud.day = DATE_TRUNC('day', ap.assign_ts) + INTERVAL 1 DAY
+   AND ud.sessions > 0
+)
+
+SELECT
+  ap.experiment_name,
+  ap.variant,
+  ap.user_id,
+  COALESCE(sa.sessions, 0) AS sessions,
+  sa.avg_session_duration_min,
+  COALESCE(ud.level_starts, 0) AS level_starts,
+  COALESCE(ud.level_completes, 0) AS level_completes,
+  COALESCE(ud.iap_revenue, 0) AS iap_revenue,
+  COALESCE(ud.ads_revenue, 0) AS ads_revenue,
+  COALESCE(ud.ad_impressions, 0) AS ad_impressions,
+  COALESCE(d1.retained_d1, 0) AS retained_d1
+FROM ab_pop ap
+LEFT JOIN sess_agg sa USING (experiment_name, user_id)
+LEFT JOIN user_days ud USING (experiment_name, user_id)
+LEFT JOIN d1 USING (experiment_name, user_id)
+ORDER BY ap.experiment_name, ap.variant, ap.user_id;
@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from generate_synthetic_data import SEED, generate_shard  # noqa: E402
+from run_sql import is_select, split_sql  # noqa: E402
+
+# small enough for a few seconds per module, large enough for every table to have rows
+TEST_USERS = 3000
+
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory) -> Path:
+    """One flat CSV dataset of TEST_USERS users, shared by the whole run."""
+    out_dir = tmp_path_factory.mktemp("data")
+    generate_shard(0, 1, np.random.SeedSequence(SEED).spawn(1)[0], TEST_USERS, out_dir)
+    return out_dir
+
+
+def run_script(con, path):
+    """Run every statement of `path`; returns the SELECT results in order."""
+    results = []
+    for stmt in split_sql(path.read_text(encoding="utf-8")):
+        if is_select(stmt):
+            results.append(con.execute(stmt).fetchdf())
+        else:
+            con.execute(stmt)
+    return results
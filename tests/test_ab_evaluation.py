@@ -0,0 +1,92 @@
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ab_evaluation
+from ab_evaluation import bootstrap_sums, evaluate, group_matrix, load_user_metrics
+from run_sql import SQL_DIR, connect, split_sql
+from tests.conftest import SCRIPTS_DIR
+
+# evaluate() metric <- (VARIANT_METRICS column of 04_ab_test_evaluation.sql, decimals it is rounded to)
+SQL_METRICS = {
+    "sessions_per_user": ("avg_sessions_per_user", None),
+    "avg_session_duration_min": ("avg_session_duration_min", None),
+    "level_completion_rate": ("level_completion_rate", 4),
+    "arpu": ("arpu", 4),
+    "ads_impressions_per_user": ("ads_impressions_per_user", 2),
+    "d1_retention": ("d1_retention", 4),
+}
+
+
+@pytest.fixture(scope="module")
+def reports(data_dir):
+    con = connect(data_dir)
+    (sql,) = split_sql((SQL_DIR / "04_ab_test_evaluation.sql").read_text(encoding="utf-8"))
+    return load_user_metrics(con), con.execute(sql).fetchdf().set_index(["section", "variant"])
+
+
+def test_point_values_match_sql(reports):
+    um, sql = reports
+    results = evaluate(um, resamples=200).set_index("metric")
+    for metric, (column, decimals) in SQL_METRICS.items():
+        tol = 1e-9 if decimals is None else 0.5 * 10.0 ** -decimals + 1e-9
+        assert results.at[metric, "control_value"] == pytest.approx(sql.at[("VARIANT_METRICS", "control"), column], abs=tol)
+        assert results.at[metric, "variant_value"] == pytest.approx(sql.at[("VARIANT_METRICS", "variant"), column], abs=tol)
+    # lifts of the unrounded columns are rounded to 2 decimals by the SQL
+    for metric in ("sessions_per_user", "avg_session_duration_min"):
+        column = SQL_METRICS[metric][0]
+        assert round(results.at[metric, "lift_pct"], 2) == pytest.approx(sql.at[("LIFT_VS_CONTROL", "variant"), column])
+
+
+def test_cis_bracket_the_lift_and_are_reproducible(reports):
+    um, _ = reports
+    a = evaluate(um, resamples=300, seed=7)
+    b = evaluate(um, resamples=300, seed=7)
+    pd.testing.assert_frame_equal(a, b)
+    assert (a["ci_low_pct"] <= a["lift_pct"]).all() and (a["lift_pct"] <= a["ci_high_pct"]).all()
+    assert a["p_value"].between(0, 1).all()
+
+
+def test_bootstrap_sums_match_per_group_loop(reports, monkeypatch):
+    um, _ = reports
+    # a second experiment, so every role has groups of different sizes sharing one weight matrix
+    other = um[um["variant"] == "control"].assign(experiment_name="other")
+    X, groups = group_matrix(pd.concat([um, other, other.head(100).assign(variant="b")], ignore_index=True))
+    weights = []
+
+    def fake_weights(rng, shape):
+        w = rng.integers(0, 3, size=shape).astype(np.float64)
+        weights.append(w)
+        return w
+
+    monkeypatch.setattr(ab_evaluation, "poisson_weights", fake_weights)
+    sums = bootstrap_sums(X, groups, 4, np.random.default_rng(0))
+
+    # one block here: one weight matrix per role, shared by the groups of that role
+    assert len(weights) == groups["role"].nunique()
+    by_role = dict(zip(sorted(groups["role"].unique()), weights))
+    for g, (start, size, role) in enumerate(groups[["start", "size", "role"]].to_numpy()):
+        expected = by_role[role][:, :size] @ X[start:start + size]
+        np.testing.assert_allclose(sums[:, g, :], expected)
+
+
+def test_unit_weights_give_point_lift(reports, monkeypatch):
+    um, _ = reports
+    monkeypatch.setattr(ab_evaluation, "poisson_weights", lambda rng, shape: np.ones(shape))
+    results = evaluate(um, resamples=3)
+    np.testing.assert_allclose(results["ci_low_pct"], results["lift_pct"])
+    np.testing.assert_allclose(results["ci_high_pct"], results["lift_pct"])
+
+
+def test_db_path_reads_from_that_warehouse(data_dir, tmp_path):
+    warehouse, out = tmp_path / "wh.duckdb", tmp_path / "ab.csv"
+    subprocess.run(
+        [sys.executable, str(SCRIPTS_DIR / "ab_evaluation.py"), "--data-dir", str(data_dir), "--db-path", str(warehouse),
+         "--resamples", "50", "--out", str(out), "--calibration", str(tmp_path / "ab.json")],
+        cwd=tmp_path, check=True, capture_output=True,
+    )
+    assert warehouse.exists() and not (data_dir / "warehouse.duckdb").exists()
+    assert len(pd.read_csv(out))
@@ -0,0 +1,181 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulator_calibration import inputs_key
+from tests.conftest import SCRIPTS_DIR
+
+INPUTS = {"users.csv": {"sha256": "aa"}, "events.csv": {"sha256": "bb"}}
+CALIBRATION = {
+    "data_dir": "data",
+    "key": "0" * 64,
+    "lifts": {"AB_LIFT_COMPLETION": 0.01, "AB_LIFT_SESSIONS": -0.02, "AB_LIFT_IAP_REV": -0.03},
+    "inputs": INPUTS,
+}
+
+
+@pytest.fixture
+def sim(tmp_path, monkeypatch):
+    # the module creates outputs/ in the working directory when first imported
+    monkeypatch.chdir(tmp_path)
+    import economy_simulation
+
+    return economy_simulation
+
+
+def test_import_reads_no_data(tmp_path):
+    code = "import economy_simulation as s; print(s.BASELINE_SOURCE, s.SIM_CALIBRATION)"
+    done = subprocess.run(
+        [sys.executable, "-c", code], cwd=tmp_path, env={**os.environ, "PYTHONPATH": str(SCRIPTS_DIR)},
+        capture_output=True, text=True, check=True,
+    )
+    assert done.stdout.strip() == "hand-set defaults None"
+    assert [p.name for p in tmp_path.rglob("*")] == ["outputs"]
+
+
+def write_ab(path, key):
+    deltas = {"AB_LIFT_COMPLETION": 0.1, "AB_LIFT_SESSIONS": -0.2, "AB_LIFT_IAP_REV": -0.3}
+    path.write_text(json.dumps({"inputs_key": key, "experiments": {"exp": {"v": deltas}}}), encoding="utf-8")
+
+
+def test_bootstrap_lifts_need_the_same_inputs(sim, tmp_path):
+    path = tmp_path / "ab_calibration.json"
+    write_ab(path, inputs_key(INPUTS))
+    lifts, source = sim.load_ab_lifts(CALIBRATION, path, "exp", "v")
+    assert lifts == (0.1, -0.2, -0.3) and source.startswith(str(path))
+
+    write_ab(path, inputs_key({**INPUTS, "users.csv": {"sha256": "cc"}}))
+    lifts, source = sim.load_ab_lifts(CALIBRATION, path, "exp", "v")
+    assert lifts == (0.01, -0.02, -0.03) and "ignored" in source
+
+    lifts, source = sim.load_ab_lifts(None, path, "exp", "v")
+    assert lifts == (sim.AB_LIFT_COMPLETION, sim.AB_LIFT_SESSIONS, sim.AB_LIFT_IAP_REV) and "ignored" in source
+
+
+def test_inverse_cdf_matches_searchsorted(sim):
+    rng = np.random.default_rng(0)
+    tables = [
+        sim.poisson_cdf_table(np.r_[0.0, rng.uniform(0.05, 12.0, 40)], 40),
+        sim.binomial_cdf_table(rng.uniform(0.01, 0.99, 6), 12).reshape(-1, 13),
+    ]
+    for cdf in tables:
+        rows = rng.integers(0, len(cdf), 20_000)
+        u = np.r_[rng.random(19_994), 0.0, 1e-12, 0.5, 1 - 1e-12, np.nextafter(1.0, 0.0), 1.0 / sim.GUIDE_SIZE]
+        expected = [np.searchsorted(cdf[row], x, side="left") for row, x in zip(rows, u)]
+        assert np.array_equal(sim.inverse_cdf(cdf, rows, u), expected)
+
+
+def test_grid_engine_agrees_with_loop(sim):
+    scenarios = sim.scenario_grid([1.0, 1.2], [1.0, 1.08], sim.TARGETED_SETUPS[:1])
+    cols = ["sessions_per_user", "completion_rate", "total_arpu", "payer_rate",
+            "lift_total_arpu_pct", "lift_sessions_pct", "lift_completion_pct"]
+    seeds = range(6)
+    runs = {
+        engine: pd.concat(
+            sim.run_scenarios(scenarios, seed, 20_000, engine)[0].set_index("scenario")[cols] for seed in seeds
+        ).groupby(level=0)
+        for engine in ("grid", "loop")
+    }
+    mean = {engine: runs[engine].mean() for engine in runs}
+    var = {engine: runs[engine].var() for engine in runs}
+    diff = (mean["grid"] - mean["loop"]).abs()
+    stderr = np.sqrt((var["grid"] + var["loop"]) / len(seeds))
+    # the baseline's lifts are exactly 0 under both engines
+    assert (diff <= 4 * stderr + 1e-9).all().all(), (diff / stderr).round(2)
+
+
+def test_calibration_db_path_reads_from_that_warehouse(data_dir, tmp_path):
+    warehouse, out = tmp_path / "wh.duckdb", tmp_path / "calibration.json"
+    subprocess.run(
+        [sys.executable, str(SCRIPTS_DIR / "simulator_calibration.py"), "--data-dir", str(data_dir),
+         "--db-path", str(warehouse), "--out", str(out)],
+        cwd=tmp_path, check=True, capture_output=True,
+    )
+    assert warehouse.exists() and not (data_dir / "warehouse.duckdb").exists()
+    assert json.loads(out.read_text(encoding="utf-8"))["db"] == warehouse.as_posix()
+
+
+def test_replicates_do_not_depend_on_workers(sim):
+    scenarios = sim.scenario_grid([1.0, 1.2], [1.0, 1.08], sim.TARGETED_SETUPS[:1])
+    serial = sim.run_replicates(scenarios, 3, seed=7, n_users=5_000, workers=1)
+    parallel = sim.run_replicates(scenarios, 3, seed=7, n_users=5_000, workers=2)
+    pd.testing.assert_frame_equal(serial, parallel)
+    arpu = serial.pivot(index="scenario", columns="replicate", values="lift_total_arpu_pct")
+    assert arpu.drop(sim.BASELINE_SCENARIO).nunique(axis=1).eq(3).all()
+
+
+def test_optimizer_is_deterministic_and_ranks_by_guardrails(sim):
+    candidates = sim.sample_scenarios(np.random.default_rng(3), 64)
+    pd.testing.assert_frame_equal(candidates, sim.sample_scenarios(np.random.default_rng(3), 64))
+    df, log = sim.successive_halving(candidates, 20_000, seed=3, eta=4, min_users=1_250)
+    again, _ = sim.successive_halving(candidates, 20_000, seed=3, eta=4, min_users=1_250)
+    pd.testing.assert_frame_equal(df, again)
+    assert [rung["candidates"] for rung in log] == [64, 16, 4]
+
+    pd.testing.assert_series_equal(df["guard_violation"], sim.guard_violation(df), check_names=False)
+    assert df["guard_violation"].eq(0).equals(df["ship_candidate"])
+    ranked = df.sort_values(["guard_violation", "lift_total_arpu_pct"], ascending=[True, False])
+    assert df["scenario"].tolist() == ranked["scenario"].tolist()
+
+    # the survivors of the first rung were its best 16 by the same order
+    first, _ = sim.run_scenarios(pd.concat([sim.scenario_grid([], [], []), candidates], ignore_index=True), 3, 1_250)
+    first = first.iloc[1:].assign(guard_violation=lambda d: sim.guard_violation(d))
+    best = first.sort_values(["guard_violation", "lift_total_arpu_pct"], ascending=[True, False]).head(16)
+    assert set(df["scenario"]) <= set(best["scenario"])
+
+
+def test_pareto_front_is_the_non_dominated_rows(sim):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.integers(0, 8, (200, 2)), columns=["lift_total_arpu_pct", "lift_completion_pct"])
+    front = sim.pareto_front(df)
+    x = df.to_numpy()
+    for i, row in enumerate(x):
+        dominated = ((x >= row).all(axis=1) & (x > row).any(axis=1)).any()
+        assert front[i] == (not dominated)
+    assert front.any()
+
+
+def kpi_runs(week, seeds, **kwargs):
+    kpis = ["sessions_per_user", "completion_rate", "ads_arpu", "iap_arpu", "total_arpu", "payer_rate"]
+    return pd.DataFrame([week(np.random.default_rng(seed), **kwargs) for seed in seeds])[kpis]
+
+
+def assert_same_distribution(a, b):
+    """Means within 4 standard errors, spreads within the range an F test allows at 40 seeds."""
+    z = (a.mean() - b.mean()) / np.sqrt((a.var() + b.var()) / len(a))
+    assert z.abs().max() < 4, z.round(2)
+    ratio = a.std() / b.std()
+    assert ratio.between(0.6, 1.6).all(), ratio.round(2)
+
+
+def test_lean_engine_matches_simulate_week_for_any_chunk_size(sim):
+    setup = dict(reward_multiplier=1.1, sink_multiplier=1.08, targeted=True, target_share=0.35,
+                 reward_mult_target=1.2, reward_mult_non=1.0, beta0=sim.baseline_beta0(0, 20_000), n_users=20_000)
+    seeds = range(40)
+    dense = kpi_runs(sim.simulate_week, seeds, **setup)
+    lean = kpi_runs(sim.simulate_week_lean, seeds, **setup)
+    # 1_500 leaves a partial last chunk
+    chunked = kpi_runs(sim.simulate_week_lean, seeds, chunk_users=1_500, **setup)
+    assert_same_distribution(lean, dense)
+    assert_same_distribution(chunked, lean)
+    assert_same_distribution(chunked, dense)
+
+
+@pytest.mark.parametrize("target", [0.005, 0.0744, 0.5, 0.97])
+def test_calibrate_beta0_reproduces_the_target_rate(sim, target):
+    rng = np.random.default_rng(1)
+    for need in (rng.poisson(2.0, 50_000), np.zeros(10, dtype=int), rng.integers(0, 40, 1_000)):
+        b = sim.calibrate_beta0(target, need)
+        assert np.mean(sim.logistic(b + sim.BETA_NEED * need)) == pytest.approx(target, abs=1e-12)
+
+
+def test_baseline_payer_rate_is_the_calibration_target(sim):
+    n = 200_000
+    rate = sim.simulate_week(np.random.default_rng(5), 1.0, beta0=sim.baseline_beta0(5, n), n_users=n)["payer_rate"]
+    target = sim.BASE_PAYER_RATE_WEEK
+    assert abs(rate - target) < 4 * np.sqrt(target * (1 - target) / n)
@@ -0,0 +1,96 @@
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from generate_synthetic_data import (
+    DUPLICATE_PURCHASES,
+    EVENT_COLUMNS,
+    SEED,
+    TABLES,
+    build_ab,
+    build_events,
+    build_events_loop,
+    build_users,
+    event_summary,
+    expand,
+    generate_shard,
+    split_pro_rata,
+    variant_per_user,
+)
+from tests.conftest import SCRIPTS_DIR
+
+
+@pytest.fixture(scope="module")
+def population():
+    rng = np.random.default_rng(SEED)
+    user_ids = np.arange(1, 2001, dtype=np.int64)
+    users = build_users(rng, user_ids)
+    return users, variant_per_user(build_ab(rng, users), user_ids)
+
+
+def test_expand():
+    group, pos = expand(np.array([2, 0, 3]))
+    assert group.tolist() == [0, 0, 2, 2, 2]
+    assert pos.tolist() == [0, 1, 0, 1, 2]
+
+
+def test_vectorized_matches_loop_distributions(population):
+    users, variants = population
+    loop = build_events_loop(np.random.default_rng(SEED), users, variants)
+    vec = build_events(np.random.default_rng(SEED), users, variants)
+
+    assert list(vec.columns) == EVENT_COLUMNS
+    assert set(vec["event_name"].astype(str)) == set(loop["event_name"].astype(str))
+    a, b = event_summary(loop), event_summary(vec)
+    for key in ("rows", "active_users", "sessions", "levels_per_session", "mean_balance"):
+        assert b[key] == pytest.approx(a[key], rel=0.05), key
+    assert b["completion_rate"] == pytest.approx(a["completion_rate"], abs=0.02)
+
+
+def test_vectorized_sessions_are_well_formed(population):
+    users, variants = population
+    events = build_events(np.random.default_rng(SEED), users, variants)
+    edges = events[events["event_name"].isin(["session_start", "session_end"])]
+    counts = edges.groupby(["session_id", edges["event_name"].astype(str)]).size().unstack()
+    assert (counts == 1).all(axis=None)
+    starts = events[events["event_name"] == "session_start"].set_index("session_id")["event_ts"]
+    ends = events[events["event_name"] == "session_end"].set_index("session_id")["event_ts"]
+    assert (ends.loc[starts.index] > starts).all()
+
+
+def generate(out_dir, *args):
+    subprocess.run(
+        [sys.executable, SCRIPTS_DIR / "generate_synthetic_data.py", "--users", "900", "--out-dir", out_dir, *args],
+        check=True,
+        capture_output=True,
+    )
+    return {p.relative_to(out_dir).as_posix(): p.read_bytes() for p in sorted(out_dir.rglob("*")) if p.is_file()}
+
+
+def test_sharded_output_independent_of_workers(tmp_path):
+    serial = generate(tmp_path / "serial", "--shards", "3", "--workers", "1")
+    parallel = generate(tmp_path / "parallel", "--shards", "3", "--workers", "3")
+    assert sorted(serial) == sorted(f"{table}/part-{shard:05d}.csv" for table in TABLES for shard in range(3))
+    assert serial == parallel
+
+
+def backdated_copies(purchases):
+    """Purchases that repeat another row of the same user and SKU exactly 1-4 days later."""
+    keys = ["user_id", "revenue_usd", "purchase_type", "sku"]
+    pairs = purchases.reset_index(drop=True).reset_index().merge(purchases, on=keys, suffixes=("", "_orig"))
+    shift = pairs["purchase_ts_orig"] - pairs["purchase_ts"]
+    return pairs.loc[shift.isin(pd.to_timedelta([1, 2, 3, 4], unit="D")), "index"].nunique()
+
+
+def test_duplicate_purchases_are_exact(data_dir, tmp_path):
+    assert split_pro_rata(DUPLICATE_PURCHASES, [1000, 1000, 1000]).tolist() == [18, 16, 16]
+    assert backdated_copies(pd.read_csv(data_dir / "purchases.csv", parse_dates=["purchase_ts"])) == DUPLICATE_PURCHASES
+
+    # sharded, several batches per shard
+    for shard, seed_seq in enumerate(np.random.SeedSequence(SEED).spawn(3)):
+        generate_shard(shard, 3, seed_seq, 3000, tmp_path, batch_users=400)
+    parts = [pd.read_csv(p, parse_dates=["purchase_ts"]) for p in sorted((tmp_path / "purchases").glob("*.csv"))]
+    assert backdated_copies(pd.concat(parts)) == DUPLICATE_PURCHASES
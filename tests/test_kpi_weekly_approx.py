@@ -0,0 +1,59 @@
+import duckdb
+import numpy as np
+import pytest
+
+from run_sql import SQL_DIR, connect, split_sql
+from tests.conftest import run_script
+
+APPROX_SQL = SQL_DIR / "03_kpi_weekly_approx.sql"
+SKETCH = """
+SELECT hll_reg(h) AS reg, MAX(hll_rho(h)) AS rho
+FROM (SELECT hash(i) AS h FROM range({lo}, {hi}) t(i))
+GROUP BY reg
+"""
+
+
+@pytest.fixture(scope="module")
+def macros():
+    con = duckdb.connect(database=":memory:")
+    for stmt in split_sql(APPROX_SQL.read_text(encoding="utf-8")):
+        if "TEMP MACRO" in stmt:
+            con.execute(stmt)
+    return con
+
+
+def estimate(con, sketch_sql):
+    return con.execute(f"SELECT hll_estimate(SUM(POW(0.5, rho)), COUNT(*)) FROM ({sketch_sql})").fetchone()[0]
+
+
+@pytest.mark.parametrize("n", [100, 2_000, 50_000, 400_000])
+def test_relative_error_within_bound(macros, n):
+    bound = macros.execute("SELECT hll_error_95_pct()").fetchone()[0] / 100
+    errors = np.array([estimate(macros, SKETCH.format(lo=k * n, hi=(k + 1) * n)) / n - 1 for k in range(8)])
+    # 1.04 / sqrt(4096) standard error at p = 12; linear counting is tighter for small n
+    assert np.sqrt(np.mean(errors ** 2)) <= bound / 1.96 * 1.5
+    assert np.abs(errors).max() <= bound * 1.5
+
+
+def test_merge_is_sketch_of_union(macros):
+    merged = f"""
+    SELECT reg, MAX(rho) AS rho
+    FROM ({SKETCH.format(lo=0, hi=30_000)} UNION ALL {SKETCH.format(lo=20_000, hi=60_000)})
+    GROUP BY reg
+    """
+    assert estimate(macros, merged) == estimate(macros, SKETCH.format(lo=0, hi=60_000))
+
+
+def test_report_matches_exact_weekly(data_dir):
+    con = connect(data_dir)
+    *_, exact = run_script(con, SQL_DIR / "03_kpi_weekly.sql")
+    weekly, monthly = run_script(con, APPROX_SQL)
+    exact, weekly = exact.set_index("week"), weekly.set_index("week")
+    assert weekly.index.equals(exact.index)
+    bound = weekly["uniques_error_95_pct"].iloc[0] / 100
+    rel = weekly["weekly_active_users"] / exact["weekly_active_users"] - 1
+    assert rel.abs().max() <= bound
+    # counts without DISTINCT stay exact
+    for col in ("sessions", "iap_revenue_usd", "level_starts", "level_completes", "avg_d1_retention"):
+        np.testing.assert_allclose(weekly[col], exact[col])
+    assert len(monthly) == 3
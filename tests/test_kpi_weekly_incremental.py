@@ -0,0 +1,50 @@
+import shutil
+
+import duckdb
+import pandas as pd
+
+from run_sql import SQL_DIR, connect
+from tests.conftest import run_script
+
+INCREMENTAL_SQL = SQL_DIR / "03_kpi_weekly_incremental.sql"
+TS_COLUMNS = {
+    "users": "install_ts",
+    "ab_assignments": "assign_ts",
+    "events": "event_ts",
+    "purchases": "purchase_ts",
+    "ads_events": "ad_ts",
+}
+CUT = "2025-12-01"
+# rows of even users in the days before the cut arrive only with the next load
+LATE_FROM = "2025-11-27"
+
+
+def write_cut(data_dir, out_dir):
+    con = duckdb.connect()
+    for table, ts in TS_COLUMNS.items():
+        late = f" AND NOT ({ts} >= TIMESTAMP '{LATE_FROM}' AND user_id % 2 = 0)" if table != "users" else ""
+        con.execute(
+            f"COPY (SELECT * FROM read_csv('{(data_dir / table).as_posix()}.csv') "
+            f"WHERE {ts} < TIMESTAMP '{CUT}'{late}) TO '{(out_dir / table).as_posix()}.csv' (HEADER)"
+        )
+    con.close()
+
+
+def test_late_rows_match_full_refresh(data_dir, tmp_path):
+    load_dir, warehouse = tmp_path / "data", tmp_path / "wh.duckdb"
+    load_dir.mkdir()
+    write_cut(data_dir, load_dir)
+    con = connect(load_dir, warehouse)
+    run_script(con, INCREMENTAL_SQL)
+    con.close()
+
+    for table in TS_COLUMNS:
+        shutil.copyfile(data_dir / f"{table}.csv", load_dir / f"{table}.csv")
+    con = connect(load_dir, warehouse)
+    refresh, incremental = run_script(con, INCREMENTAL_SQL)
+    con.close()
+    assert refresh["refreshed_from_day"].iloc[0] < pd.Timestamp(LATE_FROM)
+
+    *_, exact = run_script(connect(data_dir), SQL_DIR / "03_kpi_weekly.sql")
+    pd.testing.assert_frame_equal(incremental.set_index("week"), exact.set_index("week")[incremental.columns[1:]],
+                                  check_dtype=False)
@@ -0,0 +1,66 @@
+import queue
+import threading
+
+import duckdb
+import pandas as pd
+import pytest
+
+from replay_kpis import (
+    QUEUE_BATCHES,
+    TEST_END,
+    TEST_START,
+    OnlineKpis,
+    batch_reports,
+    compare,
+    epoch_s,
+    load_dimensions,
+    replay,
+    sql_round,
+)
+from run_sql import connect, create_source_views, raw_readers
+
+
+@pytest.fixture(scope="module")
+def replayed(data_dir):
+    con = duckdb.connect(database=":memory:")
+    create_source_views(con, raw_readers(data_dir))
+    test_start, test_end = epoch_s(TEST_START), epoch_s(TEST_END)
+    kpis = OnlineKpis(*load_dimensions(con, test_start, test_end), test_start, test_end)
+    stream = queue.Queue(maxsize=QUEUE_BATCHES)
+    producer = threading.Thread(target=replay, args=(con, stream, 0, threading.Event()), daemon=True)
+    producer.start()
+    while (batch := stream.get()) is not None:
+        kpis.consume(batch)
+    producer.join()
+    kpis.finish()
+    return kpis
+
+
+def test_online_kpis_match_batch_sql(replayed, data_dir):
+    weekly, ab = batch_reports(connect(data_dir))
+    assert len(weekly) > 1
+    assert compare("weekly", replayed.weekly(), weekly, "week") == []
+    assert compare("ab", replayed.ab(), ab, "variant") == []
+
+
+def test_every_record_is_consumed(replayed, data_dir):
+    con = duckdb.connect(database=":memory:")
+    create_source_views(con, raw_readers(data_dir))
+    total = con.execute(
+        "SELECT (SELECT COUNT(*) FROM events) + (SELECT COUNT(*) FROM purchases) + (SELECT COUNT(*) FROM ads_events)"
+    ).fetchone()[0]
+    assert replayed.records == total
+
+
+def test_compare_reports_differences():
+    online = pd.DataFrame({"week": [1, 2], "dau": [10.0, 20.0], "arpu": [0.5, float("nan")]})
+    assert compare("t", online, online[::-1], "week") == []
+    assert compare("t", online, online.assign(dau=[10.0, 21.0]), "week") == ["t.dau"]
+    assert compare("t", online, online.head(1), "week") == ["t: rows [1, 2] vs [1]"]
+
+
+def test_sql_round_matches_duckdb():
+    values = [0.53125, 0.00005, 2.5, -0.53125, 1 / 3, 0.0]
+    con = duckdb.connect(database=":memory:")
+    for x in values:
+        assert sql_round(x, 4) == con.execute("SELECT ROUND(?::DOUBLE, 4)", [x]).fetchone()[0]
@@ -0,0 +1,171 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from generate_synthetic_data import SEED, generate_shard
+from run_sql import (
+    SQL_DIR,
+    TABLES,
+    connect,
+    create_source_views,
+    plan_statements,
+    raw_readers,
+    run_steps,
+    split_sql,
+)
+from tests.conftest import SCRIPTS_DIR
+
+SCRIPT = """
+-- a comment
+CREATE TABLE t AS SELECT 1 AS x;
+CREATE TEMP VIEW v AS SELECT * FROM t;
+SELECT * FROM t;
+SELECT * FROM v;
+INSERT INTO t SELECT 2;
+SET threads = 2;
+SELECT 'x' AS label
+"""
+
+
+def plan(*scripts):
+    return plan_statements([(Path(f"{i}.sql"), split_sql(s)) for i, s in enumerate(scripts)])
+
+
+def test_split_sql_ignores_quoted_semicolons():
+    script = "SELECT 'a;b' AS s; SELECT \"c;d\" FROM x;\nSELECT 'it''s; fine'  ;  ;"
+    assert split_sql(script) == ["SELECT 'a;b' AS s", 'SELECT "c;d" FROM x', "SELECT 'it''s; fine'"]
+
+
+def test_plan_dependencies():
+    steps = plan(SCRIPT)
+    assert [s["deps"] for s in steps] == [
+        set(),            # CREATE TABLE t
+        {0},              # TEMP VIEW v reads t
+        {0},              # SELECT t: only the write of t
+        {1},              # SELECT v: temp view, runs after it on the main connection
+        {0, 1, 2, 3},     # INSERT t waits for the write and every reader of t
+        {0, 1, 2, 3, 4},  # SET is a barrier
+        {5},
+    ]
+    assert [s["main"] for s in steps] == [True, True, False, True, True, True, False]
+    assert [s["select"] for s in steps] == [False, False, True, True, False, False, True]
+
+
+def test_plan_dependencies_across_files():
+    steps = plan("CREATE TABLE a AS SELECT 1 AS x; CREATE TABLE b AS SELECT 2 AS y", "SELECT * FROM b; SELECT 3")
+    assert [s["deps"] for s in steps] == [set(), {0}, {1}, set()]
+    assert [(s["file"].name, s["idx"]) for s in steps] == [("0.sql", 1), ("0.sql", 2), ("1.sql", 1), ("1.sql", 2)]
+
+
+def test_run_steps_respects_dependencies(capsys):
+    con = duckdb.connect(database=":memory:")
+    run_steps(con, plan(SCRIPT), workers=4, cursor_setup=[])
+    assert con.execute("SELECT SUM(x) FROM v").fetchone()[0] == 3
+    assert "label" in capsys.readouterr().out
+
+
+def test_reports_run_concurrently(data_dir, capsys):
+    files = [SQL_DIR / "03_kpi_weekly.sql", SQL_DIR / "04_ab_test_evaluation.sql"]
+    steps = plan_statements([(f, split_sql(f.read_text(encoding="utf-8"))) for f in files])
+    run_steps(connect(data_dir), steps, workers=4, cursor_setup=[])
+    out = capsys.readouterr().out
+    assert "weekly_active_users" in out and "LIFT_VS_CONTROL" in out
+
+
+def run_cli(*args, cwd=None):
+    return subprocess.run(
+        [sys.executable, SCRIPTS_DIR / "run_sql.py", *map(str, args)], cwd=cwd, capture_output=True, text=True, check=True
+    )
+
+
+def test_profile_with_export_describes_the_report(data_dir, tmp_path):
+    out = tmp_path / "profile.json"
+    run_cli(SQL_DIR / "03_kpi_weekly.sql", "--data-dir", data_dir, "--profile", "--profile-out", out,
+            "--export", tmp_path / "export")
+    (report,) = [s for s in json.loads(out.read_text(encoding="utf-8"))["statements"] if s["rows"] is not None]
+    assert report["rows_scanned"] > 0
+    assert "arrow_scan" not in json.dumps(report["plan"])
+    exported = pd.read_parquet(tmp_path / "export" / f"03_kpi_weekly_{report['statement']:02d}.parquet")
+    assert len(exported) == report["rows"]
+
+
+def schemas(con, tables):
+    return {table: con.execute(f"DESCRIBE {table}").fetchall() for table in tables}
+
+
+def test_parquet_views_have_the_csv_columns(tmp_path):
+    seed = np.random.SeedSequence(SEED).spawn(1)[0]
+    cons = {}
+    for fmt in ("csv", "parquet"):
+        generate_shard(0, 1, seed, 300, tmp_path / fmt, fmt=fmt)
+        con = duckdb.connect()
+        create_source_views(con, raw_readers(tmp_path / fmt))
+        cons[fmt] = con
+    csv, parquet = (schemas(cons[fmt], TABLES) for fmt in ("csv", "parquet"))
+    # CSV sniffs the numeric types, so only the column names are comparable here
+    assert {t: [c[0] for c in cols] for t, cols in parquet.items()} == {t: [c[0] for c in cols] for t, cols in csv.items()}
+
+    warehouses = [connect(tmp_path / fmt, tmp_path / f"{fmt}.duckdb") for fmt in ("csv", "parquet")]
+    assert schemas(warehouses[0], TABLES) == schemas(warehouses[1], TABLES)
+
+
+def test_ingest_reloads_only_changed_tables(data_dir, tmp_path, capsys):
+    load_dir, warehouse = tmp_path / "data", tmp_path / "wh.duckdb"
+    shutil.copytree(data_dir, load_dir)
+
+    def load():
+        con = connect(load_dir, warehouse)
+        log = dict(con.execute("SELECT table_name, loaded_at FROM _ingest_log").fetchall())
+        con.close()
+        return log, re.findall(r"📥 Loaded (\w+)", capsys.readouterr().out)
+
+    first, loaded = load()
+    assert sorted(loaded) == sorted(TABLES)
+    assert load() == (first, [])
+
+    purchases = load_dir / "purchases.csv"
+    stat = purchases.stat()
+    os.utime(purchases, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    second, loaded = load()
+    assert loaded == ["purchases"]
+    assert {t for t in TABLES if second[t] != first[t]} == {"purchases"}
+
+
+def test_profile_report_lists_every_statement(data_dir, tmp_path):
+    sql_files = [SQL_DIR / "01_event_validation.sql", SQL_DIR / "03_kpi_weekly.sql"]
+    out = tmp_path / "profile.json"
+    run_cli(*sql_files, "--data-dir", data_dir, "--workers", "2", "--profile", "--profile-out", out)
+    report = json.loads(out.read_text(encoding="utf-8"))
+    assert report["files"] == [str(f) for f in sql_files]
+    assert (report["data_dir"], report["db"], report["workers"]) == (str(data_dir), False, 2)
+    assert report["duckdb_version"] == duckdb.__version__ and report["elapsed_s"] > 0
+
+    expected = [(str(f), i) for f in sql_files for i in range(1, len(split_sql(f.read_text(encoding="utf-8"))) + 1)]
+    statements = report["statements"]
+    assert [(s["file"], s["statement"]) for s in statements] == expected
+    assert all(s["summary"] and s["wall_s"] >= 0 and isinstance(s["plan"], dict) for s in statements)
+    reports = [s for s in statements if s["summary"].startswith(("SELECT", "WITH"))]
+    assert len(reports) >= 2
+    for s in reports:
+        assert s["latency_s"] > 0 and s["cpu_s"] >= 0 and s["rows"] >= 0 and s["rows_scanned"] > 0
+
+
+def test_profile_out_never_overwrites_inputs(data_dir, tmp_path):
+    sql_file = tmp_path / "report.sql"
+    sql_file.write_text("SELECT 1 AS x", encoding="utf-8")
+    notes = tmp_path / "notes.txt"
+    notes.write_text("keep", encoding="utf-8")
+    for target in (sql_file, notes):
+        with pytest.raises(subprocess.CalledProcessError) as failed:
+            run_cli(sql_file, "--data-dir", data_dir, "--profile", "--profile-out", target)
+        assert failed.value.returncode == 2
+    assert sql_file.read_text(encoding="utf-8") == "SELECT 1 AS x" and notes.read_text(encoding="utf-8") == "keep"
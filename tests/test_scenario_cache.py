@@ -0,0 +1,55 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import scenario_cache
+from scenario_cache import ScenarioCache
+
+ROW = 64  # float64 values per entry
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    ticks = itertools.count()
+    monkeypatch.setattr(scenario_cache.time, "time", lambda: float(next(ticks)))
+
+
+def key(i: int) -> bytes:
+    return i.to_bytes(16, "big")
+
+
+def test_round_trip_and_counters(tmp_path):
+    with ScenarioCache(tmp_path / "cache.sqlite") as cache:
+        cache.put_many({key(1): np.arange(3.0), key(2): [0.5, 1.5]})
+        found = cache.get_many([key(1), key(2), key(3), key(3)])
+    assert found.keys() == {key(1), key(2)}
+    np.testing.assert_array_equal(found[key(1)], [0.0, 1.0, 2.0])
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    path = tmp_path / "cache.sqlite"
+    with ScenarioCache(path, max_bytes=1 << 62) as cache:
+        for i in range(400):
+            cache.put_many({key(i): np.full(ROW, float(i))})
+        full = cache.size_bytes()
+        # touch the oldest entries: they become the most recently used
+        assert len(cache.get_many([key(i) for i in range(20)])) == 20
+
+        cache.max_bytes = full // 2
+        dropped = cache.evict()
+        assert cache.size_bytes() <= cache.max_bytes
+        left = cache.get_many([key(i) for i in range(400)])
+
+    assert dropped > 0 and len(left) == 400 - dropped
+    assert all(key(i) in left for i in range(20))
+    survivors = sorted(int.from_bytes(k, "big") for k in left if int.from_bytes(k, "big") >= 20)
+    # the rest of the survivors are the newest inserts
+    assert survivors == list(range(400 - len(survivors), 400))
+
+
+def test_evict_below_limit_is_a_no_op(tmp_path):
+    with ScenarioCache(tmp_path / "cache.sqlite") as cache:
+        cache.put_many({key(1): np.zeros(ROW)})
+        assert cache.evict() == 0
@@ -0,0 +1,122 @@
+import json
+import shutil
+import subprocess
+import sys
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+import validate_data
+from run_sql import create_source_views, raw_readers
+from tests.conftest import SCRIPTS_DIR
+from validate_data import TABLES, HashSet64, SessionState, validate_table
+
+
+def test_hashset_add_marks_repeats():
+    s = HashSet64()
+    keys = np.array([5, 3, 5, 9, 3, 5], dtype=np.uint64)
+    assert s.add(keys).tolist() == [False, False, True, False, True, True]
+    assert s.add(np.array([9, 1, 1], dtype=np.uint64)).tolist() == [True, False, True]
+    assert len(s) == 4
+    assert s.contains(np.array([1, 2, 3, 4, 5], dtype=np.uint64)).tolist() == [True, False, True, False, True]
+
+
+def test_hashset_matches_python_set_across_runs():
+    rng = np.random.default_rng(0)
+    s, seen = HashSet64(), set()
+    for _ in range(50):
+        keys = rng.integers(0, 5_000, size=rng.integers(1, 400)).astype(np.uint64)
+        expected = []
+        for k in keys.tolist():
+            expected.append(k in seen)
+            seen.add(k)
+        assert s.add(keys).tolist() == expected
+    assert len(s) == len(seen)
+    # merged like a binary counter: run lengths strictly decrease
+    lengths = [len(run) for run in s.runs]
+    assert lengths == sorted(lengths, reverse=True) and len(set(lengths)) == len(lengths)
+
+
+def edges(*rows):
+    df = pd.DataFrame(rows, columns=["user_id", "session_id", "event_name", "event_ts"])
+    df["event_ts"] = pd.to_datetime(df["event_ts"])
+    df["_session_key"] = np.array([hash(key) & (2 ** 63 - 1) for key in zip(df["user_id"], df["session_id"])],
+                                  dtype=np.uint64)
+    return df
+
+
+def test_session_state_out_of_order_and_late_events():
+    state = SessionState("events")
+    # end of "a" arrives before its start, "b" never ends
+    state.update(edges((1, "a", "session_end", "2025-11-01 10:20"), (2, "b", "session_start", "2025-11-01 09:00")))
+    assert len(state.open) == 2
+    state.update(edges((1, "a", "session_start", "2025-11-01 10:00"), (2, "b", "level_start", "2025-11-01 09:05")))
+    assert len(state.open) == 1
+    # "a" is already checked: its repeated end is late; "c" ends before it starts
+    state.update(edges(
+        (1, "a", "session_end", "2025-11-01 10:30"),
+        (3, "c", "session_start", "2025-11-01 12:00"),
+        (3, "c", "session_end", "2025-11-01 11:50"),
+    ))
+    assert state.totals() == {
+        "sessions_missing_end": 1, "sessions_missing_start": 0, "total_sessions": 3, "late_session_events": 1,
+    }
+    assert state.end_before_start.count == 1
+    assert state.end_before_start.samples[0]["session_id"] == "c"
+
+
+@pytest.fixture(scope="module")
+def con(data_dir):
+    con = duckdb.connect(database=":memory:")
+    create_source_views(con, raw_readers(data_dir))
+    return con
+
+
+def test_duplicate_events_match_sql(con):
+    stats, findings = validate_table(con, "events")
+    groups, extra = con.execute("""
+        SELECT COUNT(*), SUM(cnt - 1) FROM (
+          SELECT COUNT(*) AS cnt FROM events GROUP BY user_id, session_id, event_name, event_ts HAVING COUNT(*) > 1
+        )
+    """).fetchone()
+    dup = next(f for f in findings if f["check"] == "duplicate_events")
+    assert (dup["count"], dup["extra_rows"]) == (groups, extra)
+    assert all(s["cnt"] >= 2 for s in dup["samples"])
+    assert stats["rows"] == con.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+    assert stats["total_sessions"] == con.execute(
+        "SELECT COUNT(*) FROM (SELECT DISTINCT user_id, session_id FROM events)"
+    ).fetchone()[0]
+    assert not any(f["severity"] == "error" for f in findings)
+
+
+def test_small_chunks_give_the_same_report(con, monkeypatch):
+    expected = validate_table(con, "events")
+    monkeypatch.setattr(validate_data, "CHUNK_VECTORS", 1)
+    assert validate_table(con, "events") == expected
+
+
+def run_cli(data_dir, out, *args):
+    return subprocess.run(
+        [sys.executable, SCRIPTS_DIR / "validate_data.py", "--data-dir", data_dir, "--out", out, *args],
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_stops_at_first_failing_table(data_dir, tmp_path):
+    broken = tmp_path / "data"
+    shutil.copytree(data_dir, broken)
+    users = (broken / "users.csv").read_text(encoding="utf-8").splitlines(keepends=True)
+    (broken / "users.csv").write_text("".join(users + users[-1:] * 2), encoding="utf-8")
+    out = tmp_path / "report.json"
+
+    assert run_cli(broken, out).returncode == 1
+    report = json.loads(out.read_text(encoding="utf-8"))
+    assert report["status"] == "fail" and list(report["tables"]) == ["users"]
+    (dup,) = [f for f in report["findings"] if f["check"] == "duplicate_users"]
+    assert (dup["count"], dup["extra_rows"], dup["samples"][0]["cnt"]) == (1, 2, 3)
+
+    assert run_cli(broken, out, "--keep-going").returncode == 1
+    assert list(json.loads(out.read_text(encoding="utf-8"))["tables"]) == TABLES